@@ -1,4 +1,6 @@
 import sys
+import heapq
+from occupancy import SLOT_MASKS, free_starts
 
 def solve():
     # --- 1. ĐỌC DỮ LIỆU ---
@@ -29,16 +31,7 @@ def solve():
 
     durations = [0] + [int(x) for x in input_data[ptr:ptr+M]]
 
-    # --- 2. TIỀN XỬ LÝ BITMASK ---
-    # valid_masks: Lưu các vị trí bắt đầu và mặt nạ bit không nhảy buổi
-    valid_masks = [[] for _ in range(13)]
-    for d in range(1, 13):
-        for start in range(1, 61 - d + 2):
-            end = start + d - 1
-            if (start - 1) // 6 == (end - 1) // 6: # Ràng buộc cùng buổi
-                mask = ((1 << d) - 1) << (start - 1)
-                valid_masks[d].append((start, mask))
-
+    # --- 2. TIỀN XỬ LÝ ---
     # unassigned_tasks: Danh sách các cặp (Lớp, Môn) cần xếp
     unassigned_tasks = []
     for c_idx, needs in enumerate(class_needs, 1):
@@ -49,73 +42,87 @@ def solve():
                 'dur': durations[m_id],
                 'eligible': subject_to_teachers[m_id]
             })
+    num_tasks = len(unassigned_tasks)
+
+    # Chỉ mục ngược: task của từng lớp / (task, vị trí GV trong eligible) mà từng giáo viên dạy được
+    # -> gán 1 task chỉ cần đếm lại phương án của các task dùng chung lớp hoặc giáo viên đó
+    class_tasks = [[] for _ in range(N + 1)]
+    teacher_tasks = [[] for _ in range(T + 1)]
+    for i, task in enumerate(unassigned_tasks):
+        class_tasks[task['c']].append(i)
+        for k, t_id in enumerate(task['eligible']):
+            teacher_tasks[t_id].append((i, k))
 
     class_masks = [0] * (N + 1)
     teacher_masks = [0] * (T + 1)
     final_solution = []
 
+    # Số slot bắt đầu trống (không nhảy buổi) đếm bằng popcount trên mặt nạ rảnh (free_starts)
+    def teacher_counts(task):
+        """Số phương án còn trống của task theo từng GV trong eligible (cùng thứ tự)"""
+        c_mask = class_masks[task['c']]
+        return [free_starts(~(c_mask | teacher_masks[t_id]), task['dur'])[0] for t_id in task['eligible']]
+
+    def first_option(task):
+        """Phương án trống đầu tiên (GV tăng dần rồi slot sớm nhất): (start, teacher_id, mask)"""
+        c_mask, d = class_masks[task['c']], task['dur']
+        for t_id in task['eligible']:
+            start = free_starts(~(c_mask | teacher_masks[t_id]), d)[1]
+            if start:
+                return start, t_id, SLOT_MASKS[d][start]
+        return None
+
     # --- 3. VÒNG LẶP REGRET-BASED GREEDY ---
-    while unassigned_tasks:
-        best_task_idx = -1
-        best_option = None # (start, teacher_id, mask)
-        min_options_count = float('inf')
-        max_regret_score = -1 # Tiêu chí phụ: Độ ưu tiên nếu options bằng nhau
-
-        # Duyệt tất cả các task còn lại để tìm task "nguy kịch" nhất
-        i = 0
-        while i < len(unassigned_tasks):
-            task = unassigned_tasks[i]
-            c_idx = task['c']
-            d = task['dur']
-            
-            # Đếm số lượng lựa chọn (Slot, Teacher) còn lại cho task này
-            current_options = []
-            c_mask = class_masks[c_idx]
-            
-            for t_id in task['eligible']:
-                t_mask = teacher_masks[t_id]
-                combined = c_mask | t_mask
-                
-                for start, msk in valid_masks[d]:
-                    if not (combined & msk):
-                        current_options.append((start, t_id, msk))
-            
-            num_opts = len(current_options)
-            
-            # Nếu môn này không còn cách nào để xếp, loại bỏ khỏi danh sách
-            if num_opts == 0:
-                unassigned_tasks.pop(i)
+    # Hàng đợi ưu tiên (số lựa chọn, -điểm regret, thứ tự task): task "nguy kịch" nhất ở đỉnh.
+    # Số lựa chọn chỉ giảm dần -> khi đếm lại thì đẩy phần tử mới, phần tử cũ bị bỏ qua lúc lấy ra.
+    # Tie-breaker: Ưu tiên môn dài hơn hoặc môn có tổng số giáo viên ít hơn
+    per_teacher = [teacher_counts(task) for task in unassigned_tasks]
+    option_count = [sum(counts) for counts in per_teacher]
+    regret_score = [task['dur'] * 100 - len(task['eligible']) for task in unassigned_tasks]
+    # Môn không còn cách nào để xếp thì loại luôn
+    heap = [(option_count[i], -regret_score[i], i) for i in range(num_tasks) if option_count[i] > 0]
+    heapq.heapify(heap)
+    assigned = [False] * num_tasks
+
+    def recount(j, count):
+        if count != option_count[j]:
+            option_count[j] = count
+            if count > 0:
+                heapq.heappush(heap, (count, -regret_score[j], j))
+
+    while heap:
+        num_opts, _, i = heapq.heappop(heap)
+        if assigned[i] or num_opts != option_count[i]:
+            continue # Phần tử cũ (đã gán / đã đếm lại)
+
+        # Thực hiện gán task tốt nhất tìm được (chọn slot rảnh sớm nhất)
+        task = unassigned_tasks[i]
+        start, t_id, msk = first_option(task)
+        class_masks[task['c']] |= msk
+        teacher_masks[t_id] |= msk
+        assigned[i] = True
+        final_solution.append((task['c'], task['m'], start, t_id))
+
+        # Task cùng lớp: đếm lại với mọi GV
+        for j in class_tasks[task['c']]:
+            if not assigned[j] and option_count[j] > 0:
+                per_teacher[j] = teacher_counts(unassigned_tasks[j])
+                recount(j, sum(per_teacher[j]))
+        # Task lớp khác của GV vừa gán: chỉ đếm lại lựa chọn với GV này, khi lớp còn rảnh ở slot vừa bị chiếm
+        t_mask = teacher_masks[t_id]
+        for j, k in teacher_tasks[t_id]:
+            other = unassigned_tasks[j]
+            if assigned[j] or option_count[j] == 0 or other['c'] == task['c']:
+                continue
+            c_mask = class_masks[other['c']]
+            if not (msk & ~c_mask):
                 continue
-            
-            # Tính điểm ưu tiên bổ sung (Tie-breaker)
-            # Ưu tiên môn dài hơn hoặc môn có tổng số giáo viên ít hơn
-            regret_score = d * 100 - len(task['eligible'])
-            
-            # Chiến lược Regret: Chọn môn có ít lựa chọn nhất
-            if num_opts < min_options_count:
-                min_options_count = num_opts
-                max_regret_score = regret_score
-                best_task_idx = i
-                best_option = current_options[0] # Chọn slot rảnh sớm nhất
-            elif num_opts == min_options_count:
-                if regret_score > max_regret_score:
-                    max_regret_score = regret_score
-                    best_task_idx = i
-                    best_option = current_options[0]
-            
-            i += 1
-
-        # Thực hiện gán task tốt nhất tìm được
-        if best_task_idx != -1:
-            task = unassigned_tasks.pop(best_task_idx)
-            start, t_id, msk = best_option
-            
-            class_masks[task['c']] |= msk
-            teacher_masks[t_id] |= msk
-            
-            final_solution.append((task['c'], task['m'], start, t_id))
-        else:
-            break
+            counts = per_teacher[j]
+            new_count = free_starts(~(c_mask | t_mask), other['dur'])[0]
+            if new_count != counts[k]:
+                option_count_j = option_count[j] - counts[k] + new_count
+                counts[k] = new_count
+                recount(j, option_count_j)
 
     # --- 4. XUẤT KẾT QUẢ ---
     print(len(final_solution))
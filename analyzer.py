@@ -1,117 +1,386 @@
-import sys
 import os
+import argparse
 import statistics
-from io import StringIO
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 # Import hàm tiền xử lý từ file utils.py cũ
-from utils import load_and_preprocess, MAX_SLOTS
+from utils import load_compiled_instance, MAX_SLOTS, SLOTS_PER_SESSION
 
 # Cấu hình folder chứa test case
 INPUT_FOLDER = "test_case"  # <-- Đặt tên folder chứa test case của bạn ở đây
 
-def analyze_single_file(file_path, file_name):
-    """Phân tích một file và trả về các chỉ số"""
-    
-    # 1. Đọc nội dung file và giả lập stdin
-    try:
-        with open(file_path, 'r') as f:
-            content = f.read()
-        
-        # Mock sys.stdin để tái sử dụng hàm load_and_preprocess cũ
-        sys.stdin = StringIO(content)
-        data = load_and_preprocess()
-        
-        if data is None:
-            return None
-            
-        T, N, tasks = data['T'], data['N'], data['tasks']
-        
-        # --- TÍNH TOÁN CHỈ SỐ ---
-        
-        # 1. Tải của Lớp (Class Load)
-        class_loads = [0] * N
-        for t in tasks:
-            class_loads[t['c']] += t['d']
-        max_c_load = max(class_loads)
-        class_load_percent = (max_c_load / MAX_SLOTS) * 100
-        
-        # 2. Độ khan hiếm Giáo viên (Teacher Scarcity)
-        # Tỷ lệ số task chỉ có đúng 1 giáo viên dạy được
-        strict_tasks = sum(1 for t in tasks if t['num_eligible'] == 1)
-        scarcity_percent = (strict_tasks / len(tasks)) * 100 if tasks else 0
-        
-        # 3. Môn học dài (Duration)
-        max_duration = max(t['d'] for t in tasks) if tasks else 0
-        
-        # --- ĐÁNH GIÁ ĐỘ KHÓ ---
-        difficulty = "EASY"
-        reason = "Resource Open"
-        
-        # Logic xếp hạng Hard/Medium/Easy
-        if class_load_percent > 90:
-            difficulty = "HARD"
-            reason = "Full Class Schedule"
-        elif scarcity_percent > 50:
-            difficulty = "HARD"
-            reason = "Lack Teachers"
-        elif class_load_percent > 75 or scarcity_percent > 20:
-            difficulty = "MEDIUM"
-            reason = "Constrained"
-            
-        return {
-            "name": file_name,
-            "N": N,
-            "T": T,
-            "Tasks": len(tasks),
-            "MaxClassLoad": f"{max_c_load} ({class_load_percent:.0f}%)",
-            "TeacherScarcity": f"{scarcity_percent:.0f}%",
-            "MaxDur": max_duration,
-            "Difficulty": difficulty,
-            "Reason": reason
-        }
+# --- BẢNG ĐẶC TRƯNG (FEATURES TABLE) ---
+# Đặc trưng của mọi file đã phân tích, lưu dạng cột (.npz, mỗi cột 1 mảng NumPy) theo hash nội dung:
+# vừa là cache (chạy lại chỉ phân tích file mới / đã sửa) vừa để benchmark / chọn solver đọc thẳng.
+FEATURES_FILE = "instance_features.npz"
+# Tăng số này khi đổi cách tính đặc trưng -> các dòng cũ tự động bị tính lại
+FEATURES_VERSION = 1
+
+# --- CẬN TRÊN SỐ MÔN XẾP ĐƯỢC ---
+# Mỗi cận là số môn tối đa của 1 bài toán nới lỏng (bỏ bớt ràng buộc) -> không lời giải nào vượt được.
+# Tính trong vài ms, dùng để báo khoảng cách tới tối ưu và cho solver dừng sớm khi đã chạm cận.
+SESSIONS = MAX_SLOTS // SLOTS_PER_SESSION # 10 buổi / tuần
+BOUND_NAMES = ('tasks', 'assignable', 'class_capacity', 'session_packing', 'single_teacher', 'teacher_flow')
+
+def max_packable(hist, sessions=SESSIONS, by_session=True):
+    """
+    Số môn tối đa lấy được từ histogram thời lượng hist (hist[d] = số môn dài d tiết) mà vẫn
+    xếp được vào lịch 1 lớp / 1 GV:
+    - by_session=False: chỉ xét tổng số tiết <= sessions * 6
+    - by_session=True: xét thêm cận dưới số buổi cần dùng <= sessions, với môn dài > 3 tiết
+      mỗi buổi chỉ chứa được 1, môn dài đúng 3 tiết 2 môn / buổi và không ghép với môn > 3 tiết
+    Lấy tham lam môn ngắn trước (nếu k môn bất kỳ xếp được thì k môn ngắn nhất cũng xếp được),
+    số môn lấy được ở mỗi thời lượng tính thẳng bằng công thức.
+    """
+    half = SLOTS_PER_SESSION // 2
+    room = sessions * SLOTS_PER_SESSION # Số tiết còn trống
+    big = halves = 0                    # Số môn > 3 tiết / đúng 3 tiết đã lấy
+    count = 0
+    for d in range(1, min(len(hist), SLOTS_PER_SESSION + 1)):
+        if not hist[d]:
+            continue
+        k = min(hist[d], room // d)
+        if by_session and d == half and SLOTS_PER_SESSION % 2 == 0:
+            k = min(k, 2 * (sessions - big) - halves)
+        elif by_session and d > half:
+            k = min(k, sessions - big - (halves + 1) // 2)
+        k = max(k, 0)
+        room -= k * d
+        count += k
+        if d > half: big += k
+        elif d == half and SLOTS_PER_SESSION % 2 == 0: halves += k
+        if k < hist[d]: # Môn dài hơn càng không thêm được
+            break
+    return count
+
+def max_flow(num_nodes, edges, source, sink):
+    """Luồng cực đại (Dinic) trên đồ thị có hướng edges = [(u, v, sức chứa)]"""
+    head = [[] for _ in range(num_nodes)]
+    to, cap = [], []
+    for u, v, c in edges:
+        head[u].append(len(to)); to.append(v); cap.append(c)
+        head[v].append(len(to)); to.append(u); cap.append(0)
+    flow = 0
+    while True:
+        # BFS dựng đồ thị phân tầng
+        level = [-1] * num_nodes
+        level[source] = 0
+        queue = deque([source])
+        while queue:
+            u = queue.popleft()
+            for e in head[u]:
+                if cap[e] > 0 and level[to[e]] < 0:
+                    level[to[e]] = level[u] + 1
+                    queue.append(to[e])
+        if level[sink] < 0:
+            return flow
+        # DFS (khử đệ quy) tìm luồng chặn
+        it = [0] * num_nodes
+        while True:
+            path, u = [], source
+            while u != sink:
+                while it[u] < len(head[u]):
+                    e = head[u][it[u]]
+                    if cap[e] > 0 and level[to[e]] == level[u] + 1:
+                        break
+                    it[u] += 1
+                if it[u] == len(head[u]): # Ngõ cụt: bỏ đỉnh u khỏi tầng, lùi 1 bước
+                    level[u] = -1
+                    if not path:
+                        break
+                    u = to[path.pop() ^ 1]
+                    it[u] += 1
+                    continue
+                e = head[u][it[u]]
+                path.append(e)
+                u = to[e]
+            if u != sink:
+                break
+            push = min(cap[e] for e in path)
+            for e in path:
+                cap[e] -= push
+                cap[e ^ 1] += push
+            flow += push
+
+def compute_upper_bounds(inst):
+    """
+    Các cận trên số môn xếp được của CompiledInstance (chi tiết trong BOUND_NAMES):
+    - tasks: tổng số môn; assignable: bỏ môn không GV nào dạy / dài hơn 1 buổi
+    - class_capacity: mỗi lớp tối đa 60 tiết (lấy môn ngắn trước)
+    - session_packing: như trên nhưng môn không được vắt qua buổi (sessions_needed <= 10)
+    - single_teacher: môn chỉ 1 GV dạy phải dồn hết cho GV đó, GV chỉ chứa được max_packable môn
+    - teacher_flow: luồng cực đại nguồn -> môn (số lớp học môn) -> GV dạy được -> đích
+      (sức chứa GV = max_packable trên mọi môn GV đó dạy được)
+    upper_bound = cận nhỏ nhất.
+    """
+    M, T = inst.M, inst.T
+    max_d = max(inst.durations, default=0)
+    assignable = [inst.num_eligible[tid] > 0 and inst.d[tid] <= SLOTS_PER_SESSION
+                  for tid in range(inst.num_tasks)]
+
+    # Histogram thời lượng các môn (xếp được) theo lớp, và số lớp học mỗi môn
+    class_hist = [[0] * (max_d + 1) for _ in range(inst.N)]
+    demand = [0] * (M + 1)
+    for tid in range(inst.num_tasks):
+        if assignable[tid]:
+            class_hist[inst.c[tid]][inst.d[tid]] += 1
+            demand[inst.m[tid]] += 1
+
+    bounds = {'tasks': inst.num_tasks, 'assignable': sum(assignable)}
+    bounds['class_capacity'] = sum(max_packable(h, by_session=False) for h in class_hist)
+    bounds['session_packing'] = sum(max_packable(h) for h in class_hist)
+
+    # Histogram môn bắt buộc (môn chỉ 1 GV) và mọi môn dạy được, theo GV
+    forced_hist = [[0] * (max_d + 1) for _ in range(T)]
+    teacher_hist = [[0] * (max_d + 1) for _ in range(T)]
+    flexible = 0
+    for m_id in range(1, M + 1):
+        if not demand[m_id]:
+            continue
+        teachers = inst.subject_teachers[m_id]
+        d = inst.durations[m_id - 1]
+        if len(teachers) == 1:
+            forced_hist[teachers[0]][d] += demand[m_id]
+        else:
+            flexible += demand[m_id]
+        for t in teachers:
+            teacher_hist[t][d] += demand[m_id]
+    bounds['single_teacher'] = flexible + sum(max_packable(h) for h in forced_hist if any(h))
+
+    # Luồng tham lam trước (mỗi môn dồn cho GV còn sức chứa), Dinic chỉ chạy trên đồ thị thặng dư:
+    # cạnh ngược GV -> môn với lượng đã dồn cho phép chuyển lại sang GV khác
+    capacity = [max_packable(h) for h in teacher_hist]
+    left = demand[:]
+    edges, greedy = [], 0
+    for m_id in range(1, M + 1):
+        for t in inst.subject_teachers[m_id]:
+            push = min(left[m_id], capacity[t])
+            if push:
+                left[m_id] -= push
+                capacity[t] -= push
+                greedy += push
+                edges.append((M + 1 + t, m_id, push))
+    # Đỉnh: 0 = nguồn, 1..M = môn, M+1..M+T = GV, M+T+1 = đích
+    sink = M + T + 1
+    edges += [(0, m_id, left[m_id]) for m_id in range(1, M + 1) if left[m_id]]
+    edges += [(m_id, M + 1 + t, demand[m_id]) for m_id in range(1, M + 1) if demand[m_id]
+              for t in inst.subject_teachers[m_id]]
+    edges += [(M + 1 + t, sink, capacity[t]) for t in range(T) if capacity[t]]
+    if any(left) and any(capacity): # Tham lam đã dồn hết nhu cầu / hết sức chứa thì đã là cực đại
+        greedy += max_flow(M + T + 2, edges, 0, sink)
+    bounds['teacher_flow'] = greedy
+
+    bounds['upper_bound'] = min(bounds[name] for name in BOUND_NAMES)
+    return bounds
+
+def classify(class_load_percent, scarcity_percent):
+    """Xếp hạng độ khó (HARD / MEDIUM / EASY) kèm lý do"""
+    if class_load_percent > 90:
+        return "HARD", "Full Class Schedule"
+    if scarcity_percent > 50:
+        return "HARD", "Lack Teachers"
+    if class_load_percent > 75 or scarcity_percent > 20:
+        return "MEDIUM", "Constrained"
+    return "EASY", "Resource Open"
+
+def compute_features(inst):
+    """
+    Đặc trưng của 1 CompiledInstance (dict phẳng: số hoặc chuỗi -> 1 dòng của bảng đặc trưng):
+    kích thước, tải lớp, độ khan hiếm GV, thời lượng, các cận trên và xếp hạng độ khó.
+    """
+    N, num_tasks = inst.N, inst.num_tasks
+
+    # 1. Tải của Lớp (Class Load)
+    class_loads = [0] * N
+    for c, d in zip(inst.c, inst.d):
+        class_loads[c] += d
+    max_c_load = max(class_loads, default=0)
+    class_load_percent = (max_c_load / MAX_SLOTS) * 100
+
+    # 2. Độ khan hiếm Giáo viên (Teacher Scarcity)
+    # Tỷ lệ số task chỉ có đúng 1 giáo viên dạy được
+    strict_tasks = sum(1 for k in inst.num_eligible if k == 1)
+    scarcity_percent = (strict_tasks / num_tasks) * 100 if num_tasks else 0
+
+    # 3. Cận trên số môn xếp được (cận chặt nhất + tên cận đạt được)
+    bounds = compute_upper_bounds(inst)
+    difficulty, reason = classify(class_load_percent, scarcity_percent)
 
+    return {
+        'N': N, 'T': inst.T, 'M': inst.M, 'tasks': num_tasks,
+        'max_class_load': max_c_load,
+        'mean_class_load': statistics.fmean(class_loads) if class_loads else 0.0,
+        'class_load_percent': class_load_percent,
+        'scarcity_percent': scarcity_percent,
+        'mean_eligible': statistics.fmean(inst.num_eligible) if num_tasks else 0.0,
+        'max_duration': max(inst.d, default=0),
+        'mean_duration': statistics.fmean(inst.d) if num_tasks else 0.0,
+        **{f"ub_{name}": bounds[name] for name in BOUND_NAMES},
+        'upper_bound': bounds['upper_bound'],
+        'bound_by': min(BOUND_NAMES, key=lambda name: bounds[name]),
+        'difficulty': difficulty,
+        'reason': reason,
+    }
+
+def _summary_row(file_name, features):
+    """Dòng hiển thị của bảng phân tích từ 1 dòng đặc trưng"""
+    return {
+        "name": file_name,
+        "N": int(features['N']),
+        "T": int(features['T']),
+        "Tasks": int(features['tasks']),
+        "MaxClassLoad": f"{int(features['max_class_load'])} ({features['class_load_percent']:.0f}%)",
+        "TeacherScarcity": f"{features['scarcity_percent']:.0f}%",
+        "MaxDur": int(features['max_duration']),
+        "UpperBound": int(features['upper_bound']),
+        "BoundBy": str(features['bound_by']),
+        "Difficulty": str(features['difficulty']),
+        "Reason": str(features['reason'])
+    }
+
+def _analyze_path(file_path):
+    """Việc của 1 process trong pool: (đường dẫn, đặc trưng hoặc None, lỗi hoặc None)"""
+    try:
+        inst = load_compiled_instance(file_path)
+        if inst is None:
+            return file_path, None, "sai định dạng"
+        return file_path, compute_features(inst), None
     except Exception as e:
-        print(f"Lỗi khi đọc file {file_name}: {e}")
-        return None
+        return file_path, None, f"{type(e).__name__}: {e}"
+
+# --- ĐỌC / GHI BẢNG ĐẶC TRƯNG ---
+
+def load_features(path=FEATURES_FILE):
+    """Bảng đặc trưng dạng cột {tên cột: mảng NumPy}; chưa có file / file hỏng thì trả về {}"""
+    from utils import load_numpy
+    np = load_numpy()
+    if np is None or not os.path.exists(path):
+        return {}
+    try:
+        with np.load(path) as z:
+            return {name: z[name] for name in z.files}
+    except Exception:
+        return {}
+
+def feature_rows(table):
+    """Bảng dạng cột -> {content_hash: dict đặc trưng} (chỉ các dòng đúng FEATURES_VERSION)"""
+    if not table:
+        return {}
+    names = [name for name in table if name not in ('content_hash', 'version')]
+    rows = {}
+    for i, key in enumerate(table['content_hash'].tolist()):
+        if int(table['version'][i]) == FEATURES_VERSION:
+            rows[key] = {name: table[name][i].item() for name in names}
+    return rows
+
+def save_features(rows, path=FEATURES_FILE):
+    """Ghi list dict đặc trưng (cùng bộ khóa) thành bảng dạng cột .npz (ghi file tạm rồi đổi tên)"""
+    from utils import load_numpy
+    np = load_numpy()
+    if np is None or not rows:
+        return
+    columns = {name: np.array([row[name] for row in rows]) for name in rows[0]}
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        np.savez(f, **columns)
+    os.replace(tmp_path, path)
+
+def analyze_corpus(files, jobs=1, features_path=FEATURES_FILE, use_cache=True):
+    """
+    Phân tích danh sách file, trả về {đường dẫn: dòng đặc trưng} (bỏ qua file lỗi).
+    - Đặc trưng đã có trong bảng (cùng hash nội dung + FEATURES_VERSION) thì dùng lại
+    - File còn lại chia cho jobs process (jobs = 1: chạy tuần tự trong process hiện tại)
+    - Bảng đặc trưng được ghi lại gồm mọi file của lần chạy này và các dòng cũ còn giữ
+    """
+    from instance_cache import content_key
+
+    cached = feature_rows(load_features(features_path)) if use_cache else {}
+    hashes, results, pending = {}, {}, []
+    for path in files:
+        with open(path, 'rb') as f:
+            hashes[path] = content_key(f.read())
+        row = cached.get(hashes[path])
+        if row is not None:
+            results[path] = {**row, 'dataset': os.path.basename(path)}
+        else:
+            pending.append(path)
+
+    if pending:
+        print(f"Phân tích {len(pending)} file mới / đã thay đổi ({len(results)} file dùng lại từ '{features_path}')...")
+    if jobs > 1 and len(pending) > 1:
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            outcomes = list(pool.map(_analyze_path, pending, chunksize=max(1, len(pending) // (jobs * 4))))
+    else:
+        outcomes = [_analyze_path(path) for path in pending]
+    for path, features, error in outcomes:
+        if features is None:
+            print(f"Lỗi khi đọc file {os.path.basename(path)}: {error}")
+            continue
+        results[path] = {'dataset': os.path.basename(path), **features}
+
+    # Ghi lại bảng: các dòng cũ (file khác / thư mục khác) + kết quả lần này, khóa theo hash nội dung
+    merged = dict(cached)
+    for path, row in results.items():
+        merged[hashes[path]] = row
+    save_features([{'content_hash': key, 'version': FEATURES_VERSION, **row} for key, row in merged.items()],
+                  features_path)
+    return results
 
 def main():
+    parser = argparse.ArgumentParser(description="Phân tích độ khó các test case xếp thời khóa biểu")
+    parser.add_argument("folder", nargs="?", default=INPUT_FOLDER,
+                        help="Thư mục chứa file .txt (mặc định %(default)s)")
+    parser.add_argument("--jobs", type=int, default=1, help="Số process phân tích song song (mặc định 1)")
+    parser.add_argument("--features", default=FEATURES_FILE,
+                        help="File bảng đặc trưng dạng cột, đồng thời là cache (mặc định %(default)s)")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="Phân tích lại mọi file, không dùng đặc trưng đã lưu")
+    args = parser.parse_args()
+    input_folder = args.folder
+
     # Kiểm tra folder tồn tại không
-    if not os.path.exists(INPUT_FOLDER):
-        print(f"Lỗi: Folder '{INPUT_FOLDER}' không tồn tại. Hãy tạo folder và bỏ file txt vào.")
+    if not os.path.exists(input_folder):
+        print(f"Lỗi: Folder '{input_folder}' không tồn tại. Hãy tạo folder và bỏ file txt vào.")
         return
 
     # Lấy danh sách file .txt
-    files = sorted([f for f in os.listdir(INPUT_FOLDER) if f.endswith(".txt")])
+    files = sorted([f for f in os.listdir(input_folder) if f.endswith(".txt")])
     
     if not files:
-        print(f"Không tìm thấy file .txt nào trong folder '{INPUT_FOLDER}'")
+        print(f"Không tìm thấy file .txt nào trong folder '{input_folder}'")
         return
 
-    print(f"Đang phân tích {len(files)} file trong folder '{INPUT_FOLDER}'...\n")
+    print(f"Đang phân tích {len(files)} file trong folder '{input_folder}'...\n")
+    features = analyze_corpus([os.path.join(input_folder, f) for f in files], max(1, args.jobs),
+                              args.features, use_cache=not args.no_cache)
     
     results = []
     
     # Header bảng
-    header = f"{'FILE NAME':<15} | {'N':<4} {'T':<4} {'TASKS':<6} | {'CLASS LOAD':<12} | {'SCARCITY':<10} | {'RANK':<8} | {'REASON'}"
-    print("-" * 90)
+    header = (f"{'FILE NAME':<15} | {'N':<4} {'T':<4} {'TASKS':<6} | {'CLASS LOAD':<12} | {'SCARCITY':<10} | "
+              f"{'UPPER BOUND':<26} | {'RANK':<8} | {'REASON'}")
+    print("-" * 120)
     print(header)
-    print("-" * 90)
+    print("-" * 120)
 
     for file_name in files:
-        file_path = os.path.join(INPUT_FOLDER, file_name)
-        res = analyze_single_file(file_path, file_name)
-        
-        if res:
-            results.append(res)
-            # In từng dòng kết quả
-            print(f"{res['name']:<15} | {res['N']:<4} {res['T']:<4} {res['Tasks']:<6} | {res['MaxClassLoad']:<12} | {res['TeacherScarcity']:<10} | {res['Difficulty']:<8} | {res['Reason']}")
-
-    print("-" * 90)
+        row = features.get(os.path.join(input_folder, file_name))
+        if row is None:
+            continue
+        res = _summary_row(file_name, row)
+        results.append(res)
+        # In từng dòng kết quả, cận trên kèm cận nào chặt nhất (VD: 1095 (teacher_flow))
+        bound_str = f"{res['UpperBound']} ({res['BoundBy']})"
+        print(f"{res['name']:<15} | {res['N']:<4} {res['T']:<4} {res['Tasks']:<6} | {res['MaxClassLoad']:<12} | {res['TeacherScarcity']:<10} | {bound_str:<26} | {res['Difficulty']:<8} | {res['Reason']}")
+
+    print("-" * 120)
     
     # Thống kê nhanh
     hard_count = sum(1 for r in results if r['Difficulty'] == 'HARD')
     print(f"\nTỔNG KẾT: {len(results)} files.")
     print(f"- Số lượng HARD: {hard_count} (Cần SA/Tabu/ILP)")
     print(f"- Số lượng MEDIUM/EASY: {len(results) - hard_count} (GA/Greedy là đủ)")
+    print(f"- Bảng đặc trưng: '{args.features}' (chọn solver theo lịch sử benchmark: python portfolio.py)")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
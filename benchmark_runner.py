@@ -1,10 +1,26 @@
 import time
-import numpy as np
-import pandas as pd
+import random
 import os
 import glob
 import importlib.util
 import inspect
+import statistics
+import argparse
+import signal
+import threading
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor, as_completed
+try:
+    import resource # Chỉ có trên Unix (dùng cho RLIMIT_AS)
+except ImportError:
+    resource = None
+from instance_cache import load_cached_instance, content_key
+from testcase_gen import generate_testcase_np, planted_optimum
+from results_store import RESULTS_DB, file_version, run_seed, open_store, load_completed, save_result
+from validator import validate_solution
+from analyzer import compute_upper_bounds, load_features, feature_rows
+from utils import PHASES, PhaseTimer, load_numpy
+from profiling import PROFILE_MODES, profile_call, profile_path, peak_rss_mb, AllocTracker, import_time_report
 
 # --- 1. CẤU HÌNH BENCHMARK ---
 
@@ -30,6 +46,33 @@ TEST_MODES = [
 # Số lần chạy lại mỗi thuật toán để tính trung bình
 NUM_RUNS = 3
 
+# Mốc "đạt mục tiêu" cho time-to-target = 99% điểm tốt nhất từng thấy trên dataset
+# (dataset có lời giải cấy sẵn <tên>.sol thì tính theo điểm tối ưu đã biết)
+TTT_TARGET_RATIO = 0.99
+
+# Giới hạn cứng cho mỗi lượt chạy (không tin solver tự dừng đúng time_limit)
+HARD_TIMEOUT_FACTOR = 1.2   # Kill sau time_limit * 1.2 + HARD_TIMEOUT_GRACE giây
+HARD_TIMEOUT_GRACE = 5.0    # Bù thời gian khởi động process + nạp dữ liệu
+MEMORY_LIMIT_MB = 4096      # RLIMIT_AS của process chạy solver (0 = không giới hạn)
+TRACK_ALLOC_SLOWDOWN = 5.0  # Bật tracemalloc thì nới hạn cứng gấp từng này lần (solver chạy chậm hẳn)
+
+# Chế độ --scaling: sinh dữ liệu với N (số lớp) gấp đôi dần, giữ nguyên độ dày / độ khan hiếm GV,
+# T = N / 2 và M = 0.8 N (cùng tỉ lệ với 05_large_medium), mỗi solver chạy 1 lần với ngân sách cố định
+SCALING_DIR = ".scaling_cases"
+SCALING_MIN_N = 10
+SCALING_MAX_N = 2560
+SCALING_DENSITY = 0.8
+SCALING_SCARCITY = 0.25
+SCALING_TIME_LIMIT = 10.0
+SCALING_SEED = 2024
+# Solver "ngừng mở rộng" ở N đầu tiên nó không chạy xong (timeout / oom / ...)
+# hoặc chất lượng < SCALING_QUALITY_RATIO * chất lượng tốt nhất của các solver tại N đó
+SCALING_QUALITY_RATIO = 0.9
+
+# Chế độ --import-report: solver chạy như CLI phải khởi động xong trong 1 phần nhỏ TIME_LIMIT (0.95s)
+CLI_TIME_BUDGET = 0.95
+STARTUP_WARN_RATIO = 0.2 # Cảnh báo khi khởi động + import chiếm hơn 20% ngân sách
+
 # --- 2. HÀM HỖ TRỢ ---
 
 def get_all_test_files(directory):
@@ -63,29 +106,375 @@ def load_solver(module_name):
         print(f"❌ Lỗi khi nạp file '{file_path}': {e}")
         return None
 
-def call_solver_safe(func, input_content, limit):
+def call_solver(func, input_content, limit, progress=None, details=False, timer=None, stats=None,
+                upper_bound=None):
     """
-    Gọi hàm solve an toàn.
+    Gọi hàm solve (lỗi được ném ra ngoài cho nơi gọi xử lý).
     - Truyền time_limit nếu hàm hỗ trợ.
+    - Truyền progress (callback báo lời giải tốt nhất hiện tại) nếu hàm hỗ trợ.
+    - details=True: yêu cầu trả về danh sách dòng lời giải nếu hàm hỗ trợ.
+    - timer: PhaseTimer đo thời gian từng pha, truyền nếu hàm hỗ trợ.
+    - stats: dict nhận bộ đếm thông lượng (số vòng lặp, nước đi...), truyền nếu hàm hỗ trợ.
+    - upper_bound: cận trên số môn xếp được (solver chạm cận thì dừng sớm), truyền nếu hàm hỗ trợ.
+    """
+    sig = inspect.signature(func)
+    kwargs = {}
+    
+    # Kiểm tra xem hàm solve có nhận tham số time_limit không
+    # (Lưu ý: Các thuật toán meta-heuristic CẦN hỗ trợ time_limit để dừng đúng lúc)
+    if 'time_limit' in sig.parameters:
+        kwargs['time_limit'] = limit
+    if progress is not None and 'progress' in sig.parameters:
+        kwargs['progress'] = progress
+    if details and 'details' in sig.parameters:
+        kwargs['details'] = True
+    if timer is not None and 'timer' in sig.parameters:
+        kwargs['timer'] = timer
+    if stats is not None and 'stats' in sig.parameters:
+        kwargs['stats'] = stats
+    if upper_bound is not None and 'upper_bound' in sig.parameters:
+        kwargs['upper_bound'] = upper_bound
+    return func(input_content, **kwargs)
+
+def time_to_target(trace, target):
+    """Thời điểm đầu tiên lời giải tốt nhất đạt target (None nếu không bao giờ đạt)"""
+    for elapsed, best in trace:
+        if best >= target:
+            return elapsed
+    return None
+
+def trace_auc(trace, horizon, target):
     """
+    Diện tích dưới đường best-so-far trên [0, horizon], chuẩn hóa theo target * horizon
+    (điểm vượt target tính bằng target). 1.0 = đạt mục tiêu ngay lập tức,
+    càng nhỏ nghĩa là hội tụ càng chậm hoặc càng kém.
+    """
+    if horizon <= 0 or target <= 0:
+        return 0.0
+    area, prev_t, prev_best = 0.0, 0.0, 0
+    for elapsed, best in trace:
+        t = min(max(elapsed, prev_t), horizon)
+        area += (t - prev_t) * prev_best
+        prev_t, prev_best = t, max(prev_best, min(best, target))
+    area += (horizon - prev_t) * prev_best
+    return area / (horizon * target)
+
+def _round_or_none(value, digits):
+    return round(value, digits) if value is not None else None
+
+def _mean(values):
+    """Trung bình (nan nếu rỗng, giống np.mean) - thống kê báo cáo không cần NumPy"""
+    return statistics.fmean(values) if values else float('nan')
+
+def _gap_percent(score, reference):
+    """Khoảng cách (%) từ score tới điểm tham chiếu (tối ưu / cận trên), None nếu không có tham chiếu"""
+    return round(100 * (reference - score) / reference, 2) if reference else None
+
+def counter_rates(r):
+    """
+    Bộ đếm thông lượng của 1 lượt chạy quy ra số lần / giây.
+    Chia cho thời gian pha 'improve' nếu solver có đo (chỉ vòng lặp chính), không thì cả lượt chạy.
+    """
+    seconds = r['phases'].get('improve') or r['elapsed']
+    if not seconds:
+        return {}
+    return {name: count / seconds for name, count in r['stats'].items()}
+
+# --- 3. CHẠY CÔ LẬP TỪNG Ô (SUBPROCESS + GIỚI HẠN CỨNG) ---
+
+_MP_CONTEXT = None
+_MP_CONTEXT_LOCK = threading.Lock()
+
+def _mp_context():
+    """
+    Context tạo process con, khởi tạo 1 lần (các thread gọi đồng thời phải dùng chung).
+    forkserver (Linux/macOS): process con tách từ server sạch, không kế thừa thread của runner;
+    server nạp sẵn các module dùng chung nên mỗi lượt chạy khởi động nhanh.
+    """
+    global _MP_CONTEXT
+    with _MP_CONTEXT_LOCK:
+        if _MP_CONTEXT is None:
+            if 'forkserver' in multiprocessing.get_all_start_methods():
+                _MP_CONTEXT = multiprocessing.get_context('forkserver')
+                _MP_CONTEXT.set_forkserver_preload(['__main__', 'numpy', 'utils', 'occupancy', 'instance_cache', 'validator'])
+            else:
+                _MP_CONTEXT = multiprocessing.get_context('spawn')
+        return _MP_CONTEXT
+
+class _CheckpointTimer(PhaseTimer):
+    """PhaseTimer báo AllocTracker mỗi lần solver đổi pha (chụp lại cấp phát nếu bộ nhớ tăng)"""
+    __slots__ = ('tracker',)
+
+    def __init__(self, tracker):
+        super().__init__()
+        self.tracker = tracker
+
+    def phase(self, name):
+        self.tracker.checkpoint()
+        super().phase(name)
+
+def _run_cell_child(cell, conn, mem_limit_mb, profile=None, track_alloc=False):
+    """
+    Thân process con của 1 ô benchmark: đặt giới hạn RAM, đặt seed, nạp solver + instance, chạy solve.
+    Lời giải trả về được validator kiểm tra lại, score là điểm chuẩn do validator tính
+    (solver không trả về lời giải thì giữ nguyên số solver báo, check = None).
+    profile ('cprofile' | 'sample'): chạy solve dưới profiler, ghi kết quả vào PROFILE_DIR.
+    track_alloc: bật tracemalloc, ghi lại đỉnh bộ nhớ Python và các dòng cấp phát nhiều nhất.
+    Gửi về process cha qua conn:
+    ('progress', elapsed, score) | ('done', score, elapsed, check, phases, memory, stats)
+    | ('oom', msg, peak_rss) | ('error', msg, peak_rss)
+    """
+    filepath, t_label, t_limit, module_name, run_idx, seed = cell
     try:
-        sig = inspect.signature(func)
-        
-        # Kiểm tra xem hàm solve có nhận tham số time_limit không
-        if 'time_limit' in sig.parameters:
-            return func(input_content, time_limit=limit)
+        # Giới hạn bộ nhớ ảo: vượt quá thì cấp phát thất bại -> MemoryError
+        if resource is not None and mem_limit_mb:
+            limit_bytes = int(mem_limit_mb) * 1024 * 1024
+            resource.setrlimit(resource.RLIMIT_AS, (limit_bytes, limit_bytes))
+        # Cố định seed -> lượt chạy tái lập được (solver dùng module random / np.random)
+        random.seed(seed)
+        np = load_numpy() # Đã nạp sẵn trong forkserver (cache .npz / validator cần NumPy)
+        if np is not None: np.random.seed(seed)
+
+        solve_func = load_solver(module_name)
+        if solve_func is None:
+            conn.send(('error', f"Không nạp được {module_name}.py", peak_rss_mb()))
+            return
+        instance = load_cached_instance(filepath)
+        # Cận trên (vài ms, không tính vào thời gian chạy): solver chạm cận thì dừng sớm
+        upper_bound = compute_upper_bounds(instance)['upper_bound']
+
+        tracker = AllocTracker() if track_alloc else None
+        def progress(elapsed, best_score):
+            if tracker is not None: tracker.checkpoint()
+            conn.send(('progress', elapsed, best_score))
+
+        timer = PhaseTimer() if tracker is None else _CheckpointTimer(tracker)
+        if tracker is not None: tracker.start()
+        stats = {}
+        start_time = time.time()
+        if profile:
+            result = profile_call(profile, profile_path(filepath, module_name, t_label, run_idx),
+                                  call_solver, solve_func, instance, t_limit, progress, True, timer, stats,
+                                  upper_bound)
         else:
-            # Nếu hàm không hỗ trợ time_limit, gọi bình thường
-            # (Lưu ý: Các thuật toán meta-heuristic CẦN hỗ trợ time_limit để dừng đúng lúc)
-            return func(input_content)
-            
+            result = call_solver(solve_func, instance, t_limit, progress, details=True, timer=timer,
+                                 stats=stats, upper_bound=upper_bound)
+        elapsed = time.time() - start_time # Không tính thời gian kiểm tra lời giải
+
+        memory = {'peak_rss_mb': peak_rss_mb()}
+        if tracker is not None:
+            memory['py_peak_mb'], memory['top_allocs'] = tracker.stop()
+
+        check = None
+        if isinstance(result, list):
+            check = validate_solution(instance, result)
+            result = check['score']
+        conn.send(('done', result, elapsed, check, timer.phases, memory, stats))
+    except MemoryError:
+        conn.send(('oom', "MemoryError", peak_rss_mb()))
     except Exception as e:
-        print(f"❌ Runtime Error: {e}")
-        return 0
+        conn.send(('error', f"{type(e).__name__}: {e}", peak_rss_mb()))
+    finally:
+        conn.close()
+
+def run_cell(cell, mem_limit_mb=MEMORY_LIMIT_MB, profile=None, track_alloc=False):
+    """
+    Chạy 1 ô benchmark (file dữ liệu, chế độ thời gian, thuật toán, lần chạy) trong process riêng.
+    - Quá time_limit * HARD_TIMEOUT_FACTOR + HARD_TIMEOUT_GRACE giây (x TRACK_ALLOC_SLOWDOWN khi
+      track_alloc) -> kill, trạng thái 'timeout'
+    - Hết bộ nhớ (MemoryError, hoặc bị SIGKILL) -> 'oom'; lỗi khác -> 'error'
+    - Lời giải vi phạm ràng buộc -> 'invalid' (score = 0)
+    Khi không chạy xong, score là lời giải tốt nhất solver đã báo qua progress (0 nếu chưa báo).
+    Trả về dict: filepath, mode, module, run, seed, status, score, elapsed,
+    trace (list (elapsed, best_score) theo thời gian, điểm cuối là kết quả cuối cùng),
+    check (kết quả validate_solution, None nếu không kiểm tra được),
+    phases ({pha: giây} solver tự đo, rỗng nếu solver không hỗ trợ / không chạy xong),
+    memory ({'peak_rss_mb', và khi track_alloc: 'py_peak_mb', 'top_allocs'}),
+    stats (bộ đếm thông lượng solver trả về, rỗng nếu solver không hỗ trợ / không chạy xong).
+    """
+    filepath, t_label, t_limit, module_name, run_idx, seed = cell
+    ctx = _mp_context()
+    recv_conn, send_conn = ctx.Pipe(duplex=False)
+    proc = ctx.Process(target=_run_cell_child, args=(cell, send_conn, mem_limit_mb, profile, track_alloc),
+                       daemon=True)
+
+    start_time = time.time()
+    deadline = start_time + t_limit * HARD_TIMEOUT_FACTOR + HARD_TIMEOUT_GRACE
+    if track_alloc:
+        deadline += (deadline - start_time) * (TRACK_ALLOC_SLOWDOWN - 1)
+    proc.start()
+    send_conn.close() # Chỉ process con giữ đầu ghi -> con chết thì recv gặp EOF
+
+    status, score, elapsed, check, phases, memory, stats = None, 0, None, None, {}, {}, {}
+    incumbent = 0
+    trace = []
+    while status is None:
+        remaining = deadline - time.time()
+        if remaining <= 0:
+            status = 'timeout'
+            break
+        if not recv_conn.poll(min(remaining, 0.5)):
+            continue
+        try:
+            msg = recv_conn.recv()
+        except EOFError:
+            break # Process con chết mà không kịp báo
+        if msg[0] == 'progress':
+            incumbent = msg[2]
+            trace.append((msg[1], msg[2]))
+        elif msg[0] == 'done':
+            status, score, elapsed, check, phases, memory, stats = 'ok', *msg[1:]
+            if check is not None and not check['valid']:
+                status = 'invalid'
+                broken = ", ".join(f"{k}={v}" for k, v in check['violations'].items() if v)
+                print(f"❌ {module_name} / {os.path.basename(filepath)}: lời giải sai ({broken})")
+        else:
+            status, memory = msg[0], {'peak_rss_mb': msg[2]}
+            print(f"❌ {module_name} / {os.path.basename(filepath)}: {msg[1]}")
+
+    if proc.is_alive() and status not in ('ok', 'invalid'):
+        if not memory: # Bị kill do quá giờ -> đọc RSS đỉnh từ bên ngoài trước khi kill
+            memory = {'peak_rss_mb': peak_rss_mb(proc.pid)}
+        proc.kill()
+    proc.join()
+    recv_conn.close()
+
+    if status is None:
+        # Bị hệ điều hành giết (thường là OOM killer) hoặc crash
+        status = 'oom' if proc.exitcode == -signal.SIGKILL else 'error'
+    if status not in ('ok', 'invalid'):
+        score = incumbent
+    if elapsed is None:
+        elapsed = time.time() - start_time
+    # Lời giải cuối sai thì các incumbent đã báo cũng không đáng tin -> bỏ cả đường hội tụ
+    if status == 'invalid':
+        trace = []
+    # Solver không báo progress (hoặc kết quả cuối khác incumbent) -> chốt thêm điểm cuối
+    if not trace or trace[-1][1] != score:
+        trace.append((elapsed, score))
+    return {
+        'filepath': filepath, 'mode': t_label, 'module': module_name, 'run': run_idx, 'seed': seed,
+        'status': status, 'score': score, 'elapsed': elapsed, 'trace': trace, 'check': check,
+        'phases': phases, 'memory': memory, 'stats': stats
+    }
 
-# --- 3. CHƯƠNG TRÌNH CHÍNH ---
+# --- 4. CHƯƠNG TRÌNH CHÍNH ---
+
+def load_solvers(algorithms=None):
+    """
+    Chọn các thuật toán sẽ chạy -> {tên module: tên hiển thị}.
+    algorithms: danh sách tên module (None = mọi solver trong ALGORITHMS; tên ngoài ALGORITHMS
+    thì hiển thị bằng chính tên module).
+    Chỉ kiểm tra file tồn tại, không nạp module: mỗi process con tự nạp đúng solver của nó,
+    nên runner không phải trả chi phí import (VD: ortools) của mọi solver.
+    """
+    solvers = {}
+    print(f"\n📦 ĐANG CHỌN CÁC THUẬT TOÁN...")
+    for filename in (algorithms or ALGORITHMS):
+        display_name = ALGORITHMS.get(filename, filename)
+        if os.path.exists(f"{filename}.py"):
+            solvers[filename] = display_name
+            print(f"   ✅ Đã chọn: {display_name:<20} ({filename}.py)")
+        else:
+            print(f"   ⚠️  Bỏ qua:  {filename}.py (Không tìm thấy)")
+    print(f"{'='*70}\n")
+
+    if not solvers:
+        print("❌ LỖI: Không tìm thấy bất kỳ thuật toán nào để chạy.")
+    return solvers
+
+def prepare_datasets(files):
+    """
+    Đọc + tiền xử lý mỗi file 1 lần qua cache (theo hash nội dung);
+    các process chạy solver sau đó chỉ nạp lại bản .npz đã có sẵn.
+    Trả về (các file đọc được, {file: hash nội dung}).
+    """
+    datasets = []
+    dataset_hashes = {}
+    for filepath in files:
+        filename = os.path.basename(filepath)
+        try:
+            instance = load_cached_instance(filepath)
+            with open(filepath, 'rb') as f:
+                dataset_hashes[filepath] = content_key(f.read())
+        except Exception as e:
+            print(f"❌ Lỗi đọc file {filename}: {e}")
+            continue
+        if instance is None:
+            print(f"❌ File {filename} sai định dạng")
+            continue
+        datasets.append(filepath)
+    return datasets, dataset_hashes
 
-def run_benchmark():
+def execute_cells(cells, solvers, dataset_hashes, jobs=1, mem_limit_mb=MEMORY_LIMIT_MB,
+                  results_db=RESULTS_DB, resume=True, profile=None, track_alloc=False):
+    """
+    Chạy danh sách ô (filepath, mode, time_limit, module, run, seed), mỗi ô 1 process (run_cell).
+    Ô đã có trong results_db (resume=True) thì dùng lại; ô chạy xong được ghi ngay vào kho.
+    jobs > 1: chạy đồng thời tối đa jobs ô. Trả về list kết quả (dict của run_cell, không theo thứ tự).
+    """
+    # Khóa của ô trong kho kết quả: nội dung dataset + phiên bản (hash mã nguồn) solver
+    versions = {module_name: file_version(f"{module_name}.py") for module_name in solvers}
+    def store_key(cell):
+        filepath, t_label, t_limit, module_name, run_idx, _ = cell
+        return (dataset_hashes[filepath], t_label, t_limit, module_name, versions[module_name], run_idx)
+
+    store = open_store(results_db) if not (profile or track_alloc) else None
+    completed = load_completed(store) if resume and store is not None else {}
+    cell_results, pending = [], []
+    for cell in cells:
+        stored = completed.get(store_key(cell))
+        if stored is None:
+            pending.append(cell)
+        else:
+            cell_results.append({'filepath': cell[0], 'mode': cell[1], 'module': cell[3], 'run': cell[4],
+                                 **stored})
+    if cell_results:
+        print(f"♻️  Dùng lại {len(cell_results)} ô đã có trong '{results_db}'")
+
+    print(f"🚀 BẮT ĐẦU CHẠY BENCHMARK... ({len(pending)} lượt chạy, {jobs} process)")
+
+    def report(done, cell, r):
+        # Ghi ngay vào kho -> bị ngắt giữa chừng cũng không mất các ô đã xong
+        if store is not None:
+            save_result(store, store_key(cell), os.path.basename(r['filepath']), r)
+        print(f"   [{done}/{len(pending)}] {os.path.basename(r['filepath'])} | {r['mode']} | "
+              f"{solvers[r['module']]} #{r['run'] + 1}: {r['score']} ({r['elapsed']:.2f}s, {r['status']})")
+
+    try:
+        if jobs <= 1:
+            for done, cell in enumerate(pending, 1):
+                cell_results.append(run_cell(cell, mem_limit_mb, profile, track_alloc))
+                report(done, cell, cell_results[-1])
+        else:
+            # Mỗi thread chỉ canh 1 process con (chờ pipe / kill khi quá hạn) nên không tốn CPU
+            with ThreadPoolExecutor(max_workers=jobs) as pool:
+                futures = {pool.submit(run_cell, cell, mem_limit_mb, profile, track_alloc): cell for cell in pending}
+                for done, future in enumerate(as_completed(futures), 1):
+                    cell_results.append(future.result())
+                    report(done, futures[future], cell_results[-1])
+    finally:
+        if store is not None:
+            store.close()
+
+    return cell_results
+
+def run_benchmark(jobs=1, mem_limit_mb=MEMORY_LIMIT_MB, results_db=RESULTS_DB, resume=True, profile=None,
+                  track_alloc=False, algorithms=None):
+    """
+    Mỗi ô (dataset, mode, thuật toán, lần chạy) chạy trong 1 process riêng có giới hạn cứng (run_cell).
+    jobs = 1: chạy tuần tự từng ô như cũ.
+    jobs > 1: chạy đồng thời tối đa jobs ô (mỗi lần chạy solver chiếm 1 core),
+    gom kết quả lại thành cùng một bảng.
+    Mỗi ô chạy xong được ghi ngay vào results_db (SQLite); resume=True thì bỏ qua các ô
+    đã có kết quả (cùng nội dung dataset + cùng phiên bản solver).
+    profile ('cprofile' | 'sample'): profile từng lượt chạy, ghi stats theo (dataset, solver) vào
+    PROFILE_DIR và in thời gian từng pha. Thời gian bị profiler làm sai lệch nên chế độ này
+    luôn chạy lại mọi ô và không ghi vào results_db.
+    track_alloc: bật tracemalloc trong từng lượt chạy (top dòng cấp phát nhiều nhất);
+    cũng làm chậm solver nên xử lý giống profile. RSS đỉnh thì luôn được đo.
+    algorithms: chỉ chạy các solver này (tên module), None = toàn bộ ALGORITHMS.
+    """
     # 1. Quét file dữ liệu
     print(f"{'='*70}")
     print(f"📂 ĐANG QUÉT DỮ LIỆU TỪ THƯ MỤC: {DATASET_DIR} ...")
@@ -100,42 +489,94 @@ def run_benchmark():
             print(f"   - {os.path.basename(f)}")
 
     # 2. Nạp các thuật toán
-    solvers = {}
-    print(f"\n📦 ĐANG NẠP CÁC THUẬT TOÁN...")
-    for filename, display_name in ALGORITHMS.items():
-        solver_func = load_solver(filename)
-        if solver_func:
-            solvers[display_name] = solver_func
-            print(f"   ✅ Đã nạp: {display_name:<20} ({filename}.py)")
-        else:
-            print(f"   ⚠️  Bỏ qua:  {filename}.py (Không tìm thấy)")
-    print(f"{'='*70}\n")
-
+    solvers = load_solvers(algorithms)
     if not solvers:
-        print("❌ LỖI: Không tìm thấy bất kỳ thuật toán nào để chạy.")
         return
 
+    # 3. Đọc + tiền xử lý mỗi file 1 lần qua cache (theo hash nội dung)
+    datasets, dataset_hashes = prepare_datasets(valid_data_files)
+
+    # 4. Liệt kê toàn bộ các ô cần chạy (seed theo dataset + lần chạy, giống nhau giữa các solver)
+    cells = [(filepath, mode["label"], mode["time_limit"], module_name, i,
+              run_seed(dataset_hashes[filepath], i))
+             for filepath in datasets
+             for mode in TEST_MODES
+             for module_name in solvers
+             for i in range(NUM_RUNS)]
+    cell_results = execute_cells(cells, solvers, dataset_hashes, jobs, mem_limit_mb,
+                                 results_db, resume, profile, track_alloc)
+
+    # 5. Gom kết quả theo (dataset, mode, thuật toán) theo đúng thứ tự liệt kê
+    order = {cell[:2] + cell[3:5]: i for i, cell in enumerate(cells)}
+    cell_results.sort(key=lambda r: order[(r['filepath'], r['mode'], r['module'], r['run'])])
+
+    # Mục tiêu time-to-target của từng dataset: tỉ lệ TTT_TARGET_RATIO của điểm tối ưu nếu biết trước
+    # (test sinh với lời giải cấy sẵn), ngược lại của điểm tốt nhất từng thấy
+    optima = {fp: planted_optimum(fp) for fp in datasets}
+    # Cận trên số môn xếp được (analyzer): khoảng cách tới cận là cận trên của khoảng cách tới tối ưu.
+    # Lấy thẳng từ bảng đặc trưng của analyzer nếu dataset đã được phân tích (khớp hash nội dung)
+    known = feature_rows(load_features())
+    upper_bounds = {fp: int(known[dataset_hashes[fp]]['upper_bound']) if dataset_hashes[fp] in known
+                    else compute_upper_bounds(load_cached_instance(fp))['upper_bound'] for fp in datasets}
+    targets = {}
+    for r in cell_results:
+        targets[r['filepath']] = max(targets.get(r['filepath'], 0), r['score'])
+    targets = {fp: (optima[fp] or best) * TTT_TARGET_RATIO for fp, best in targets.items()}
+    limits = {mode["label"]: mode["time_limit"] for mode in TEST_MODES}
+
+    grouped = {}
+    run_rows = []
+    trace_rows = []
+    for r in cell_results:
+        target = targets[r['filepath']]
+        r['ttt'] = time_to_target(r['trace'], target)
+        r['auc'] = trace_auc(r['trace'], limits[r['mode']], target)
+        grouped.setdefault((r['filepath'], r['mode'], r['module']), []).append(r)
+
+        key = {"Dataset": os.path.basename(r['filepath']), "Time Limit": r['mode'],
+               "Algorithm": solvers[r['module']], "Run": r['run'] + 1, "Seed": r['seed']}
+        optimum = optima[r['filepath']]
+        run_rows.append({**key, "Status": r['status'], "Score": r['score'],
+                         # Khoảng cách tới tối ưu (chỉ có với test cấy sẵn lời giải)
+                         "Optimum": optimum,
+                         "Gap %": _gap_percent(r['score'], optimum),
+                         "Upper Bound": upper_bounds[r['filepath']],
+                         "UB Gap %": _gap_percent(r['score'], upper_bounds[r['filepath']]),
+                         "Time": round(r['elapsed'], 3),
+                         # Bộ nhớ: RSS đỉnh của process chạy solver, đỉnh bộ nhớ Python + top cấp phát (tracemalloc)
+                         "Peak RSS MB": _round_or_none(r['memory'].get('peak_rss_mb'), 1),
+                         "Py Peak MB": _round_or_none(r['memory'].get('py_peak_mb'), 2),
+                         "Top Allocs": ";".join(f"{where}={size:.2f}MB/{count}"
+                                                for where, size, count in r['memory'].get('top_allocs', []))
+                                       or None,
+                         "TTT": round(r['ttt'], 3) if r['ttt'] is not None else None,
+                         "AUC": round(r['auc'], 4),
+                         # Tiêu chí phụ + chi tiết vi phạm theo validator (trống nếu không kiểm tra được)
+                         "Start Sum": r['check']['start_sum'] if r['check'] else None,
+                         "Violations": ";".join(f"{k}={v}" for k, v in r['check']['violations'].items() if v)
+                                       if r['check'] else None,
+                         # Bộ đếm thông lượng: số đếm thô + quy ra /s
+                         "Counters": ";".join(f"{k}={v}" for k, v in r['stats'].items()) or None,
+                         **{f"{k}/s": round(v, 1) for k, v in counter_rates(r).items()},
+                         # Thời gian từng pha do solver tự đo (giây)
+                         **{f"Phase {p}": round(r['phases'][p], 4) if p in r['phases'] else None
+                            for p in PHASES}})
+        for elapsed, best in r['trace']:
+            trace_rows.append({**key, "Elapsed": round(elapsed, 4), "Best Score": best})
+
     results = []
     
-    print(f"🚀 BẮT ĐẦU CHẠY BENCHMARK...")
-    
     # Duyệt qua từng file dữ liệu
-    for filepath in valid_data_files:
+    for filepath in datasets:
         filename = os.path.basename(filepath)
-        print(f"\n📂 Dataset: {filename}")
-        
-        # Đọc nội dung file 1 lần
-        try:
-            with open(filepath, 'r') as f:
-                input_content = f.read()
-        except Exception as e:
-            print(f"❌ Lỗi đọc file {filename}: {e}")
-            continue
+        optimum = optima[filepath]
+        upper_bound = upper_bounds[filepath]
+        print(f"\n📂 Dataset: {filename} (cận trên = {upper_bound}" +
+              (f", tối ưu cấy sẵn = {optimum})" if optimum else ")"))
             
         # Duyệt qua các chế độ thời gian (1 phút, 5 phút)
         for mode in TEST_MODES:
             t_label = mode["label"]
-            t_limit = mode["time_limit"]
             
             print(f"   ⏱️  Mode: {t_label}")
             print("-" * 70)
@@ -145,47 +586,62 @@ def run_benchmark():
                 "Time Limit": t_label
             }
             
-            # Chạy từng thuật toán
-            for name, solve_func in solvers.items():
-                scores = []
-                times = []
-                
-                # Chạy lặp lại NUM_RUNS lần để lấy trung bình
-                for i in range(NUM_RUNS):
-                    start_time = time.time()
-                    
-                    # Gọi hàm giải
-                    score = call_solver_safe(solve_func, input_content, t_limit)
-                    
-                    end_time = time.time()
-                    elapsed = end_time - start_time
-                    
-                    scores.append(score)
-                    times.append(elapsed)
+            # Tổng hợp từng thuật toán
+            for module_name, name in solvers.items():
+                runs = grouped.get((filepath, t_label, module_name), [])
+                scores = [r['score'] for r in runs]
+                times = [r['elapsed'] for r in runs]
+                failed = [r['status'] for r in runs if r['status'] != 'ok']
+                ttts = [r['ttt'] for r in runs if r['ttt'] is not None]
+                mean_auc = _mean([r['auc'] for r in runs])
+                rss = [r['memory']['peak_rss_mb'] for r in runs if r['memory'].get('peak_rss_mb') is not None]
+                iter_rates = [counter_rates(r)['iterations'] for r in runs if 'iterations' in r['stats']]
                 
                 # Tính toán thống kê
-                mean_score = np.mean(scores)
-                std_score = np.std(scores)
-                mean_time = np.mean(times)
+                mean_score = _mean(scores)
+                std_score = statistics.pstdev(scores) if scores else float('nan')
+                mean_time = _mean(times)
                 
                 # Format kết quả: "Điểm TB (Độ lệch chuẩn)"
                 if std_score == 0:
                     res_str = f"{mean_score:.0f}"
                 else:
                     res_str = f"{mean_score:.1f} ({std_score:.1f})"
+                # Đánh dấu các lượt không chạy xong (timeout / oom / error) kèm số lượt
+                for status in sorted(set(failed)):
+                    res_str += f" [{status} x{failed.count(status)}]"
                 
                 row[name] = res_str
                 
                 # In kết quả từng dòng
-                print(f"      🔹 {name:<20}: Score = {res_str:<15} | Avg Time: {mean_time:.2f}s")
+                # TTT: TB thời gian đạt mục tiêu (số lượt đạt / tổng), AUC: diện tích dưới đường hội tụ
+                ttt_str = f"{_mean(ttts):.2f}s ({len(ttts)}/{len(runs)})" if ttts else f"- (0/{len(runs)})"
+                rss_str = f"{max(rss):.0f}MB" if rss else "-"
+                iter_str = f"{_mean(iter_rates):,.0f}" if iter_rates else "-"
+                # Biết tối ưu thì báo đúng khoảng cách, không thì báo khoảng cách tới cận trên (>= khoảng cách thật)
+                if optimum:
+                    gap_str = f" | Gap: {_gap_percent(mean_score, optimum):.2f}%"
+                elif upper_bound:
+                    gap_str = f" | Gap <= {_gap_percent(mean_score, upper_bound):.2f}% (UB)"
+                else:
+                    gap_str = ""
+                print(f"      🔹 {name:<20}: Score = {res_str:<15} | Avg Time: {mean_time:.2f}s"
+                      f" | TTT: {ttt_str} | AUC: {mean_auc:.3f} | Peak RSS: {rss_str} | It/s: {iter_str}{gap_str}")
+                if profile:
+                    # TB thời gian từng pha trên các lượt có đo
+                    phase_str = " | ".join(
+                        f"{p} {_mean([r['phases'][p] for r in runs if p in r['phases']]):.3f}s"
+                        for p in PHASES if any(p in r['phases'] for r in runs))
+                    print(f"         ⏲️  {phase_str or 'không có số liệu pha'}")
 
             results.append(row)
 
-    # --- 4. XUẤT KẾT QUẢ ---
+    # --- 6. XUẤT KẾT QUẢ ---
     if not results:
         print("\n❌ Không có kết quả nào được ghi nhận.")
         return
 
+    import pandas as pd # Import muộn (~0.3s): process con của runner không cần pandas
     df = pd.DataFrame(results)
     
     # Sắp xếp cột hiển thị cho đẹp
@@ -209,5 +665,186 @@ def run_benchmark():
     df.to_csv(output_file, index=False)
     print(f"✅ Đã lưu kết quả chi tiết vào '{output_file}'")
 
+    # Kết quả từng lượt chạy kèm trạng thái (ok / timeout / oom / error)
+    runs_file = "benchmark_runs.csv"
+    pd.DataFrame(run_rows).to_csv(runs_file, index=False)
+    print(f"✅ Đã lưu kết quả từng lượt chạy vào '{runs_file}'")
+
+    # Đường hội tụ (thời điểm, điểm tốt nhất) của từng lượt chạy
+    traces_file = "benchmark_traces.csv"
+    pd.DataFrame(trace_rows).to_csv(traces_file, index=False)
+    print(f"✅ Đã lưu đường hội tụ vào '{traces_file}'")
+
+# --- 5. BENCHMARK KHẢ NĂNG MỞ RỘNG (SCALING) ---
+
+def generate_scaling_cases(min_n=SCALING_MIN_N, max_n=SCALING_MAX_N, density=SCALING_DENSITY,
+                           scarcity=SCALING_SCARCITY):
+    """
+    Sinh (hoặc dùng lại) các bộ dữ liệu N = min_n, 2*min_n, ... <= max_n vào SCALING_DIR.
+    Mỗi N có seed riêng cố định -> sinh lại vẫn ra đúng file cũ (kết quả trong kho dùng lại được).
+    Trả về list (N, T, M, filepath).
+    """
+    cases = []
+    n = min_n
+    while n <= max_n:
+        T, M = max(5, n // 2), max(15, n * 4 // 5)
+        filename = f"scale_N{n}_d{density}_s{scarcity}_seed{SCALING_SEED}.txt"
+        filepath = os.path.join(SCALING_DIR, filename)
+        if not os.path.exists(filepath):
+            generate_testcase_np(filename, T, n, M, density, scarcity, output_folder=SCALING_DIR,
+                                 seed=SCALING_SEED + n)
+        cases.append((n, T, M, filepath))
+        n *= 2
+    return cases
+
+def fit_exponent(sizes, costs):
+    """Số mũ k của cost ~ size^k (hồi quy tuyến tính trên log-log), None nếu < 2 điểm hoặc thiếu NumPy"""
+    points = [(n, c) for n, c in zip(sizes, costs) if c and c > 0]
+    np = load_numpy() # Chỉ chế độ --scaling cần
+    if len(points) < 2 or np is None:
+        return None
+    xs, ys = zip(*points)
+    return float(np.polyfit(np.log(xs), np.log(ys), 1)[0])
+
+def run_scaling(jobs=1, mem_limit_mb=MEMORY_LIMIT_MB, results_db=RESULTS_DB, resume=True,
+                max_n=SCALING_MAX_N, time_limit=SCALING_TIME_LIMIT, algorithms=None):
+    """
+    Benchmark khả năng mở rộng: mỗi solver chạy trên dữ liệu N tăng gấp đôi với ngân sách cố định.
+    - Chất lượng = số môn xếp được (validator) / tổng số môn
+    - Thông lượng = số vòng lặp / giây (solver có bộ đếm), chi phí 1 vòng = 1 / thông lượng;
+      solver không có bộ đếm (VD: greedy chạy 1 lượt) thì chi phí = thời gian chạy
+    - Số mũ độ phức tạp thực nghiệm: chi phí ~ N^k, k fit trên các điểm chạy xong
+    - Solver ngừng mở rộng ở N đầu tiên: không chạy xong, không còn vòng lặp nào trong ngân sách,
+      hoặc chất lượng < SCALING_QUALITY_RATIO * chất lượng tốt nhất tại N đó
+    Kết quả ghi vào benchmark_scaling.csv.
+    """
+    print(f"{'='*70}")
+    print(f"📈 SINH DỮ LIỆU SCALING (N = {SCALING_MIN_N} -> {max_n}, density={SCALING_DENSITY}, "
+          f"scarcity={SCALING_SCARCITY}) ...")
+    cases = generate_scaling_cases(max_n=max_n)
+
+    solvers = load_solvers(algorithms)
+    if not solvers:
+        return
+    datasets, dataset_hashes = prepare_datasets([fp for _, _, _, fp in cases])
+    num_tasks = {fp: load_cached_instance(fp).num_tasks for fp in datasets}
+
+    label = f"Scaling {time_limit:g}s"
+    cells = [(filepath, label, time_limit, module_name, 0, run_seed(dataset_hashes[filepath], 0))
+             for filepath in datasets
+             for module_name in solvers]
+    cell_results = execute_cells(cells, solvers, dataset_hashes, jobs, mem_limit_mb, results_db, resume)
+    by_cell = {(r['filepath'], r['module']): r for r in cell_results}
+
+    # Chất lượng tốt nhất tại mỗi N (mốc để xác định solver nào tụt lại)
+    best_quality = {}
+    for (filepath, _), r in by_cell.items():
+        if r['status'] == 'ok' and num_tasks[filepath]:
+            best_quality[filepath] = max(best_quality.get(filepath, 0), r['score'] / num_tasks[filepath])
+
+    rows = []
+    print(f"\n{'='*90}")
+    print(f"📈 KẾT QUẢ SCALING (ngân sách {time_limit:g}s / lượt)")
+    print(f"{'='*90}")
+    for module_name, name in solvers.items():
+        sizes, costs, limit_n = [], [], None
+        print(f"\n🔹 {name}")
+        print(f"   {'N':>6} {'Tasks':>7} {'Status':>8} {'Quality':>8} {'Time':>8} {'It/s':>12}")
+        for n, T, M, filepath in cases:
+            r = by_cell.get((filepath, module_name))
+            if r is None:
+                continue
+            quality = r['score'] / num_tasks[filepath] if num_tasks[filepath] else 0.0
+            rate = counter_rates(r).get('iterations')
+            ok = r['status'] == 'ok'
+            # Solver có bộ đếm nhưng 0 vòng lặp: riêng khởi tạo đã hết ngân sách -> không còn tìm kiếm
+            stalled = 'iterations' in r['stats'] and not rate
+            if ok and not stalled:
+                sizes.append(n)
+                costs.append(1.0 / rate if rate else r['elapsed'])
+            falls_behind = quality < SCALING_QUALITY_RATIO * best_quality.get(filepath, 0)
+            if limit_n is None and (not ok or stalled or falls_behind):
+                limit_n = n
+            rows.append({"Algorithm": name, "N": n, "T": T, "M": M, "Tasks": num_tasks[filepath],
+                         "Status": r['status'], "Score": r['score'], "Quality": round(quality, 4),
+                         "Time": round(r['elapsed'], 3),
+                         "Iter/s": round(rate, 1) if rate else None,
+                         "Peak RSS MB": _round_or_none(r['memory'].get('peak_rss_mb'), 1)})
+            rate_str = f"{rate:,.0f}" if rate else "-"
+            print(f"   {n:>6} {num_tasks[filepath]:>7} {r['status']:>8} {quality:>8.1%} "
+                  f"{r['elapsed']:>7.2f}s {rate_str:>12}")
+
+        k = fit_exponent(sizes, costs)
+        cost_name = "thời gian / vòng lặp" if any(r['Iter/s'] for r in rows if r['Algorithm'] == name) \
+            else "thời gian chạy"
+        k_str = f"N^{k:.2f}" if k is not None else "không đủ điểm"
+        limit_str = f"ngừng mở rộng từ N = {limit_n}" if limit_n is not None else "mở rộng tốt tới N lớn nhất"
+        print(f"   ➜ {cost_name} ~ {k_str} | {limit_str}")
+        for row in rows:
+            if row["Algorithm"] == name:
+                row["Exponent"] = round(k, 3) if k is not None else None
+                row["Scales Until"] = limit_n
+
+    output_file = "benchmark_scaling.csv"
+    import pandas as pd
+    pd.DataFrame(rows).to_csv(output_file, index=False)
+    print(f"\n✅ Đã lưu kết quả scaling vào '{output_file}'")
+
+# --- 6. BÁO CÁO THỜI GIAN KHỞI ĐỘNG ---
+
+def run_import_report(algorithms=None, budget=CLI_TIME_BUDGET):
+    """
+    Đo thời gian khởi động của từng solver khi chạy như CLI (process mới, chỉ nạp module)
+    và các import nặng nhất, so với ngân sách budget giây của 1 lần chạy.
+    Runner cũng được đo (không tính vào ngân sách solver).
+    """
+    solvers = load_solvers(algorithms)
+    print(f"⏱️  THỜI GIAN KHỞI ĐỘNG (ngân sách CLI {budget:g}s)")
+    print(f"   {'Solver':<20} {'Startup':>8} {'Import':>8} {'% budget':>9}  Import nặng nhất")
+    for module_name, display_name in [*solvers.items(), ("benchmark_runner", "(benchmark runner)")]:
+        try:
+            wall, total, top = import_time_report(f"{module_name}.py")
+        except Exception as e:
+            print(f"   {display_name:<20} ❌ {e}")
+            continue
+        heavy = ", ".join(f"{name} {seconds * 1000:.0f}ms" for name, seconds in top)
+        share = f"{wall / budget:8.0%}" if module_name in solvers else f"{'-':>8}"
+        warn = " ⚠️" if module_name in solvers and wall > STARTUP_WARN_RATIO * budget else ""
+        print(f"   {display_name:<20} {wall * 1000:6.0f}ms {total * 1000:6.0f}ms {share}  {heavy}{warn}")
+
 if __name__ == "__main__":
-    run_benchmark()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Benchmark các thuật toán xếp thời khóa biểu")
+    parser.add_argument("--jobs", type=int, default=1,
+                        help="Số process chạy song song (mặc định 1 = tuần tự)")
+    parser.add_argument("--mem-limit", type=int, default=MEMORY_LIMIT_MB,
+                        help="Giới hạn bộ nhớ mỗi lượt chạy, MB (0 = không giới hạn)")
+    parser.add_argument("--results-db", default=RESULTS_DB,
+                        help="File SQLite lưu kết quả từng lượt chạy (mặc định %(default)s)")
+    parser.add_argument("--no-resume", action="store_true",
+                        help="Chạy lại mọi ô, không dùng lại kết quả đã có trong results-db")
+    parser.add_argument("--profile", choices=PROFILE_MODES, default=None,
+                        help="Profile từng lượt chạy (cprofile: đầy đủ, sample: lấy mẫu chi phí thấp), "
+                             "kết quả ghi vào thư mục profiles/")
+    parser.add_argument("--track-alloc", action="store_true",
+                        help="Bật tracemalloc: ghi đỉnh bộ nhớ Python và các dòng cấp phát nhiều nhất (chậm hơn)")
+    parser.add_argument("--algorithms", nargs="+", default=None, metavar="MODULE",
+                        help="Chỉ chạy các solver này (tên module, VD: sa_test pso_test); mặc định toàn bộ ALGORITHMS")
+    parser.add_argument("--import-report", action="store_true",
+                        help="Chỉ đo thời gian khởi động / import của từng solver khi chạy như CLI rồi thoát")
+    parser.add_argument("--scaling", action="store_true",
+                        help="Chạy benchmark khả năng mở rộng (dữ liệu sinh với N gấp đôi dần) thay cho test_case/")
+    parser.add_argument("--scaling-max-n", type=int, default=SCALING_MAX_N,
+                        help="N (số lớp) lớn nhất của chế độ --scaling (mặc định %(default)s)")
+    parser.add_argument("--scaling-time", type=float, default=SCALING_TIME_LIMIT,
+                        help="Ngân sách thời gian mỗi lượt chạy của chế độ --scaling, giây (mặc định %(default)s)")
+    args = parser.parse_args()
+    if args.import_report:
+        run_import_report(algorithms=args.algorithms)
+    elif args.scaling:
+        run_scaling(jobs=max(1, args.jobs), mem_limit_mb=args.mem_limit, results_db=args.results_db,
+                    resume=not args.no_resume, max_n=args.scaling_max_n, time_limit=args.scaling_time,
+                    algorithms=args.algorithms)
+    else:
+        run_benchmark(jobs=max(1, args.jobs), mem_limit_mb=args.mem_limit,
+                      results_db=args.results_db, resume=not args.no_resume, profile=args.profile,
+                      track_alloc=args.track_alloc, algorithms=args.algorithms)
\ No newline at end of file
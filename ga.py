@@ -1,7 +1,8 @@
 import random
 import time
 # Nạp các hàm tiện ích từ file utils.py
-from utils import load_and_preprocess, MAX_SLOTS
+from utils import load_compiled_instance
+from occupancy import Occupancy, SLOT_MASKS
 
 # --- CẤU HÌNH GA ---
 POPULATION_SIZE = 100    # Kích thước quần thể
@@ -12,27 +13,30 @@ TIME_LIMIT = 0.95        # Giới hạn thời gian (giây)
 
 # --- CLASS BIỂU DIỄN CÁ THỂ ---
 class Schedule:
-    def __init__(self, tasks, valid_starts, empty=False):
-        self.tasks = tasks
-        self.valid_starts = valid_starts
+    def __init__(self, inst, empty=False):
+        self.inst = inst
+        self.valid_starts = inst.valid_starts
         # Genes: List các tuple (start_slot, teacher_id)
-        # Index của genes tương ứng với index trong danh sách tasks
-        self.genes = [None] * len(tasks) 
+        # Index của genes chính là task id (cột trong CompiledInstance)
+        self.genes = [None] * inst.num_tasks
         self.fitness = -float('inf')
+        self.assigned_count = 0 # Số môn xếp được ở lần tính fitness gần nhất
         
         if not empty:
             self.random_init()
 
     def random_init(self):
         """Khởi tạo ngẫu nhiên nhưng hợp lệ về mặt thời gian (dùng valid_starts)"""
-        for i, task in enumerate(self.tasks):
+        inst = self.inst
+        for i in range(inst.num_tasks):
             # 1. Chọn giáo viên ngẫu nhiên trong danh sách eligible
-            if not task['eligible']: continue # Should not happen
-            t = random.choice(task['eligible'])
+            eligible = inst.eligible(i)
+            if not eligible: continue # Should not happen
+            t = random.choice(eligible)
             
             # 2. Chọn slot bắt đầu ngẫu nhiên từ Cache đã tính trước
             # (Không cần check is_valid_session nữa vì cache đã chuẩn rồi)
-            possible_slots = self.valid_starts.get(task['d'], [])
+            possible_slots = self.valid_starts.get(inst.d[i], [])
             if possible_slots:
                 s = random.choice(possible_slots)
                 self.genes[i] = (s, t)
@@ -45,41 +49,26 @@ class Schedule:
         assigned_count = 0
         conflicts = 0
         
-        # Grid check nhanh (reset mỗi lần tính)
-        # 0: Trống, 1: Bận
-        # Lưu ý: Class index trong task là 0-based
-        class_busy = [set() for _ in range(num_classes)]
-        teacher_busy = [set() for _ in range(num_teachers + 1)] # Teacher ID 1-based or 0-based? 
-        # Trong utils, teacher ID từ input thường là 1-based, ta nên check lại input. 
-        # Để an toàn ta dùng mảng rộng hoặc dict. Ở đây dùng list set cho nhanh.
+        # Bitmask check nhanh (reset mỗi lần tính)
+        # Lưu ý: Class index và teacher index (eligible lấy từ range(T)) đều 0-based
+        occ = Occupancy(num_classes, num_teachers, track_owners=False)
         
-        for i, gene in enumerate(self.genes):
+        task_c, task_d = self.inst.c, self.inst.d
+        # Duyệt theo thứ tự heuristic: task khó xếp được giữ chỗ trước
+        for i in self.inst.order:
+            gene = self.genes[i]
             if gene is None: continue
             
             s, t = gene
-            task = self.tasks[i]
-            c_idx = task['c']
-            d = task['d']
-            e = s + d - 1
+            c_idx = task_c[i]
+            d = task_d[i]
             
-            # Check xung đột
-            is_conflict = False
-            
-            # Check Class
-            for k in range(s, e + 1):
-                if k in class_busy[c_idx]: is_conflict = True
-                if k in teacher_busy[t]: is_conflict = True # t is usually 0-based in preprocessing? 
-                # Kiểm tra lại utils: eligible lấy từ range(T), tức là 0-based.
-                
-                if is_conflict: break
-            
-            if is_conflict:
+            # Check xung đột (Lớp + Giáo viên trong 1 phép AND)
+            if not occ.is_free(c_idx, t, SLOT_MASKS[d][s]):
                 conflicts += 1
             else:
                 # Nếu không xung đột thì đánh dấu bận
-                for k in range(s, e + 1):
-                    class_busy[c_idx].add(k)
-                    teacher_busy[t].add(k)
+                occ.place(i, c_idx, t, s, d)
                 assigned_count += 1
         
         # Hàm mục tiêu:
@@ -87,43 +76,38 @@ class Schedule:
         # Càng ít xung đột càng tốt (thực ra logic trên đã loại conflict khỏi grid, 
         # nên conflict chỉ đếm số task bị trùng lấp không xếp được vào grid)
         self.fitness = (assigned_count * 1000) - (conflicts * 10)
+        self.assigned_count = assigned_count
         return self.fitness
 
 # --- HÀM GIẢI CHÍNH ---
-def solve(input_content=None, time_limit=TIME_LIMIT):
+def solve(input_content=None, time_limit=TIME_LIMIT, progress=None, details=False, timer=None, stats=None, upper_bound=None):
     start_time = time.time()
     
     # 1. GỌI TIỀN XỬ LÝ (Thay thế toàn bộ đoạn đọc file cũ)
-    # Lưu ý: utils.py cần được chỉnh để nhận input_content nếu chạy benchmark
-    # Tuy nhiên hàm load_and_preprocess mặc định đọc sys.stdin.
-    # Để tương thích benchmark runner (truyền string), ta cần patch nhẹ sys.stdin hoặc sửa utils.
-    # Ở đây giả sử utils đọc từ sys.stdin chuẩn, hoặc ta mock input nếu cần.
-    
-    # KHI CHẠY THỰC TẾ VỚI BENCHMARK RUNNER:
-    # Benchmark Runner truyền string vào input_content.
-    # Ta cần giả lập sys.stdin để utils đọc được.
-    if input_content:
-        import sys
-        from io import StringIO
-        sys.stdin = StringIO(input_content)
+    # Benchmark Runner truyền string vào input_content -> utils đọc trực tiếp,
+    # không giả lập sys.stdin nên nhiều solve() chạy cùng lúc được.
+    inst = load_compiled_instance(input_content, timer)
+    if inst is None: return 0
 
-    data = load_and_preprocess()
-    if data is None: return 0
-
-    T, N, tasks = data['T'], data['N'], data['tasks']
-    valid_starts = data['valid_starts']
+    T, N, num_tasks = inst.T, inst.N, inst.num_tasks
+    valid_starts = inst.valid_starts
     
+    if timer is not None: timer.phase('construct')
     # 2. KHỞI TẠO QUẦN THỂ
-    population = [Schedule(tasks, valid_starts) for _ in range(POPULATION_SIZE)]
+    population = [Schedule(inst) for _ in range(POPULATION_SIZE)]
     
     global_best_fitness = -float('inf')
     global_best_schedule = None
     
+    if timer is not None: timer.phase('improve')
     # 3. VÒNG LẶP TIẾN HÓA
     generation = 0
+    # Bộ đếm thông lượng: số lần decode + chấm điểm cá thể, số lần cải thiện best toàn cục, số lần đột biến
+    n_decodes = n_improving = n_mutations = 0
     while True:
-        # Check Time Limit
-        if time.time() - start_time > time_limit:
+        # Check Time Limit (luôn chạy ít nhất 1 thế hệ để có global_best_schedule, kể cả khi
+        # riêng khởi tạo quần thể đã tốn hết ngân sách trên dữ liệu lớn)
+        if generation > 0 and time.time() - start_time > time_limit:
             break
         if generation >= MAX_GENERATIONS:
             break
@@ -133,6 +117,7 @@ def solve(input_content=None, time_limit=TIME_LIMIT):
         # Đánh giá Fitness
         for ind in population:
             ind.calculate_fitness(N, T)
+        n_decodes += len(population)
         
         # Sort
         population.sort(key=lambda x: x.fitness, reverse=True)
@@ -141,6 +126,13 @@ def solve(input_content=None, time_limit=TIME_LIMIT):
         if population[0].fitness > global_best_fitness:
             global_best_fitness = population[0].fitness
             global_best_schedule = population[0]
+            n_improving += 1
+            # Báo tiến trình: thời gian đã chạy, số môn xếp được của cá thể tốt nhất
+            # (bằng đúng số dòng output vì bước xuất kết quả duyệt cùng thứ tự)
+            if progress is not None: progress(time.time() - start_time, global_best_schedule.assigned_count)
+            # Chạm cận trên số môn xếp được -> đã tối ưu, dừng sớm
+            if upper_bound is not None and global_best_schedule.assigned_count >= upper_bound:
+                break
             
         # Tạo thế hệ mới
         new_population = []
@@ -158,8 +150,8 @@ def solve(input_content=None, time_limit=TIME_LIMIT):
             p2 = random.choice(parents_pool)
             
             # Crossover (Uniform)
-            child = Schedule(tasks, valid_starts, empty=True)
-            for i in range(len(tasks)):
+            child = Schedule(inst, empty=True)
+            for i in range(num_tasks):
                 if random.random() < 0.5:
                     child.genes[i] = p1.genes[i]
                 else:
@@ -168,20 +160,25 @@ def solve(input_content=None, time_limit=TIME_LIMIT):
             # Mutation
             if random.random() < MUTATION_RATE:
                 # Chọn random 1 gen để đột biến
-                idx = random.randint(0, len(tasks) - 1)
-                task = tasks[idx]
+                idx = random.randint(0, num_tasks - 1)
+                n_mutations += 1
+                eligible = inst.eligible(idx)
                 
                 # Chọn lại giá trị mới từ Cache
-                possible_slots = valid_starts.get(task['d'], [])
-                if possible_slots:
+                possible_slots = valid_starts.get(inst.d[idx], [])
+                if possible_slots and eligible:
                     new_s = random.choice(possible_slots)
-                    new_t = random.choice(task['eligible'])
+                    new_t = random.choice(eligible)
                     child.genes[idx] = (new_s, new_t)
             
             new_population.append(child)
             
         population = new_population
 
+    if stats is not None:
+        stats.update(iterations=generation, decodes=n_decodes, improving=n_improving, mutations=n_mutations)
+
+    if timer is not None: timer.phase('output')
     # 4. XUẤT KẾT QUẢ
     # Lấy schedule tốt nhất
     best = global_best_schedule
@@ -189,35 +186,26 @@ def solve(input_content=None, time_limit=TIME_LIMIT):
     # Tạo lại output sạch (không conflict)
     final_output = []
     
-    # Grid check lần cuối
-    class_grid = [[False] * (MAX_SLOTS + 1) for _ in range(N)]
-    teacher_grid = [[False] * (MAX_SLOTS + 1) for _ in range(T)] # T index 0-based
+    # Bitmask check lần cuối (T index 0-based)
+    occ = Occupancy(N, T, track_owners=False)
     
-    # Ưu tiên task trong genes của best individual
-    for i, gene in enumerate(best.genes):
+    # Ưu tiên task trong genes của best individual (theo thứ tự heuristic)
+    for i in inst.order:
+        gene = best.genes[i]
         if gene is None: continue
         s, t = gene
-        task = tasks[i]
-        c, d = task['c'], task['d']
-        e = s + d - 1
+        c, d = inst.c[i], inst.d[i]
         
         # Validate final conflict
-        is_conflict = False
-        for k in range(s, e + 1):
-            if class_grid[c][k] or teacher_grid[t][k]:
-                is_conflict = True; break
-        
-        if not is_conflict:
+        if occ.is_free(c, t, SLOT_MASKS[d][s]):
             # Add to result
             # Output format: ClassID(1-based) SubjectID Start TeacherID(1-based)
-            # Trong utils, task['m'] đã là ID gốc, task['c'] là 0-based index
+            # Trong CompiledInstance, cột m đã là ID gốc, cột c là 0-based index
             # Teacher ID t là 0-based index từ eligible range(T) -> Cần +1 khi in
-            final_output.append((c + 1, task['m'], s, t + 1))
+            final_output.append((c + 1, inst.m[i], s, t + 1))
             
             # Mark busy
-            for k in range(s, e + 1):
-                class_grid[c][k] = True
-                teacher_grid[t][k] = True
+            occ.place(i, c, t, s, d)
 
     # In kết quả (Nếu chạy benchmark runner thì return len, nếu chạy trực tiếp thì print)
     if input_content is None:
@@ -226,7 +214,8 @@ def solve(input_content=None, time_limit=TIME_LIMIT):
         for item in final_output:
             print(f"{item[0]} {item[1]} {item[2]} {item[3]}")
             
-    return len(final_output)
+    if timer is not None: timer.stop()
+    return final_output if details else len(final_output)
 
 if __name__ == "__main__":
     solve()
\ No newline at end of file
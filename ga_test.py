@@ -1,6 +1,7 @@
 import sys
 import random
 import time
+from utils import build_subject_index
 
 # --- CẤU HÌNH ---
 SLOTS_PER_SESSION = 6
@@ -123,9 +124,11 @@ def solve(input_content=None, time_limit=0.95):
     # Tạo danh sách Tasks
     tasks = []
     task_counter = 0
+    # Chỉ mục ngược Môn -> Giáo viên (xây 1 lần, task cùng môn dùng chung list)
+    subject_to_teachers = build_subject_index(M, teacher_abilities)
     for c_idx, courses in enumerate(class_courses):
         for m_id in courses:
-            eligible = [t for t in range(T) if m_id in teacher_abilities[t]]
+            eligible = subject_to_teachers[m_id]
             tasks.append({
                 'id': task_counter,
                 'c': c_idx, 'm': m_id, 
@@ -1,6 +1,8 @@
 import sys
 import random
 import time  # <--- (1) Import time
+from utils import build_subject_index
+from occupancy import SLOT_MASKS, free_starts
 
 # --- CẤU HÌNH ---
 SLOTS_PER_SESSION = 6
@@ -67,9 +69,11 @@ def solve(input_content=None, time_limit=0.95):
     # --- BƯỚC 1: TẠO LỜI GIẢI KHỞI TẠO BẰNG GREEDY ---
     teacher_degrees = [len(x) for x in teacher_abilities]
     tasks = []
+    # Chỉ mục ngược Môn -> Giáo viên (xây 1 lần, task cùng môn dùng chung list)
+    subject_to_teachers = build_subject_index(M, teacher_abilities)
     for c_idx, courses in enumerate(class_courses):
         for m_id in courses:
-            eligible = [t for t in range(T) if m_id in teacher_abilities[t]]
+            eligible = subject_to_teachers[m_id]
             tasks.append({
                 'c_idx': c_idx, 'm_id': m_id,
                 'duration': durations[m_id - 1], 'eligible': eligible,
@@ -79,8 +83,9 @@ def solve(input_content=None, time_limit=0.95):
     # Sort chuẩn (Heuristic)
     tasks.sort(key=lambda x: (x['num_eligible'], -x['duration'], x['c_idx']))
 
-    class_busy = [[False] * (MAX_SLOTS + 1) for _ in range(N)]
-    teacher_busy = [[False] * (MAX_SLOTS + 1) for _ in range(T)]
+    # Mặt nạ bận 60 bit của lớp / giáo viên (bit s - 1 bật = slot s đã bận)
+    class_busy = [0] * N
+    teacher_busy = [0] * T
     
     solution = []
     unassigned_tasks = []
@@ -96,27 +101,16 @@ def solve(input_content=None, time_limit=0.95):
         
         assigned = False
         for t_idx in candidates:
-            if assigned: break
-            for start in range(1, MAX_SLOTS - d + 2):
-                if not is_valid_session(start, d): continue
-                
-                # Check conflict
-                end = start + d - 1
-                if class_busy[c_idx][start] or teacher_busy[t_idx][start]: continue
-                
-                is_conflict = False
-                for k in range(start, end + 1):
-                    if class_busy[c_idx][k] or teacher_busy[t_idx][k]:
-                        is_conflict = True; break
-                
-                if not is_conflict:
-                    # Assign
-                    for k in range(start, end + 1):
-                        class_busy[c_idx][k] = True
-                        teacher_busy[t_idx][k] = True
-                    solution.append({'c': c_idx, 'm': m_id, 's': start, 't': t_idx, 'd': d})
-                    assigned = True
-                    break
+            # Slot bắt đầu trống sớm nhất không vắt qua buổi (popcount kernel, không duyệt từng slot)
+            start = free_starts(~(class_busy[c_idx] | teacher_busy[t_idx]), d)[1]
+            if start:
+                # Assign
+                mask = SLOT_MASKS[d][start]
+                class_busy[c_idx] |= mask
+                teacher_busy[t_idx] |= mask
+                solution.append({'c': c_idx, 'm': m_id, 's': start, 't': t_idx, 'd': d})
+                assigned = True
+                break
         
         if not assigned:
             unassigned_tasks.append(task)
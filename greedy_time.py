@@ -1,6 +1,7 @@
 import sys
 import time
 import random
+from occupancy import SLOT_MASKS, free_starts
 
 # --- CẤU HÌNH ---
 SLOTS_PER_SESSION = 6
@@ -106,14 +107,6 @@ def solve():
         print(0)
         return
 
-    # --- PRE-CALCULATION ---
-    valid_starts = [[] for _ in range(13)]
-    for d in range(1, 13):
-        for start in range(1, MAX_SLOTS - d + 2):
-            end = start + d - 1
-            if ((start - 1) // SLOTS_PER_SESSION) == ((end - 1) // SLOTS_PER_SESSION):
-                valid_starts[d].append(start)
-
     # --- RANDOMIZED GREEDY ---
     best_solution = []
     best_score = -1
@@ -140,7 +133,6 @@ def solve():
             
             # Chọn giáo viên ngẫu nhiên trong danh sách
             start_offset = random.randint(0, len(candidates) - 1)
-            assigned = False
             
             for i in range(len(candidates)):
                 t_id = candidates[(start_offset + i) % len(candidates)]
@@ -153,17 +145,15 @@ def solve():
 
                 combined = c_mask | t_mask
                 
-                # Find First Fit Slot
-                for start in valid_starts[d]:
-                    mask = ((1 << d) - 1) << (start - 1)
-                    if (combined & mask) == 0:
-                        class_busy[c_idx] |= mask
-                        teacher_busy[t_id] |= mask
-                        current_sol.append((c_idx + 1, m_id, start, t_id))
-                        cnt += 1
-                        assigned = True
-                        break
-                if assigned: break
+                # Find First Fit Slot: slot bắt đầu trống sớm nhất (popcount kernel, không duyệt slot)
+                start = free_starts(~combined, d)[1]
+                if start:
+                    mask = SLOT_MASKS[d][start]
+                    class_busy[c_idx] |= mask
+                    teacher_busy[t_id] |= mask
+                    current_sol.append((c_idx + 1, m_id, start, t_id))
+                    cnt += 1
+                    break
         
         if cnt > best_score:
             best_score = cnt
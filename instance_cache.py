@@ -0,0 +1,96 @@
+import os
+import hashlib
+from array import array
+
+from utils import load_numpy, parse_instance_bytes, compile_instance, CompiledInstance
+
+# Cache lưu dạng .npz nên cần NumPy; import ở lần dùng đầu (load_numpy) -> import module này vẫn nhẹ
+
+# --- CẤU HÌNH CACHE ---
+CACHE_DIR = ".instance_cache"
+# Tăng số này khi đổi cấu trúc CompiledInstance -> toàn bộ cache cũ tự động bị bỏ qua
+CACHE_VERSION = 1
+
+# Các cột array('i') của CompiledInstance được lưu nguyên dạng int32
+_COLUMNS = ('c', 'm', 'd', 'num_eligible', 'elig_ptr', 'elig_idx', 'order', 'durations')
+
+def content_key(raw):
+    """Khóa cache = SHA-256 của nội dung input (+ phiên bản định dạng)"""
+    h = hashlib.sha256(f"v{CACHE_VERSION}:".encode())
+    h.update(raw)
+    return h.hexdigest()
+
+def _to_column(values):
+    """Mảng NumPy -> array('i') (copy 1 lần qua bytes, không duyệt từng phần tử)"""
+    np = load_numpy()
+    col = array('i')
+    col.frombytes(np.ascontiguousarray(values, dtype=np.int32).tobytes())
+    return col
+
+def save_instance(path, inst):
+    """Ghi CompiledInstance ra file .npz (ghi vào file tạm rồi đổi tên -> không để lại file dở dang)"""
+    np = load_numpy()
+    # valid_starts {d: [s, ...]} được phẳng hóa dạng CSR theo thời lượng d
+    max_d = max(inst.valid_starts, default=0)
+    vs_ptr, vs_idx = [0], []
+    for d in range(max_d + 1):
+        vs_idx.extend(inst.valid_starts.get(d, []))
+        vs_ptr.append(len(vs_idx))
+
+    arrays = {name: np.frombuffer(getattr(inst, name), dtype=np.int32) for name in _COLUMNS}
+    arrays['shape'] = np.array([inst.T, inst.N, inst.M], dtype=np.int64)
+    arrays['vs_ptr'] = np.array(vs_ptr, dtype=np.int32)
+    arrays['vs_idx'] = np.array(vs_idx, dtype=np.int32)
+
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        np.savez(f, **arrays)
+    os.replace(tmp_path, path)
+
+def load_instance(path):
+    """Đọc lại CompiledInstance từ file .npz do save_instance ghi"""
+    np = load_numpy()
+    with np.load(path) as z:
+        T, N, M = (int(x) for x in z['shape'])
+        cols = {name: _to_column(z[name]) for name in _COLUMNS}
+        vs_ptr, vs_idx = z['vs_ptr'].tolist(), z['vs_idx'].tolist()
+
+    valid_starts = {d: vs_idx[vs_ptr[d]:vs_ptr[d + 1]] for d in range(1, len(vs_ptr) - 1)}
+    return CompiledInstance(T, N, M, cols['c'], cols['m'], cols['d'],
+                            cols['elig_ptr'], cols['elig_idx'], cols['order'],
+                            valid_starts, cols['durations'], cols['num_eligible'])
+
+def compile_cached(raw, cache_dir=CACHE_DIR):
+    """
+    Nội dung input (bytes) -> CompiledInstance, có cache trên đĩa theo hash nội dung.
+    - Trúng cache: nạp .npz, bỏ qua hoàn toàn bước parse + tiền xử lý.
+    - Trượt cache (hoặc file cache hỏng): parse như bình thường rồi ghi cache.
+    Input đổi nội dung -> hash đổi -> tự động dùng file cache mới.
+    Không có NumPy thì chỉ parse, không cache.
+    """
+    if load_numpy() is None:
+        parsed = parse_instance_bytes(raw)
+        return compile_instance(*parsed) if parsed is not None else None
+
+    path = os.path.join(cache_dir, content_key(raw) + ".npz")
+    if os.path.exists(path):
+        try:
+            return load_instance(path)
+        except Exception:
+            pass # File cache hỏng -> dựng lại bên dưới
+
+    parsed = parse_instance_bytes(raw)
+    if parsed is None: return None
+    inst = compile_instance(*parsed)
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        save_instance(path, inst)
+    except OSError:
+        pass # Không ghi được cache (thư mục chỉ đọc...) thì vẫn trả kết quả
+    return inst
+
+def load_cached_instance(file_path, cache_dir=CACHE_DIR):
+    """Đọc file instance qua cache (dùng cho benchmark / analyzer chạy lặp lại nhiều lần)"""
+    with open(file_path, 'rb') as f:
+        raw = f.read()
+    return compile_cached(raw, cache_dir)
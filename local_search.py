@@ -1,4 +1,6 @@
 import sys
+from occupancy import Occupancy, SLOT_MASKS
+from utils import index_tasks_by_id, build_subject_index
 
 # --- CẤU HÌNH ---
 SLOTS_PER_SESSION = 6
@@ -49,9 +51,11 @@ def solve_ultimate_local_search():
     # 2. CHUẨN BỊ DATA
     tasks = []
     task_counter = 0
+    # Chỉ mục ngược Môn -> Giáo viên (xây 1 lần, task cùng môn dùng chung list)
+    subject_to_teachers = build_subject_index(M, teacher_abilities)
     for c_idx, courses in enumerate(class_courses):
         for m_id in courses:
-            eligible = [t for t in range(T) if m_id in teacher_abilities[t]]
+            eligible = subject_to_teachers[m_id]
             tasks.append({
                 'id': task_counter,
                 'c': c_idx, 'm': m_id, 
@@ -64,6 +68,8 @@ def solve_ultimate_local_search():
     # 1. Độ khan hiếm giáo viên (Ưu tiên môn ít người dạy) -> Rất quan trọng để đạt 100 điểm
     # 2. Môn dài -> Để xếp gọn
     tasks.sort(key=lambda x: (len(x['eligible']), -x['d'], x['c']))
+    # Tra task theo ID O(1) (sau khi sort, tasks[tid] không còn là task tid)
+    task_by_id = index_tasks_by_id(tasks)
 
     teacher_degrees = [len(s) for s in teacher_abilities]
 
@@ -71,10 +77,8 @@ def solve_ultimate_local_search():
     # assigned_tasks: map {task_id: (start, teacher)}
     assigned_tasks = {}
     
-    # Ma trận bận: Lưu ID của task đang chiếm chỗ (để biết ai đang chắn đường)
-    # Giá trị -1 là trống
-    class_grid = [[-1] * (MAX_SLOTS + 1) for _ in range(N)]
-    teacher_grid = [[-1] * (MAX_SLOTS + 1) for _ in range(T)]
+    # Bitmask bận + owner: Lưu ID của task đang chiếm chỗ (để biết ai đang chắn đường)
+    occ = Occupancy(N, T)
 
     unassigned_list = []
 
@@ -93,18 +97,10 @@ def solve_ultimate_local_search():
                 if not is_valid_session(s, d): continue
                 
                 # Check conflict
-                e = s + d - 1
-                conflict = False
-                for k in range(s, e + 1):
-                    if class_grid[c][k] != -1 or teacher_grid[t][k] != -1:
-                        conflict = True; break
-                
-                if not conflict:
+                if occ.is_free(c, t, SLOT_MASKS[d][s]):
                     # Assign
                     assigned_tasks[tid] = (s, t)
-                    for k in range(s, e + 1):
-                        class_grid[c][k] = tid
-                        teacher_grid[t][k] = tid
+                    occ.place(tid, c, t, s, d)
                     is_assigned = True
                     break
         
@@ -133,55 +129,29 @@ def solve_ultimate_local_search():
                 for s in range(1, MAX_SLOTS - ud + 2):
                     if not is_valid_session(s, ud): continue
                     
-                    e = s + ud - 1
-                    
-                    # Tìm các task đang chắn đường (Victims)
-                    conflicting_tasks = set()
-                    possible_spot = True
-                    
-                    for k in range(s, e + 1):
-                        # Nếu bị chắn bởi class khác -> Không thể đẩy (vì class đó chỉ có 1 lịch) -> Bỏ qua
-                        # (Thực ra class conflict là cứng, nhưng teacher conflict có thể đổi GV)
-                        ct = class_grid[uc][k]
-                        if ct != -1: 
-                            # u_task cần slot này của lớp uc, nhưng task ct đang chiếm
-                            # Ta có thể thử dời ct sang giờ khác
-                            conflicting_tasks.add(ct)
-                        
-                        tt = teacher_grid[t][k]
-                        if tt != -1:
-                            conflicting_tasks.add(tt)
+                    # Tìm các task đang chắn đường (Victims): chỉ duyệt các bit va chạm
+                    conflicting_tasks = occ.blockers(uc, t, SLOT_MASKS[ud][s])
 
                     # CHIẾN THUẬT: Chỉ thử "đá" nếu chỉ có ĐÚNG 1 task chắn đường
                     if len(conflicting_tasks) == 1:
                         victim_id = list(conflicting_tasks)[0]
-                        victim_task = next((x for x in tasks if x['id'] == victim_id), None)
+                        victim_task = task_by_id[victim_id]
                         
                         if victim_task:
                             # --- THỬ DỜI VICTIM ---
                             # 1. Gỡ victim ra
                             v_s, v_t = assigned_tasks[victim_id]
                             v_c, v_d = victim_task['c'], victim_task['d']
-                            v_e = v_s + v_d - 1
                             
                             # Clear grid tạm thời
-                            for k in range(v_s, v_e + 1):
-                                class_grid[v_c][k] = -1
-                                teacher_grid[v_t][k] = -1
+                            occ.remove(v_c, v_t, v_s, v_d)
                             del assigned_tasks[victim_id]
                             
                             # 2. Thử đặt U_Task vào (Kiểm tra lại xem có sạch ko)
                             # (Lưu ý: Sau khi gỡ victim, slot (s, e) cho u_task phải trống hoàn toàn)
-                            can_place_u = True
-                            for k in range(s, e + 1):
-                                if class_grid[uc][k] != -1 or teacher_grid[t][k] != -1:
-                                    can_place_u = False; break
-                            
-                            if can_place_u:
+                            if occ.is_free(uc, t, SLOT_MASKS[ud][s]):
                                 # Đặt U vào tạm
-                                for k in range(s, e + 1):
-                                    class_grid[uc][k] = u_tid
-                                    teacher_grid[t][k] = u_tid
+                                occ.place(u_tid, uc, t, s, ud)
                                 assigned_tasks[u_tid] = (s, t)
                                 
                                 # 3. Tìm chỗ mới cho Victim
@@ -194,17 +164,9 @@ def solve_ultimate_local_search():
                                         if not is_valid_session(new_vs, v_d): continue
                                         
                                         # Check conflict cho victim ở chỗ mới
-                                        new_ve = new_vs + v_d - 1
-                                        v_conflict = False
-                                        for k in range(new_vs, new_ve + 1):
-                                            if class_grid[v_c][k] != -1 or teacher_grid[new_vt][k] != -1:
-                                                v_conflict = True; break
-                                        
-                                        if not v_conflict:
+                                        if occ.is_free(v_c, new_vt, SLOT_MASKS[v_d][new_vs]):
                                             # TÌM ĐƯỢC CHỖ MỚI! -> CHỐT ĐƠN
-                                            for k in range(new_vs, new_ve + 1):
-                                                class_grid[v_c][k] = victim_id
-                                                teacher_grid[new_vt][k] = victim_id
+                                            occ.place(victim_id, v_c, new_vt, new_vs, v_d)
                                             assigned_tasks[victim_id] = (new_vs, new_vt)
                                             victim_reassigned = True
                                             break
@@ -214,16 +176,12 @@ def solve_ultimate_local_search():
                                     break # Thành công, thoát vòng lặp slot
                                 else:
                                     # Kèo này fail -> Hoàn tác U
-                                    for k in range(s, e + 1):
-                                        class_grid[uc][k] = -1
-                                        teacher_grid[t][k] = -1
+                                    occ.remove(uc, t, s, ud)
                                     del assigned_tasks[u_tid]
                             
                             # Nếu fail toàn tập -> Trả victim về chỗ cũ
                             if not inserted:
-                                for k in range(v_s, v_e + 1):
-                                    class_grid[v_c][k] = victim_id
-                                    teacher_grid[v_t][k] = victim_id
+                                occ.place(victim_id, v_c, v_t, v_s, v_d)
                                 assigned_tasks[victim_id] = (v_s, v_t)
 
             if not inserted:
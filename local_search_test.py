@@ -1,5 +1,7 @@
 import sys
 import time # Import time
+from occupancy import Occupancy, SLOT_MASKS
+from utils import index_tasks_by_id, build_subject_index
 
 # --- CẤU HÌNH ---
 SLOTS_PER_SESSION = 6
@@ -64,9 +66,11 @@ def solve(input_content=None, time_limit=0.95):
     # 2. CHUẨN BỊ DATA
     tasks = []
     task_counter = 0
+    # Chỉ mục ngược Môn -> Giáo viên (xây 1 lần, task cùng môn dùng chung list)
+    subject_to_teachers = build_subject_index(M, teacher_abilities)
     for c_idx, courses in enumerate(class_courses):
         for m_id in courses:
-            eligible = [t for t in range(T) if m_id in teacher_abilities[t]]
+            eligible = subject_to_teachers[m_id]
             tasks.append({
                 'id': task_counter,
                 'c': c_idx, 'm': m_id, 
@@ -77,12 +81,13 @@ def solve(input_content=None, time_limit=0.95):
 
     # HEURISTIC SORT:
     tasks.sort(key=lambda x: (len(x['eligible']), -x['d'], x['c']))
+    # Tra task theo ID O(1) (sau khi sort, tasks[tid] không còn là task tid)
+    task_by_id = index_tasks_by_id(tasks)
 
     teacher_degrees = [len(s) for s in teacher_abilities]
 
     assigned_tasks = {}
-    class_grid = [[-1] * (MAX_SLOTS + 1) for _ in range(N)]
-    teacher_grid = [[-1] * (MAX_SLOTS + 1) for _ in range(T)]
+    occ = Occupancy(N, T)
 
     unassigned_list = []
 
@@ -102,17 +107,11 @@ def solve(input_content=None, time_limit=0.95):
             for s in range(1, MAX_SLOTS - d + 2):
                 if not is_valid_session(s, d): continue
                 
-                e = s + d - 1
-                conflict = False
-                for k in range(s, e + 1):
-                    if class_grid[c][k] != -1 or teacher_grid[t][k] != -1:
-                        conflict = True; break
-                
-                if not conflict:
+                # Check conflict
+                if occ.is_free(c, t, SLOT_MASKS[d][s]):
+                    # Assign
                     assigned_tasks[tid] = (s, t)
-                    for k in range(s, e + 1):
-                        class_grid[c][k] = tid
-                        teacher_grid[t][k] = tid
+                    occ.place(tid, c, t, s, d)
                     is_assigned = True
                     break
         
@@ -142,47 +141,26 @@ def solve(input_content=None, time_limit=0.95):
                 for s in range(1, MAX_SLOTS - ud + 2):
                     if not is_valid_session(s, ud): continue
                     
-                    e = s + ud - 1
-                    
-                    conflicting_tasks = set()
-                    possible_spot = True
-                    
-                    for k in range(s, e + 1):
-                        ct = class_grid[uc][k]
-                        if ct != -1: 
-                            conflicting_tasks.add(ct)
-                        
-                        tt = teacher_grid[t][k]
-                        if tt != -1:
-                            conflicting_tasks.add(tt)
+                    # Tìm các task đang chắn đường (Victims): chỉ duyệt các bit va chạm
+                    conflicting_tasks = occ.blockers(uc, t, SLOT_MASKS[ud][s])
 
                     if len(conflicting_tasks) == 1:
                         victim_id = list(conflicting_tasks)[0]
-                        victim_task = next((x for x in tasks if x['id'] == victim_id), None)
+                        victim_task = task_by_id[victim_id]
                         
                         if victim_task:
                             # --- THỬ DỜI VICTIM ---
                             v_s, v_t = assigned_tasks[victim_id]
                             v_c, v_d = victim_task['c'], victim_task['d']
-                            v_e = v_s + v_d - 1
                             
                             # Clear grid tạm thời
-                            for k in range(v_s, v_e + 1):
-                                class_grid[v_c][k] = -1
-                                teacher_grid[v_t][k] = -1
+                            occ.remove(v_c, v_t, v_s, v_d)
                             del assigned_tasks[victim_id]
                             
                             # Thử đặt U_Task vào
-                            can_place_u = True
-                            for k in range(s, e + 1):
-                                if class_grid[uc][k] != -1 or teacher_grid[t][k] != -1:
-                                    can_place_u = False; break
-                            
-                            if can_place_u:
+                            if occ.is_free(uc, t, SLOT_MASKS[ud][s]):
                                 # Đặt U vào tạm
-                                for k in range(s, e + 1):
-                                    class_grid[uc][k] = u_tid
-                                    teacher_grid[t][k] = u_tid
+                                occ.place(u_tid, uc, t, s, ud)
                                 assigned_tasks[u_tid] = (s, t)
                                 
                                 # Tìm chỗ mới cho Victim
@@ -194,16 +172,8 @@ def solve(input_content=None, time_limit=0.95):
                                     for new_vs in range(1, MAX_SLOTS - v_d + 2):
                                         if not is_valid_session(new_vs, v_d): continue
                                         
-                                        new_ve = new_vs + v_d - 1
-                                        v_conflict = False
-                                        for k in range(new_vs, new_ve + 1):
-                                            if class_grid[v_c][k] != -1 or teacher_grid[new_vt][k] != -1:
-                                                v_conflict = True; break
-                                        
-                                        if not v_conflict:
-                                            for k in range(new_vs, new_ve + 1):
-                                                class_grid[v_c][k] = victim_id
-                                                teacher_grid[new_vt][k] = victim_id
+                                        if occ.is_free(v_c, new_vt, SLOT_MASKS[v_d][new_vs]):
+                                            occ.place(victim_id, v_c, new_vt, new_vs, v_d)
                                             assigned_tasks[victim_id] = (new_vs, new_vt)
                                             victim_reassigned = True
                                             break
@@ -213,16 +183,12 @@ def solve(input_content=None, time_limit=0.95):
                                     break 
                                 else:
                                     # Hoàn tác U
-                                    for k in range(s, e + 1):
-                                        class_grid[uc][k] = -1
-                                        teacher_grid[t][k] = -1
+                                    occ.remove(uc, t, s, ud)
                                     del assigned_tasks[u_tid]
                             
                             if not inserted:
                                 # Trả victim về chỗ cũ
-                                for k in range(v_s, v_e + 1):
-                                    class_grid[v_c][k] = victim_id
-                                    teacher_grid[v_t][k] = victim_id
+                                occ.place(victim_id, v_c, v_t, v_s, v_d)
                                 assigned_tasks[victim_id] = (v_s, v_t)
 
             if not inserted:
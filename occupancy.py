@@ -0,0 +1,124 @@
+from utils import MAX_SLOTS, is_valid_session
+
+# --- MẶT NẠ BIT CHO TỪNG (THỜI LƯỢNG, SLOT BẮT ĐẦU) ---
+# Slot s (1-based) ứng với bit (s - 1) trong số nguyên 60 bit
+def slot_mask(start, duration):
+    """Mặt nạ bit của môn dài duration tiết bắt đầu ở slot start (1-based)"""
+    return ((1 << duration) - 1) << (start - 1)
+
+# SLOT_MASKS[d][s] = slot_mask(s, d), tra bảng nhanh hơn tính lại trong vòng lặp nóng
+SLOT_MASKS = [[slot_mask(s, d) if s > 0 else 0 for s in range(MAX_SLOTS + 1)]
+              for d in range(MAX_SLOTS + 1)]
+
+# --- ĐẾM SLOT BẮT ĐẦU CÒN TRỐNG (POPCOUNT) ---
+# START_MASKS[d]: bit (s - 1) bật <=> s là slot bắt đầu hợp lệ của môn dài d (không vắt qua buổi)
+START_MASKS = [sum(1 << (s - 1) for s in range(1, MAX_SLOTS + 1) if d > 0 and is_valid_session(s, d))
+               for d in range(MAX_SLOTS + 1)]
+
+def free_starts(free, duration):
+    """
+    Đếm phương án không cần duyệt slot: trả về (số slot bắt đầu đặt vừa môn dài duration
+    trong free, slot bắt đầu sớm nhất - 0 nếu không có). free: bit bật = slot rảnh,
+    truyền thẳng ~busy được (bit ngoài 60 slot bị START_MASKS loại bỏ).
+    Dịch + AND theo kiểu nhân đôi: sau mỗi bước, bit k bật <=> span slot từ k đều rảnh.
+    """
+    if not 0 < duration < len(START_MASKS):
+        return 0, 0 # Môn dài quá 60 slot (hoặc <= 0): không có slot bắt đầu nào
+    runs, span = free, 1
+    while span < duration:
+        step = min(span, duration - span)
+        runs &= runs >> step
+        span += step
+    runs &= START_MASKS[duration]
+    return runs.bit_count(), (runs & -runs).bit_length()
+
+# --- BẢNG CHIẾM CHỖ LỚP / GIÁO VIÊN ---
+class Occupancy:
+    """
+    Trạng thái chiếm chỗ dùng chung cho các solver dạng lưới.
+    - class_mask[c], teacher_mask[t]: 1 số nguyên 60 bit, bit bật = slot đã bận
+      -> Check va chạm chỉ còn 1 phép AND thay vì duyệt từng tiết.
+    - class_owner[c][k], teacher_owner[t][k]: ID task đang chiếm slot k (-1 là trống),
+      chỉ dùng để tìm "nạn nhân" khi có va chạm. Tắt bằng track_owners=False
+      nếu solver không cần (VD: decoder của PSO).
+    """
+    __slots__ = ('class_mask', 'teacher_mask', 'class_owner', 'teacher_owner')
+
+    def __init__(self, N, T, track_owners=True):
+        self.class_mask = [0] * N
+        self.teacher_mask = [0] * T
+        if track_owners:
+            self.class_owner = [[-1] * (MAX_SLOTS + 1) for _ in range(N)]
+            self.teacher_owner = [[-1] * (MAX_SLOTS + 1) for _ in range(T)]
+        else:
+            self.class_owner = None
+            self.teacher_owner = None
+
+    def is_free(self, c, t, mask):
+        """Lớp c và giáo viên t đều rảnh trên toàn bộ mask"""
+        return not ((self.class_mask[c] | self.teacher_mask[t]) & mask)
+
+    def place(self, tid, c, t, start, duration):
+        mask = SLOT_MASKS[duration][start]
+        self.class_mask[c] |= mask
+        self.teacher_mask[t] |= mask
+        if self.class_owner is not None:
+            c_row, t_row = self.class_owner[c], self.teacher_owner[t]
+            for k in range(start, start + duration):
+                c_row[k] = tid
+                t_row[k] = tid
+
+    def remove(self, c, t, start, duration):
+        mask = SLOT_MASKS[duration][start]
+        self.class_mask[c] &= ~mask
+        self.teacher_mask[t] &= ~mask
+        if self.class_owner is not None:
+            c_row, t_row = self.class_owner[c], self.teacher_owner[t]
+            for k in range(start, start + duration):
+                c_row[k] = -1
+                t_row[k] = -1
+
+    def blockers(self, c, t, mask):
+        """Tập ID các task đang chắn mask của lớp c / giáo viên t (chỉ duyệt các bit va chạm)"""
+        victims = set()
+        busy = self.class_mask[c] & mask
+        if busy:
+            row = self.class_owner[c]
+            while busy:
+                low = busy & -busy
+                victims.add(row[low.bit_length()])
+                busy ^= low
+        busy = self.teacher_mask[t] & mask
+        if busy:
+            row = self.teacher_owner[t]
+            while busy:
+                low = busy & -busy
+                victims.add(row[low.bit_length()])
+                busy ^= low
+        return victims
+
+    def single_blocker(self, c, t, mask):
+        """
+        ID task duy nhất chắn mask của lớp c / giáo viên t; None nếu không va chạm hoặc có >= 2 task chắn.
+        Mỗi task chiếm 1 đoạn slot liền nhau trên dòng owner -> bit va chạm thấp nhất và cao nhất
+        cùng chủ thì mọi bit va chạm ở giữa cũng thuộc chủ đó (dừng ngay khi gặp chủ thứ 2).
+        """
+        victim = None
+        busy = self.class_mask[c] & mask
+        if busy:
+            row = self.class_owner[c]
+            victim = row[(busy & -busy).bit_length()]
+            if row[busy.bit_length()] != victim:
+                return None
+        busy = self.teacher_mask[t] & mask
+        if busy:
+            row = self.teacher_owner[t]
+            owner = row[(busy & -busy).bit_length()]
+            if row[busy.bit_length()] != owner or (victim is not None and owner != victim):
+                return None
+            victim = owner
+        return victim
+
+    def is_free_except(self, tid, c, t, mask):
+        """Như is_free nhưng bỏ qua các slot do chính task tid chiếm (dùng khi dời task)"""
+        return self.is_free(c, t, mask) or self.single_blocker(c, t, mask) == tid
@@ -0,0 +1,230 @@
+import os
+import json
+import math
+import argparse
+import statistics
+from contextlib import closing
+from utils import load_compiled_instance
+from analyzer import FEATURES_FILE, compute_features, load_features, feature_rows, analyze_corpus
+from results_store import RESULTS_DB, open_store, file_version
+
+# --- CẤU HÌNH PORTFOLIO ---
+# Chọn solver + ngân sách thời gian cho từng instance theo lịch sử benchmark: tìm K instance đã
+# chạy có đặc trưng gần nhất (k-NN), lấy cặp (solver, time_limit) đạt mục tiêu nhanh nhất trên chúng.
+K_NEIGHBORS = 3
+# Đặc trưng dùng để đo khoảng cách (chuẩn hóa z-score); tasks lấy log vì trải từ vài trăm tới hàng trăm nghìn
+FEATURE_COLUMNS = ('class_load_percent', 'scarcity_percent', 'max_duration', 'log_tasks', 'bound_gap')
+# Mốc "đạt mục tiêu" giống time-to-target của benchmark: 99% điểm tốt nhất từng thấy trên dataset
+TARGET_RATIO = 0.99
+# Lượt chạy không đạt mục tiêu tính chi phí = MISS_PENALTY * time_limit của lượt đó
+MISS_PENALTY = 10.0
+# Ngân sách đề xuất = BUDGET_MARGIN * TTT lâu nhất của láng giềng (không vượt time_limit đã đo, không dưới MIN_BUDGET)
+BUDGET_MARGIN = 2.0
+MIN_BUDGET = 0.05
+# Chưa có lịch sử phù hợp -> chọn theo xếp hạng độ khó của analyzer
+FALLBACK = {
+    'HARD': ('sa_test', 60.0),
+    'MEDIUM': ('regret_based_test', 1.0),
+    'EASY': ('regret_based_test', 1.0),
+}
+
+def feature_vector(features):
+    """Vector đặc trưng (theo FEATURE_COLUMNS) của 1 dòng trong bảng đặc trưng / kết quả compute_features"""
+    tasks = features['tasks']
+    derived = {
+        'log_tasks': math.log1p(tasks),
+        # Tỉ lệ task chắc chắn không xếp được (theo cận trên)
+        'bound_gap': (tasks - features['upper_bound']) / tasks if tasks else 0.0,
+    }
+    return [float(derived[name] if name in derived else features[name]) for name in FEATURE_COLUMNS]
+
+def load_history(conn, current_versions=True):
+    """
+    Kết quả benchmark theo dataset: {dataset_hash: {(module, time_limit): [chi phí từng lượt]}}.
+    Chi phí = thời điểm đạt TARGET_RATIO * điểm tốt nhất của dataset (TTT), lượt không đạt / lỗi
+    tính MISS_PENALTY * time_limit. current_versions: bỏ các lượt của phiên bản solver cũ
+    (mã nguồn đã sửa) và của solver không còn file.
+    """
+    runs, best = [], {}
+    rows = conn.execute("SELECT dataset_hash, module, time_limit, solver_version, status, score, trace_json FROM runs")
+    versions = {}
+    for dataset_hash, module, time_limit, version, status, score, trace_json in rows:
+        if current_versions:
+            if module not in versions:
+                path = f"{module}.py"
+                versions[module] = file_version(path) if os.path.exists(path) else None
+            if versions[module] != version:
+                continue
+        ok = status == 'ok'
+        runs.append((dataset_hash, module, time_limit, ok, json.loads(trace_json) if ok else []))
+        if ok:
+            best[dataset_hash] = max(best.get(dataset_hash, 0), score or 0)
+
+    history = {}
+    for dataset_hash, module, time_limit, ok, trace in runs:
+        target = TARGET_RATIO * best.get(dataset_hash, 0)
+        ttt = next((elapsed for elapsed, score in trace if score >= target), None) if ok and target > 0 else None
+        cost = ttt if ttt is not None else MISS_PENALTY * time_limit
+        history.setdefault(dataset_hash, {}).setdefault((module, time_limit), []).append((cost, ttt))
+    return history
+
+class Portfolio:
+    """
+    Bộ chọn thuật toán k-NN. Mỗi "ca" học được = (vector đặc trưng đã chuẩn hóa, lịch sử chạy của dataset).
+    select() chọn cặp (solver, time_limit) có chi phí trung bình nhỏ nhất trên K ca gần nhất
+    (chỉ xét cặp đã chạy trên mọi láng giềng), ngân sách rút gọn theo TTT thực tế của láng giềng.
+    Ngân sách đề xuất nhỏ hơn time_limit lúc đo: solver tự chỉnh lịch nhiệt / số vòng theo time_limit
+    nên kết quả có thể lệch nhẹ so với lúc benchmark.
+    """
+    def __init__(self, cases, k=K_NEIGHBORS):
+        self.k = k
+        self.cases = cases # [(dataset_hash, vector thô, {(module, time_limit): [(chi phí, ttt)]})]
+        columns = list(zip(*(vector for _, vector, _ in cases))) if cases else []
+        self.mean = [statistics.fmean(col) for col in columns]
+        self.scale = [statistics.pstdev(col) or 1.0 for col in columns]
+
+    @classmethod
+    def from_store(cls, results_db=RESULTS_DB, features_path=FEATURES_FILE, k=K_NEIGHBORS):
+        """Học từ kho kết quả benchmark + bảng đặc trưng của analyzer (dataset chưa phân tích thì bỏ qua)"""
+        known = feature_rows(load_features(features_path))
+        history = {}
+        if os.path.exists(results_db):
+            with closing(open_store(results_db)) as conn:
+                history = load_history(conn)
+        cases = [(dataset_hash, feature_vector(known[dataset_hash]), runs)
+                 for dataset_hash, runs in history.items() if dataset_hash in known]
+        return cls(cases, k)
+
+    def _normalize(self, vector):
+        return [(x - mu) / sd for x, mu, sd in zip(vector, self.mean, self.scale)]
+
+    def neighbors(self, features, exclude=None):
+        """K ca gần nhất (khoảng cách Euclid trên đặc trưng chuẩn hóa): [(khoảng cách, ca)]"""
+        query = self._normalize(feature_vector(features))
+        scored = []
+        for case in self.cases:
+            if case[0] == exclude:
+                continue
+            dist = math.dist(query, self._normalize(case[1]))
+            scored.append((dist, case))
+        scored.sort(key=lambda item: item[0])
+        return scored[:self.k]
+
+    def select(self, features, exclude=None):
+        """
+        Trả về (module, ngân sách giây, lý do) cho instance có đặc trưng features.
+        exclude: bỏ 1 dataset_hash khỏi tập học (đánh giá leave-one-out).
+        """
+        near = self.neighbors(features, exclude)
+        if near:
+            candidates = set.intersection(*(set(case[2]) for _, case in near))
+            scored = []
+            for key in candidates:
+                runs = [run for _, case in near for run in case[2][key]]
+                scored.append((statistics.fmean(cost for cost, _ in runs), key, runs))
+            if scored:
+                cost, (module, time_limit), runs = min(scored, key=lambda item: (item[0], item[1]))
+                hits = [ttt for _, ttt in runs if ttt is not None]
+                if len(hits) == len(runs):
+                    budget = min(time_limit, max(MIN_BUDGET, BUDGET_MARGIN * max(hits)))
+                else: # Có láng giềng không đạt mục tiêu -> giữ nguyên ngân sách đã đo
+                    budget = time_limit
+                return module, budget, f"k-NN ({len(near)} láng giềng, TTT TB {cost:.3f}s, đạt {len(hits)}/{len(runs)})"
+        module, budget = FALLBACK[features['difficulty']]
+        return module, budget, f"mặc định theo độ khó {features['difficulty']} (chưa có lịch sử)"
+
+    def evaluate(self, features_by_hash):
+        """
+        Leave-one-out trên các ca đã học: chọn cho từng dataset bằng các dataset còn lại,
+        so chi phí thực tế của lựa chọn với cặp tốt nhất của chính dataset đó.
+        Trả về list (dataset_hash, lựa chọn, chi phí lựa chọn hoặc None nếu cặp chưa chạy, chi phí tốt nhất).
+        """
+        report = []
+        for dataset_hash, _, runs in self.cases:
+            module, _, _ = self.select(features_by_hash[dataset_hash], exclude=dataset_hash)
+            costs = {key: statistics.fmean(cost for cost, _ in r) for key, r in runs.items()}
+            chosen = [cost for (m, _), cost in costs.items() if m == module]
+            report.append((dataset_hash, module, min(chosen) if chosen else None, min(costs.values())))
+        return report
+
+# --- GIẢI BẰNG PORTFOLIO ---
+_PORTFOLIO = None
+
+def solve(input_content=None, time_limit=None, progress=None, details=False, timer=None, stats=None):
+    """
+    Giải 1 instance bằng solver được portfolio chọn (học từ RESULTS_DB + FEATURES_FILE ở thư mục hiện tại).
+    time_limit (nếu có) chặn trên ngân sách portfolio đề xuất.
+    """
+    global _PORTFOLIO
+    from benchmark_runner import load_solver, call_solver # Chỉ cần khi thực sự giải
+
+    inst = load_compiled_instance(input_content, timer)
+    if inst is None: return 0
+    features = compute_features(inst)
+    if _PORTFOLIO is None:
+        _PORTFOLIO = Portfolio.from_store()
+    module, budget, _ = _PORTFOLIO.select(features)
+    if time_limit is not None:
+        budget = min(budget, time_limit)
+
+    func = load_solver(module)
+    if func is None: return 0
+    # Truyền thẳng CompiledInstance (không parse lại) + cận trên đã tính (solver chạm cận thì dừng sớm)
+    result = call_solver(func, inst, budget, progress, details or input_content is None, timer, stats,
+                         features['upper_bound'])
+
+    # Chạy trực tiếp (stdin): in lời giải như các solver (cần solver hỗ trợ details)
+    if input_content is None and not isinstance(result, int):
+        final_output = sorted(result, key=lambda x: (x[0], x[1]))
+        print(len(final_output))
+        for item in final_output:
+            print(f"{item[0]} {item[1]} {item[2]} {item[3]}")
+        return final_output if details else len(final_output)
+    return result
+
+# --- CLI ---
+def main():
+    parser = argparse.ArgumentParser(description="Chọn solver + ngân sách thời gian cho từng test case theo lịch sử benchmark")
+    parser.add_argument("paths", nargs="*", default=["test_case"],
+                        help="File .txt hoặc thư mục chứa file .txt (mặc định test_case)")
+    parser.add_argument("--results-db", default=RESULTS_DB, help="Kho kết quả benchmark (mặc định %(default)s)")
+    parser.add_argument("--features", default=FEATURES_FILE, help="Bảng đặc trưng của analyzer (mặc định %(default)s)")
+    parser.add_argument("-k", type=int, default=K_NEIGHBORS, help="Số láng giềng (mặc định %(default)s)")
+    parser.add_argument("--evaluate", action="store_true",
+                        help="Đánh giá leave-one-out trên các dataset đã có trong kho kết quả")
+    args = parser.parse_args()
+
+    portfolio = Portfolio.from_store(args.results_db, args.features, max(1, args.k))
+    print(f"Portfolio học từ {len(portfolio.cases)} dataset ('{args.results_db}' + '{args.features}')\n")
+
+    if args.evaluate:
+        known = feature_rows(load_features(args.features))
+        report = portfolio.evaluate(known)
+        print(f"{'DATASET':<20} | {'CHỌN':<20} | {'CHI PHÍ':>9} | {'TỐT NHẤT':>9}")
+        print("-" * 68)
+        for dataset_hash, module, cost, best in report:
+            cost_str = f"{cost:.3f}s" if cost is not None else "-"
+            print(f"{known[dataset_hash]['dataset']:<20} | {module:<20} | {cost_str:>9} | {best:>8.3f}s")
+        hits = sum(1 for _, _, cost, best in report if cost is not None and cost <= best)
+        print(f"\nChọn đúng cặp nhanh nhất: {hits}/{len(report)}")
+        return
+
+    files = []
+    for path in args.paths:
+        if os.path.isdir(path):
+            files.extend(sorted(os.path.join(path, f) for f in os.listdir(path) if f.endswith(".txt")))
+        else:
+            files.append(path)
+
+    # Đặc trưng lấy từ bảng của analyzer (file mới / đã sửa thì phân tích rồi ghi thêm vào bảng)
+    features = analyze_corpus(files, features_path=args.features)
+    print(f"{'FILE NAME':<20} | {'SOLVER':<20} | {'NGÂN SÁCH':>9} | {'LÝ DO'}")
+    print("-" * 100)
+    for path in files:
+        if path not in features:
+            continue
+        module, budget, reason = portfolio.select(features[path])
+        print(f"{os.path.basename(path):<20} | {module:<20} | {budget:>8.2f}s | {reason}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,198 @@
+import os
+import io
+import sys
+import time
+import signal
+import subprocess
+import cProfile
+import pstats
+import tracemalloc
+from collections import Counter
+try:
+    import resource # Chỉ có trên Unix
+except ImportError:
+    resource = None
+
+# --- CẤU HÌNH PROFILE ---
+PROFILE_DIR = "profiles"
+PROFILE_MODES = ('cprofile', 'sample')
+SAMPLE_INTERVAL = 0.005 # Giây giữa 2 lần lấy mẫu (tính theo CPU time của process)
+TOP_FUNCTIONS = 30      # Số hàm in ra trong file tóm tắt .txt
+TOP_ALLOCATIONS = 5     # Số dòng code cấp phát nhiều nhất giữ lại khi bật tracemalloc
+TRACEMALLOC_FRAMES = 1  # Độ sâu traceback tracemalloc lưu cho mỗi khối (1 = rẻ nhất)
+TOP_IMPORTS = 3         # Số import nặng nhất in ra trong báo cáo thời gian khởi động
+
+class SamplingProfiler:
+    """
+    Profiler lấy mẫu: cứ SAMPLE_INTERVAL giây CPU thì SIGPROF ngắt 1 lần và ghi lại call stack
+    của thread chính. Chi phí gần như không đổi theo số lời gọi hàm (khác cProfile),
+    nên thời gian đo được sát với lúc chạy thật. Chỉ dùng được trên Unix, trong thread chính.
+    """
+    def __init__(self, interval=SAMPLE_INTERVAL):
+        self.interval = interval
+        self.stacks = Counter() # "file:hàm;file:hàm;..." (gốc -> lá) -> số mẫu
+
+    def _sample(self, signum, frame):
+        stack = []
+        while frame is not None:
+            code = frame.f_code
+            stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+            frame = frame.f_back
+        self.stacks[";".join(reversed(stack))] += 1
+
+    def enable(self):
+        signal.signal(signal.SIGPROF, self._sample)
+        signal.setitimer(signal.ITIMER_PROF, self.interval, self.interval)
+
+    def disable(self):
+        signal.setitimer(signal.ITIMER_PROF, 0, 0)
+        signal.signal(signal.SIGPROF, signal.SIG_DFL)
+
+    def dump(self, path):
+        """Ghi dạng collapsed stack (mỗi dòng 'stack số_mẫu'), đọc được bằng flamegraph.pl / speedscope"""
+        with open(path, 'w') as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+    def summary(self, limit=TOP_FUNCTIONS):
+        """Bảng các hàm tốn thời gian nhất: self (đang chạy ở chính hàm) và total (có trong stack)"""
+        total = sum(self.stacks.values())
+        self_count, total_count = Counter(), Counter()
+        for stack, count in self.stacks.items():
+            frames = stack.split(";")
+            self_count[frames[-1]] += count
+            for name in set(frames):
+                total_count[name] += count
+        lines = [f"{total} mẫu, mỗi mẫu {self.interval * 1000:.1f}ms CPU",
+                 f"{'self %':>8} {'total %':>8}  hàm"]
+        for name, count in self_count.most_common(limit):
+            lines.append(f"{100 * count / max(total, 1):8.1f} {100 * total_count[name] / max(total, 1):8.1f}  {name}")
+        return "\n".join(lines) + "\n"
+
+def profile_call(mode, path_base, func, *args, **kwargs):
+    """
+    Chạy func(*args, **kwargs) dưới profiler mode ('cprofile' | 'sample') và ghi kết quả:
+    - cprofile: path_base.prof (pstats, mở bằng snakeviz / pstats) + path_base.txt (top theo cumtime)
+    - sample:   path_base.folded (collapsed stack) + path_base.txt (top theo self time)
+    Kết quả vẫn được ghi nếu func ném lỗi.
+    """
+    os.makedirs(os.path.dirname(path_base) or ".", exist_ok=True)
+    profiler = cProfile.Profile() if mode == 'cprofile' else SamplingProfiler()
+    profiler.enable()
+    try:
+        return func(*args, **kwargs)
+    finally:
+        profiler.disable()
+        if mode == 'cprofile':
+            profiler.dump_stats(path_base + ".prof")
+            out = io.StringIO()
+            pstats.Stats(profiler, stream=out).sort_stats('cumulative').print_stats(TOP_FUNCTIONS)
+            text = out.getvalue()
+        else:
+            profiler.dump(path_base + ".folded")
+            text = profiler.summary()
+        with open(path_base + ".txt", 'w') as f:
+            f.write(text)
+
+def profile_path(dataset, module_name, mode_label, run_idx, profile_dir=PROFILE_DIR):
+    """Tiền tố file profile của 1 ô: profiles/<dataset>__<solver>__<mode>__run<k>"""
+    stem = os.path.splitext(os.path.basename(dataset))[0]
+    mode_slug = "".join(ch if ch.isalnum() else "_" for ch in mode_label)
+    return os.path.join(profile_dir, f"{stem}__{module_name}__{mode_slug}__run{run_idx + 1}")
+
+# --- ĐO BỘ NHỚ ---
+
+def peak_rss_mb(pid=None):
+    """
+    RSS đỉnh (MB) của process pid (None = process hiện tại).
+    Linux: đọc VmHWM trong /proc (đọc được cả process con còn sống);
+    nơi khác chỉ đo được process hiện tại qua getrusage. Không đo được thì trả về None.
+    """
+    try:
+        with open(f"/proc/{pid or 'self'}/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024 # kB -> MB
+    except OSError:
+        pass
+    if pid is None and resource is not None:
+        maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # macOS trả về byte, Linux / BSD trả về kB
+        return maxrss / (1024 * 1024) if sys.platform == 'darwin' else maxrss / 1024
+    return None
+
+class AllocTracker:
+    """
+    Theo dõi cấp phát bằng tracemalloc (làm solver chậm đi đáng kể -> chỉ bật khi cần).
+    Snapshot chụp ở cuối thì bộ nhớ của solver đã được giải phóng, nên checkpoint() được gọi
+    giữa chừng (đổi pha, báo lời giải mới) và chỉ chụp lại khi bộ nhớ đang giữ tăng > 10%
+    -> top cấp phát phản ánh lúc gần đỉnh.
+    """
+    def __init__(self, limit=TOP_ALLOCATIONS):
+        self.limit = limit
+        self.snapshot = None
+        self.snapshot_size = 0
+
+    def start(self):
+        tracemalloc.start(TRACEMALLOC_FRAMES)
+
+    def checkpoint(self):
+        current = tracemalloc.get_traced_memory()[0]
+        if current > self.snapshot_size * 1.1:
+            self.snapshot = tracemalloc.take_snapshot()
+            self.snapshot_size = current
+
+    def stop(self):
+        """
+        Tắt tracemalloc, trả về (đỉnh bộ nhớ Python MB, top dòng code giữ nhiều bộ nhớ nhất).
+        Mỗi phần tử top: (file:dòng, MB, số khối).
+        """
+        self.checkpoint()
+        py_peak = tracemalloc.get_traced_memory()[1] / (1024 * 1024)
+        tracemalloc.stop()
+        snapshot = self.snapshot.filter_traces([tracemalloc.Filter(False, tracemalloc.__file__)])
+        top = []
+        for stat in snapshot.statistics('lineno')[:self.limit]:
+            frame = stat.traceback[0]
+            top.append((f"{os.path.basename(frame.filename)}:{frame.lineno}",
+                        stat.size / (1024 * 1024), stat.count))
+        return py_peak, top
+
+# --- ĐO THỜI GIAN KHỞI ĐỘNG ---
+
+def import_time_report(path, limit=TOP_IMPORTS):
+    """
+    Đo chi phí khởi động 1 solver như khi chạy CLI: process Python mới chỉ nạp file path
+    (không gọi solve) dưới -X importtime.
+    Trả về (thời gian cả process giây, tổng thời gian import giây, top import nặng nhất [(module, giây)]).
+    Top tính theo thời gian cộng dồn của các import cấp ngoài cùng (kể cả import lúc khởi động interpreter).
+    """
+    module_name = os.path.splitext(os.path.basename(path))[0]
+    if module_name.isidentifier():
+        code = f"import {module_name}"
+    else: # Tên file có dấu cách (VD: các bản greedy cũ) -> nạp theo đường dẫn
+        code = ("import importlib.util; "
+                f"spec = importlib.util.spec_from_file_location('_solver', {os.path.basename(path)!r}); "
+                "spec.loader.exec_module(importlib.util.module_from_spec(spec))")
+    start = time.perf_counter()
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", code], capture_output=True, text=True,
+                          cwd=os.path.dirname(os.path.abspath(path)))
+    wall = time.perf_counter() - start
+    if proc.returncode != 0:
+        lines = proc.stderr.strip().splitlines()
+        raise RuntimeError(lines[-1] if lines else f"exit code {proc.returncode}")
+
+    # Dòng dạng "import time:  self_us | cumulative_us | <thụt lề>tên module"
+    top_level = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        parts = line[len("import time:"):].split("|")
+        if len(parts) != 3 or not parts[1].strip().isdigit():
+            continue # Dòng tiêu đề
+        name = parts[2][1:] # Bỏ 1 dấu cách sau '|', phần còn lại thụt lề theo độ sâu
+        if not name.startswith(" "):
+            top_level.append((name.strip(), int(parts[1]) / 1e6))
+    total = sum(seconds for _, seconds in top_level)
+    top_level.sort(key=lambda item: item[1], reverse=True)
+    return wall, total, top_level[:limit]
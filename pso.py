@@ -1,93 +1,72 @@
 import random
 import time
-import sys
 # Nạp các hàm tiện ích từ file utils.py
-from utils import load_and_preprocess, MAX_SLOTS
+from utils import load_compiled_instance
+from occupancy import Occupancy
 
 # --- CẤU HÌNH PSO ---
 NUM_PARTICLES = 30   # Số lượng hạt
 W = 0.7              # Trọng số quán tính (Inertia)
 C1 = 1.5             # Hệ số cá nhân (Cognitive)
 C2 = 1.5             # Hệ số xã hội (Social)
+OPTION_ORDER = 'teacher' # Thứ tự thử phương án khi decode: 'teacher' | 'earliest' | 'least_loaded'
 TIME_LIMIT = 0.95    # Giới hạn thời gian (giây)
 
 # --- HÀM GIẢI CHÍNH ---
-def solve(input_content=None):
+def solve(input_content=None, progress=None, details=False, timer=None, stats=None, upper_bound=None):
     start_time = time.time()
     
     # 1. GỌI TIỀN XỬ LÝ
-    # Giả lập stdin nếu có input string (dùng cho benchmark runner)
-    if input_content:
-        from io import StringIO
-        sys.stdin = StringIO(input_content)
+    # Benchmark runner truyền thẳng nội dung input (không patch sys.stdin -> chạy song song được)
+    inst = load_compiled_instance(input_content, timer)
+    if inst is None: return 0
 
-    data = load_and_preprocess()
-    if data is None: return 0
-
-    # Bung dữ liệu ra các biến
-    T, N, tasks = data['T'], data['N'], data['tasks']
-    valid_starts = data['valid_starts']
-    num_tasks = data['num_tasks']
+    # Bung dữ liệu ra các biến (các cột task đánh chỉ số theo task id)
+    T, N = inst.T, inst.N
+    task_c, task_m, task_d = inst.c, inst.m, inst.d
+    num_tasks = inst.num_tasks
+    # Bảng phương án xếp theo môn, dựng 1 lần (dùng lại nếu instance lấy từ cache)
+    option_table = inst.option_table(OPTION_ORDER)
 
     # --- HÀM DECODER (Random Key to Schedule) ---
     def decode_and_evaluate(position_vector):
         """
         Biến vector số thực (position) thành lịch học và tính điểm.
-        Sử dụng valid_starts từ utils để tăng tốc.
+        Sử dụng bảng phương án dựng sẵn từ utils để tăng tốc.
         """
         # 1. Gán priority và sort
-        # position_vector[i] là độ ưu tiên của tasks[i]
-        indexed_tasks = []
-        for i in range(num_tasks):
-            indexed_tasks.append((position_vector[i], tasks[i]))
-        
+        # position_vector[tid] là độ ưu tiên của task tid
         # Sort giảm dần theo priority (số lớn ưu tiên trước)
-        indexed_tasks.sort(key=lambda x: x[0], reverse=True)
+        decode_order = sorted(range(num_tasks), key=position_vector.__getitem__, reverse=True)
         
         # 2. Chạy Greedy Constructive
         current_assigned = []
         
-        # Grid check nhanh (Reset mỗi lần decode)
-        class_grid = [[-1] * (MAX_SLOTS + 1) for _ in range(N)]
-        teacher_grid = [[-1] * (MAX_SLOTS + 1) for _ in range(T)]
+        # Bitmask check nhanh (Reset mỗi lần decode, decoder không cần tìm nạn nhân)
+        occ = Occupancy(N, T, track_owners=False)
+        class_mask, teacher_mask = occ.class_mask, occ.teacher_mask
         
         assigned_count = 0
         sum_start_time = 0
         
-        for _, task in indexed_tasks:
-            c, d = task['c'], task['d'] # c is 0-based
-            placed = False
+        for tid in decode_order:
+            c, d = task_c[tid], task_d[tid] # c is 0-based
             
-            # Chọn giáo viên
-            for t in task['eligible']: # t is 0-based
-                if placed: break
-                
-                # LẤY SLOT TỪ CACHE (TỐI ƯU HÓA)
-                # Thay vì tính toán lại, lấy luôn list slot hợp lệ
-                slots = valid_starts.get(d, [])
-                
-                for s in slots:
-                    e = s + d - 1
-                    
-                    # Check Conflict
-                    conflict = False
-                    for k in range(s, e + 1):
-                        if class_grid[c][k] != -1 or teacher_grid[t][k] != -1:
-                            conflict = True; break
-                    
-                    if not conflict:
-                        # Gán task
-                        for k in range(s, e + 1):
-                            class_grid[c][k] = task['id']
-                            teacher_grid[t][k] = task['id']
-                            
-                        # Lưu kết quả (Class và Teacher cần +1 khi in, nhưng lưu raw trước)
-                        current_assigned.append((c, task['m'], s, t))
+            # Duyệt bảng phương án (teacher, start, mask) dựng sẵn của môn, lấy phương án đầu tiên còn trống
+            # (thứ tự phương án theo OPTION_ORDER, t is 0-based)
+            c_busy = class_mask[c]
+            for t, s, mask in option_table[task_m[tid]]:
+                # Check Conflict (1 phép AND)
+                if not ((c_busy | teacher_mask[t]) & mask):
+                    # Gán task
+                    occ.place(tid, c, t, s, d)
                         
-                        assigned_count += 1
-                        sum_start_time += s
-                        placed = True
-                        break
+                    # Lưu kết quả (Class và Teacher cần +1 khi in, nhưng lưu raw trước)
+                    current_assigned.append((c, task_m[tid], s, t))
+                    
+                    assigned_count += 1
+                    sum_start_time += s
+                    break
         
         # 3. Tính Fitness (Minimize Cost)
         # Cost = (Số môn chưa xếp * Phạt nặng) + Tổng thời gian bắt đầu
@@ -95,6 +74,7 @@ def solve(input_content=None):
         cost = n_unassigned * 1_000_000 + sum_start_time
         return cost, current_assigned
 
+    if timer is not None: timer.phase('construct')
     # --- KHỞI TẠO PSO ---
     particles_pos = []      # Vị trí
     particles_vel = []      # Vận tốc
@@ -123,8 +103,15 @@ def solve(input_content=None):
             global_best_pos = list(pos)
             global_best_sol = sol
 
+    # Báo lời giải tốt nhất của quần thể khởi tạo (thời gian đã chạy, số môn xếp được)
+    if progress is not None: progress(time.time() - start_time, len(global_best_sol))
+
+    if timer is not None: timer.phase('improve')
     # --- VÒNG LẶP PSO ---
-    while time.time() - start_time < TIME_LIMIT:
+    # Bộ đếm thông lượng: số vòng lặp bầy đàn, số lần decode, số lần cải thiện pbest / gbest
+    n_iter, n_decodes, n_improving, n_global = 0, NUM_PARTICLES, 0, 0
+    while time.time() - start_time < TIME_LIMIT and (upper_bound is None or len(global_best_sol) < upper_bound):
+        n_iter += 1
         for i in range(NUM_PARTICLES):
             # Cập nhật từng chiều (dimension)
             for d in range(num_tasks):
@@ -146,23 +133,33 @@ def solve(input_content=None):
             
             # Đánh giá lại
             val, sol = decode_and_evaluate(particles_pos[i])
+            n_decodes += 1
             
             # Update PBest
             if val < particles_pbest_val[i]:
                 particles_pbest_val[i] = val
                 particles_pbest_pos[i] = list(particles_pos[i])
+                n_improving += 1
                 
                 # Update GBest
                 if val < global_best_val:
                     global_best_val = val
                     global_best_pos = list(particles_pos[i])
                     global_best_sol = sol
+                    n_global += 1
+                    if progress is not None: progress(time.time() - start_time, len(global_best_sol))
+                    if upper_bound is not None and len(global_best_sol) >= upper_bound:
+                        break # Đã chạm cận trên -> tối ưu, không cần duyệt nốt bầy
+
+    if stats is not None:
+        stats.update(iterations=n_iter, decodes=n_decodes, improving=n_improving, global_improving=n_global)
 
+    if timer is not None: timer.phase('output')
     # --- OUTPUT ---
     # Chuẩn hóa format đầu ra
     final_output = []
     for (c, m, s, t) in global_best_sol:
-        # Utils dùng 0-based index cho c và t, output cần 1-based
+        # CompiledInstance dùng 0-based index cho c và t, output cần 1-based
         final_output.append((c + 1, m, s, t + 1))
 
     if input_content is None:
@@ -171,7 +168,8 @@ def solve(input_content=None):
         for item in final_output:
             print(f"{item[0]} {item[1]} {item[2]} {item[3]}")
     
-    return len(final_output)
+    if timer is not None: timer.stop()
+    return final_output if details else len(final_output)
 
 if __name__ == "__main__":
     solve()
\ No newline at end of file
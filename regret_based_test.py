@@ -1,151 +1,102 @@
-import sys
 import time # (1) Import time để tránh lỗi nếu có dùng time_limit (dù code này chạy 1 lần)
-
-# --- HÀM HỖ TRỢ ĐỌC DỮ LIỆU ---
-def get_iterator(input_content=None):
-    if input_content:
-        # Chế độ Benchmark: Đọc từ biến truyền vào
-        data = input_content.split()
-    else:
-        # Chế độ Nộp bài: Đọc từ bàn phím/sys.stdin
-        try:
-            data = sys.stdin.read().split()
-        except Exception: return iter([])
-        
-    return iter(data)
+import heapq
+from utils import load_compiled_instance
+from occupancy import SLOT_MASKS, free_starts
 
 # (2) Thêm tham số time_limit vào hàm solve cho đồng bộ
-def solve(input_content=None, time_limit=0.95):
+def solve(input_content=None, time_limit=0.95, details=False, timer=None):
     # --- 1. ĐỌC DỮ LIỆU ---
-    iterator = get_iterator(input_content)
-    
-    try:
-        T = int(next(iterator))
-        N = int(next(iterator))
-        M = int(next(iterator))
-    except StopIteration:
-        return 0
-
-    class_needs = []
-    for _ in range(N):
-        curr = []
-        while True:
-            try:
-                v = int(next(iterator))
-                if v == 0: break
-                curr.append(v)
-            except StopIteration: break
-        class_needs.append(curr)
-
-    # subject_to_teachers: Lưu danh sách ID giáo viên dạy được môn m
-    subject_to_teachers = [[] for _ in range(M + 1)]
-    for t_idx in range(1, T + 1):
-        while True:
-            try:
-                v = int(next(iterator))
-                if v == 0: break
-                if v <= M: subject_to_teachers[v].append(t_idx)
-            except StopIteration: break
-
-    durations = [0]
-    for _ in range(M):
-        try:
-            durations.append(int(next(iterator)))
-        except StopIteration: 
-            durations.append(1) # Default fallback
+    # input_content: text / bytes / đường dẫn / CompiledInstance (từ cache), None = stdin
+    inst = load_compiled_instance(input_content, timer)
+    if inst is None: return 0
+    T, N, num_tasks = inst.T, inst.N, inst.num_tasks
+    task_c, task_m, task_d = inst.c, inst.m, inst.d
 
     # --- 2. TIỀN XỬ LÝ BITMASK ---
-    # valid_masks: Lưu các vị trí bắt đầu và mặt nạ bit không nhảy buổi
-    valid_masks = [[] for _ in range(13)]
-    for d in range(1, 13):
-        for start in range(1, 61 - d + 2):
-            end = start + d - 1
-            if (start - 1) // 6 == (end - 1) // 6: # Ràng buộc cùng buổi
-                mask = ((1 << d) - 1) << (start - 1)
-                valid_masks[d].append((start, mask))
-
-    # unassigned_tasks: Danh sách các cặp (Lớp, Môn) cần xếp
-    unassigned_tasks = []
-    for c_idx, needs in enumerate(class_needs, 1):
-        for m_id in needs:
-            # Check range để tránh lỗi input sai
-            if m_id < len(durations):
-                unassigned_tasks.append({
-                    'c': c_idx, 
-                    'm': m_id, 
-                    'dur': durations[m_id],
-                    'eligible': subject_to_teachers[m_id] if m_id < len(subject_to_teachers) else []
-                })
+    # Chỉ mục ngược: task của từng lớp / (task, vị trí GV trong eligible) mà từng giáo viên dạy được
+    # -> gán 1 task chỉ cần đếm lại phương án của các task dùng chung lớp hoặc giáo viên đó
+    class_tasks = [[] for _ in range(N)]
+    teacher_tasks = [[] for _ in range(T)]
+    for i in range(num_tasks):
+        class_tasks[task_c[i]].append(i)
+        for k, t_id in enumerate(inst.eligible(i)):
+            teacher_tasks[t_id].append((i, k))
 
-    class_masks = [0] * (N + 1)
-    teacher_masks = [0] * (T + 1)
+    class_masks = [0] * N
+    teacher_masks = [0] * T
     final_solution = []
 
+    # Số slot bắt đầu trống của (lớp, GV) tính bằng popcount trên mặt nạ rảnh (free_starts), không duyệt slot
+    def teacher_counts(i):
+        """Số phương án còn trống của task i theo từng GV trong eligible (cùng thứ tự)"""
+        c_mask, d = class_masks[task_c[i]], task_d[i]
+        return [free_starts(~(c_mask | teacher_masks[t_id]), d)[0] for t_id in inst.eligible(i)]
+
+    def first_option(i):
+        """Phương án trống đầu tiên (GV tăng dần rồi slot sớm nhất - First Fit): (start, teacher, mask)"""
+        c_mask, d = class_masks[task_c[i]], task_d[i]
+        for t_id in inst.eligible(i):
+            start = free_starts(~(c_mask | teacher_masks[t_id]), d)[1]
+            if start:
+                return start, t_id, SLOT_MASKS[d][start]
+        return None
+
+    if timer is not None: timer.phase('construct')
     # --- 3. VÒNG LẶP REGRET-BASED GREEDY ---
-    while unassigned_tasks:
-        best_task_idx = -1
-        best_option = None # (start, teacher_id, mask)
-        min_options_count = float('inf')
-        max_regret_score = -1 # Tiêu chí phụ: Độ ưu tiên nếu options bằng nhau
+    # Hàng đợi ưu tiên (số phương án, -điểm regret, task id): task "nguy kịch" nhất ở đỉnh.
+    # Số phương án chỉ giảm dần (mặt nạ chỉ bật thêm bit) -> khi đếm lại thì đẩy phần tử mới,
+    # phần tử cũ bị bỏ qua lúc lấy ra (lazy deletion) nếu không khớp số đếm hiện tại.
+    # Thứ tự chọn giống hệt bản duyệt lại toàn bộ: ít phương án nhất -> regret lớn nhất -> task đứng trước.
+    per_teacher = [teacher_counts(i) for i in range(num_tasks)]
+    option_count = [sum(counts) for counts in per_teacher]
+    # Tie-breaker: Ưu tiên môn dài hơn hoặc môn có tổng số giáo viên ít hơn
+    regret_score = [task_d[i] * 100 - len(inst.eligible(i)) for i in range(num_tasks)]
+    # Task hết phương án thì loại luôn (chấp nhận thất bại task này)
+    heap = [(option_count[i], -regret_score[i], i) for i in range(num_tasks) if option_count[i] > 0]
+    heapq.heapify(heap)
+    assigned = bytearray(num_tasks)
 
-        # Duyệt tất cả các task còn lại để tìm task "nguy kịch" nhất
-        i = 0
-        while i < len(unassigned_tasks):
-            task = unassigned_tasks[i]
-            c_idx = task['c']
-            d = task['dur']
-            
-            # Đếm số lượng lựa chọn (Slot, Teacher) còn lại cho task này
-            current_options = []
-            c_mask = class_masks[c_idx]
-            
-            for t_id in task['eligible']:
-                t_mask = teacher_masks[t_id]
-                combined = c_mask | t_mask
-                
-                # Kiểm tra va chạm bằng Bitwise AND
-                for start, msk in valid_masks[d]:
-                    if not (combined & msk):
-                        current_options.append((start, t_id, msk))
-            
-            num_opts = len(current_options)
-            
-            # Nếu môn này không còn cách nào để xếp, loại bỏ khỏi danh sách (Chấp nhận thất bại task này)
-            if num_opts == 0:
-                unassigned_tasks.pop(i)
-                continue
-            
-            # Tính điểm ưu tiên bổ sung (Tie-breaker)
-            # Ưu tiên môn dài hơn hoặc môn có tổng số giáo viên ít hơn
-            regret_score = d * 100 - len(task['eligible'])
-            
-            # Chiến lược Regret: Chọn môn có ít lựa chọn nhất (Min-Remaining-Values)
-            if num_opts < min_options_count:
-                min_options_count = num_opts
-                max_regret_score = regret_score
-                best_task_idx = i
-                # Heuristic chọn slot: Chọn slot sớm nhất (First Fit) trong các options
-                best_option = current_options[0] 
-            elif num_opts == min_options_count:
-                if regret_score > max_regret_score:
-                    max_regret_score = regret_score
-                    best_task_idx = i
-                    best_option = current_options[0]
-            
-            i += 1
+    def recount(j, count):
+        if count != option_count[j]:
+            option_count[j] = count
+            if count > 0:
+                heapq.heappush(heap, (count, -regret_score[j], j))
+
+    while heap:
+        num_opts, _, i = heapq.heappop(heap)
+        if assigned[i] or num_opts != option_count[i]:
+            continue # Phần tử cũ (đã gán / đã đếm lại)
 
         # Thực hiện gán task tốt nhất tìm được
-        if best_task_idx != -1:
-            task = unassigned_tasks.pop(best_task_idx)
-            start, t_id, msk = best_option
-            
-            class_masks[task['c']] |= msk
-            teacher_masks[t_id] |= msk
-            
-            final_solution.append((task['c'], task['m'], start, t_id))
-        else:
-            break
+        start, t_id, msk = first_option(i)
+        c_idx = task_c[i]
+        class_masks[c_idx] |= msk
+        teacher_masks[t_id] |= msk
+        assigned[i] = 1
+        final_solution.append((c_idx + 1, task_m[i], start, t_id + 1))
+
+        # Task cùng lớp: mặt nạ lớp đổi -> đếm lại với mọi GV
+        for j in class_tasks[c_idx]:
+            if not assigned[j] and option_count[j] > 0:
+                per_teacher[j] = teacher_counts(j)
+                recount(j, sum(per_teacher[j]))
+        # Task lớp khác dạy được bởi GV vừa gán: chỉ phương án với GV này đổi,
+        # và chỉ khi lớp của task còn rảnh ở một phần các slot vừa bị chiếm
+        t_mask = teacher_masks[t_id]
+        for j, k in teacher_tasks[t_id]:
+            if assigned[j] or option_count[j] == 0 or task_c[j] == c_idx:
+                continue
+            c_mask = class_masks[task_c[j]]
+            if not (msk & ~c_mask):
+                continue
+            counts = per_teacher[j]
+            new_count = free_starts(~(c_mask | t_mask), task_d[j])[0]
+            if new_count != counts[k]:
+                option_count_j = option_count[j] - counts[k] + new_count
+                counts[k] = new_count
+                recount(j, option_count_j)
 
+    if timer is not None: timer.phase('output')
     # --- 4. XUẤT KẾT QUẢ ---
     # Chỉ in ra màn hình nếu đang ở chế độ Nộp bài (input_content is None)
     if input_content is None:
@@ -154,8 +105,10 @@ def solve(input_content=None, time_limit=0.95):
         for res in final_solution:
             print(f"{res[0]} {res[1]} {res[2]} {res[3]}")
 
+    if timer is not None: timer.stop()
     # QUAN TRỌNG: Trả về kết quả để Benchmark Runner ghi nhận
-    return len(final_solution)
+    # (details=True: trả cả danh sách dòng lời giải 1-based để validator kiểm tra lại)
+    return final_solution if details else len(final_solution)
 
 if __name__ == "__main__":
-    solve()
\ No newline at end of file
+    solve()
@@ -0,0 +1,84 @@
+import json
+import time
+import hashlib
+import sqlite3
+
+# --- KHO KẾT QUẢ BENCHMARK (SQLITE) ---
+# Mỗi lượt chạy xong được ghi ngay 1 dòng -> benchmark bị ngắt giữa chừng thì chạy lại
+# chỉ phải chạy các ô còn thiếu. Khóa của 1 ô gồm cả hash nội dung dataset và hash mã nguồn
+# solver: sửa solver / đổi dữ liệu thì các ô liên quan tự động được chạy lại.
+RESULTS_DB = "benchmark_results.db"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    dataset_hash   TEXT NOT NULL,
+    mode           TEXT NOT NULL,
+    time_limit     REAL NOT NULL,
+    module         TEXT NOT NULL,
+    solver_version TEXT NOT NULL,
+    run            INTEGER NOT NULL,
+    dataset        TEXT,
+    seed           INTEGER,
+    status         TEXT,
+    score          INTEGER,
+    elapsed        REAL,
+    check_json     TEXT,
+    trace_json     TEXT,
+    finished_at    REAL,
+    phases_json    TEXT,
+    memory_json    TEXT,
+    stats_json     TEXT,
+    PRIMARY KEY (dataset_hash, mode, time_limit, module, solver_version, run)
+)
+"""
+
+# Các cột thêm vào sau phiên bản đầu (đúng thứ tự trong _SCHEMA)
+_ADDED_COLUMNS = ('phases_json', 'memory_json', 'stats_json')
+
+def file_version(path):
+    """Phiên bản solver = 12 ký tự đầu SHA-256 của file mã nguồn"""
+    with open(path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()[:12]
+
+def run_seed(dataset_hash, run_idx):
+    """Seed của lượt chạy thứ run_idx trên 1 dataset (mọi solver dùng chung -> so sánh công bằng)"""
+    return int(hashlib.sha256(f"{dataset_hash}:{run_idx}".encode()).hexdigest()[:8], 16)
+
+def open_store(path=RESULTS_DB):
+    """Mở (tạo nếu chưa có) file SQLite chứa kết quả"""
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA journal_mode=WAL") # Ghi từng dòng nhanh, file không hỏng khi bị kill
+    conn.execute(_SCHEMA)
+    # File tạo từ bản cũ thiếu các cột thêm sau -> thêm vào (dòng cũ để NULL)
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(runs)")}
+    for name in _ADDED_COLUMNS:
+        if name not in columns:
+            conn.execute(f"ALTER TABLE runs ADD COLUMN {name} TEXT")
+    conn.commit()
+    return conn
+
+def load_completed(conn):
+    """Các ô đã chạy xong: {(dataset_hash, mode, time_limit, module, solver_version, run): kết quả}"""
+    completed = {}
+    rows = conn.execute("SELECT dataset_hash, mode, time_limit, module, solver_version, run, "
+                        "seed, status, score, elapsed, check_json, trace_json, phases_json, memory_json, stats_json FROM runs")
+    for (*key, seed, status, score, elapsed, check_json, trace_json, phases_json, memory_json,
+         stats_json) in rows:
+        completed[tuple(key)] = {
+            'seed': seed, 'status': status, 'score': score, 'elapsed': elapsed,
+            'check': json.loads(check_json) if check_json else None,
+            'trace': [tuple(p) for p in json.loads(trace_json)],
+            'phases': json.loads(phases_json) if phases_json else {},
+            'memory': json.loads(memory_json) if memory_json else {},
+            'stats': json.loads(stats_json) if stats_json else {}
+        }
+    return completed
+
+def save_result(conn, key, dataset, result):
+    """Ghi (hoặc ghi đè) kết quả 1 ô và commit ngay"""
+    conn.execute("INSERT OR REPLACE INTO runs VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                 (*key, dataset, result['seed'], result['status'], result['score'], result['elapsed'],
+                  json.dumps(result['check']) if result['check'] is not None else None,
+                  json.dumps(result['trace']), time.time(), json.dumps(result['phases']), json.dumps(result['memory']),
+                  json.dumps(result['stats'])))
+    conn.commit()
@@ -1,19 +1,25 @@
-import sys
 import math
 import random
 import time
-from utils import load_and_preprocess, MAX_SLOTS
+from utils import load_compiled_instance, IdPool
+from occupancy import Occupancy, SLOT_MASKS
 
 # --- CẤU HÌNH SA MẶC ĐỊNH ---
 DEFAULT_TIME_LIMIT = 0.95
 T_START = 5000.0
 ALPHA = 0.98
 
-def solve(input_content=None, time_limit=None):
+def solve(input_content=None, time_limit=None, progress=None, details=False, timer=None, stats=None, upper_bound=None):
     """
     Hàm giải thuật toán Simulated Annealing.
     - input_content: Nội dung file input (str)
     - time_limit: Giới hạn thời gian chạy (float). Nếu None sẽ dùng DEFAULT_TIME_LIMIT.
+    - progress: Callback progress(elapsed, best_score) gọi mỗi khi lời giải tốt nhất được cải thiện
+      (best_score = số môn xếp được).
+    - timer: PhaseTimer (tùy chọn) đo thời gian các pha parse / preprocess / construct / improve / output.
+    - stats: dict (tùy chọn), được ghi các bộ đếm thông lượng của vòng lặp chính khi chạy xong.
+    - upper_bound: Cận trên số môn xếp được (analyzer.compute_upper_bounds), chạm tới thì dừng sớm.
+    - details: True -> trả về danh sách dòng lời giải (lớp, môn, slot, GV) 1-based thay vì số môn.
     """
     start_time_prog = time.time()
     
@@ -22,35 +28,35 @@ def solve(input_content=None, time_limit=None):
     limit = time_limit if time_limit is not None else DEFAULT_TIME_LIMIT
 
     # 1. GỌI TIỀN XỬ LÝ
-    # Giả lập stdin nếu có input string (dùng cho benchmark runner)
-    if input_content:
-        from io import StringIO
-        sys.stdin = StringIO(input_content)
+    # Benchmark runner truyền thẳng nội dung input (không patch sys.stdin -> chạy song song được)
+    inst = load_compiled_instance(input_content, timer)
+    if inst is None: return 0
 
-    data = load_and_preprocess()
-    if data is None: return 0
-
-    # Bung dữ liệu ra các biến
-    T, N, tasks = data['T'], data['N'], data['tasks']
+    # Bung dữ liệu ra các biến (các cột task đánh chỉ số theo task id)
+    T, N = inst.T, inst.N
+    task_c, task_m, task_d = inst.c, inst.m, inst.d
     # valid_starts chính là valid_starts_cache trong code cũ
-    valid_starts_cache = data['valid_starts'] 
+    valid_starts_cache = inst.valid_starts
+    # Bảng phương án theo môn, nhóm theo GV cho bước INSERT (dựng 1 lần, dùng lại nếu instance lấy từ cache)
+    teacher_options = inst.teacher_option_table()
 
     # --- KHỞI TẠO CẤU TRÚC DỮ LIỆU ---
     assigned = {} # Map: task_id -> (start_slot, teacher_index)
     
-    # Grid để check va chạm nhanh: -1 là trống, >=0 là ID task đang chiếm
-    class_grid = [[-1] * (MAX_SLOTS + 1) for _ in range(N)]
-    teacher_grid = [[-1] * (MAX_SLOTS + 1) for _ in range(T)]
+    # Bitmask lớp/giáo viên để check va chạm bằng 1 phép AND, kèm owner để tìm nạn nhân
+    occ = Occupancy(N, T)
     
-    unassigned = [] # Danh sách id các task chưa xếp được
+    unassigned = IdPool() # Tập id các task chưa xếp được
+    assigned_ids = IdPool() # Tập id đã xếp (chọn ngẫu nhiên O(1) cho OPTIMIZE)
 
+    if timer is not None: timer.phase('construct')
     # --- RANDOM CONSTRUCT ---
     # Xếp lịch khởi tạo ngẫu nhiên nhưng sử dụng cache slot hợp lệ
-    for task in tasks:
-        tid, c, d = task['id'], task['c'], task['d']
+    for tid in inst.order:
+        c, d = task_c[tid], task_d[tid]
         
         # 1. Xáo trộn danh sách giáo viên
-        candidates = list(task['eligible'])
+        candidates = list(inst.eligible(tid))
         random.shuffle(candidates)
         
         is_set = False
@@ -63,25 +69,17 @@ def solve(input_content=None, time_limit=None):
             random.shuffle(possible_slots) # Random hóa vị trí
             
             for s in possible_slots:
-                e = s + d - 1
-                
                 # Check conflict
-                ok = True
-                for k in range(s, e + 1):
-                    if class_grid[c][k] != -1 or teacher_grid[t][k] != -1:
-                        ok = False; break
-                
-                if ok:
+                if occ.is_free(c, t, SLOT_MASKS[d][s]):
                     # Assign
                     assigned[tid] = (s, t)
-                    for k in range(s, e + 1):
-                        class_grid[c][k] = tid
-                        teacher_grid[t][k] = tid
+                    assigned_ids.add(tid)
+                    occ.place(tid, c, t, s, d)
                     is_set = True
                     break 
         
         if not is_set:
-            unassigned.append(tid)
+            unassigned.add(tid)
 
     # --- HÀM MỤC TIÊU ---
     def get_score(n_unassigned, sum_start):
@@ -92,13 +90,19 @@ def solve(input_content=None, time_limit=None):
     current_score = get_score(len(unassigned), sum(v[0] for v in assigned.values()))
     best_assigned = assigned.copy()
     best_score = current_score
+    # Báo lời giải khởi tạo (progress nhận: thời gian đã chạy, số môn xếp được của lời giải tốt nhất)
+    if progress is not None: progress(time.time() - start_time_prog, len(best_assigned))
 
+    if timer is not None: timer.phase('improve')
     # --- SIMULATED ANNEALING LOOP ---
     T_curr = T_START
+    # Bộ đếm thông lượng (biến cục bộ, chỉ ghi ra stats 1 lần ở cuối)
+    n_iter = n_eval = n_moves = n_accepted = n_improving = 0
     
     # Sử dụng biến limit đã xác định ở trên
-    while time.time() - start_time_prog < limit:
+    while time.time() - start_time_prog < limit and (upper_bound is None or len(best_assigned) < upper_bound):
         
+        n_iter += 1
         # Chọn chế độ: Nếu còn task chưa xếp thì ưu tiên chèn (INSERT), nếu hết thì tối ưu (OPTIMIZE)
         mode = "INSERT" if unassigned else "OPTIMIZE"
         
@@ -112,33 +116,26 @@ def solve(input_content=None, time_limit=None):
         # --- TẠO NƯỚC ĐI (NEIGHBORHOOD MOVE) ---
         if mode == "INSERT":
             # Cố gắng chèn task chưa xếp vào
-            u_tid = random.choice(unassigned)
-            u_task = next(t for t in tasks if t['id'] == u_tid)
-            uc, ud = u_task['c'], u_task['d']
+            u_tid = unassigned.choice()
+            uc, ud = task_c[u_tid], task_d[u_tid]
             
             candidates_moves = []
-            u_teachers = u_task['eligible']
+            u_teachers = inst.eligible(u_tid)
             if len(u_teachers) > 5: u_teachers = random.sample(u_teachers, 5)
+            subject_options = teacher_options[task_m[u_tid]]
             
+            # Chỉ duyệt phương án (teacher, start, mask) dựng sẵn của các GV được lấy mẫu
             for t in u_teachers:
-                # Dùng cache slot hợp lệ
-                for s in valid_starts_cache.get(ud, []):
-                    e = s + ud - 1
-                    blockers = set()
-                    possible = True
-                    for k in range(s, e + 1):
-                        if class_grid[uc][k] != -1: blockers.add(class_grid[uc][k])
-                        if teacher_grid[t][k] != -1: blockers.add(teacher_grid[t][k])
-                        if len(blockers) > 1: 
-                            possible = False; break
+                for _, s, mask in subject_options.get(t, ()):
+                    if occ.is_free(uc, t, mask):
+                        candidates_moves.append(('FREE', s, t, -1))
+                        break # Ưu tiên slot trống tìm thấy ngay
                     
-                    if possible:
-                        if len(blockers) == 0:
-                            candidates_moves.append(('FREE', s, t, -1))
-                            break # Ưu tiên slot trống tìm thấy ngay
-                        elif len(blockers) == 1:
-                            candidates_moves.append(('SWAP', s, t, list(blockers)[0]))
+                    victim = occ.single_blocker(uc, t, mask)
+                    if victim is not None:
+                        candidates_moves.append(('SWAP', s, t, victim))
             
+            n_eval += len(candidates_moves)
             if not candidates_moves: continue
             
             move = random.choice(candidates_moves)
@@ -152,30 +149,25 @@ def solve(input_content=None, time_limit=None):
                 
         elif mode == "OPTIMIZE":
             # Di chuyển task đã xếp
-            u_tid = random.choice(list(assigned.keys()))
-            u_task = next(t for t in tasks if t['id'] == u_tid)
+            u_tid = assigned_ids.choice()
+            uc, ud = task_c[u_tid], task_d[u_tid]
             old_s, old_t = assigned[u_tid]
             
             candidates_moves = []
-            u_teachers = u_task['eligible']
+            u_teachers = inst.eligible(u_tid)
             if len(u_teachers) > 3: u_teachers = random.sample(u_teachers, 3)
             
             for t in u_teachers:
-                slots = valid_starts_cache.get(u_task['d'], [])
+                slots = valid_starts_cache.get(ud, [])
                 try_slots = random.sample(slots, min(len(slots), 10)) 
                 
                 for s in try_slots:
                     if s == old_s and t == old_t: continue
                     
-                    e = s + u_task['d'] - 1
-                    conflict = False
-                    for k in range(s, e + 1):
-                        if (class_grid[u_task['c']][k] != -1 and class_grid[u_task['c']][k] != u_tid) or \
-                           (teacher_grid[t][k] != -1 and teacher_grid[t][k] != u_tid):
-                            conflict = True; break
-                    if not conflict:
+                    if occ.is_free_except(u_tid, uc, t, SLOT_MASKS[ud][s]):
                         candidates_moves.append((s, t))
             
+            n_eval += len(candidates_moves)
             if not candidates_moves: continue
             
             new_s, new_t = random.choice(candidates_moves)
@@ -183,6 +175,7 @@ def solve(input_content=None, time_limit=None):
             move_type = 'MOVE'
 
         # --- QUYẾT ĐỊNH CHẤP NHẬN (METROPOLIS CRITERION) ---
+        n_moves += 1
         accept = False
         if delta_score <= 0:
             accept = True
@@ -192,62 +185,62 @@ def solve(input_content=None, time_limit=None):
         
         # --- CẬP NHẬT TRẠNG THÁI ---
         if accept:
+            n_accepted += 1
+            if delta_score < 0: n_improving += 1
             if mode == "INSERT":
                 if move_type == 'FREE':
                     assigned[u_tid] = (new_s, new_t)
-                    for k in range(new_s, new_s + u_task['d']):
-                        class_grid[u_task['c']][k] = u_tid
-                        teacher_grid[new_t][k] = u_tid
-                    unassigned.remove(u_tid)
+                    assigned_ids.add(u_tid)
+                    occ.place(u_tid, uc, new_t, new_s, ud)
+                    unassigned.discard(u_tid)
                     current_score += delta_score
                     
                 elif move_type == 'SWAP':
                     # Gỡ nạn nhân
-                    v_task = next(t for t in tasks if t['id'] == victim_tid)
                     v_s, v_t = assigned[victim_tid]
-                    for k in range(v_s, v_s + v_task['d']):
-                        class_grid[v_task['c']][k] = -1
-                        teacher_grid[v_t][k] = -1
+                    occ.remove(task_c[victim_tid], v_t, v_s, task_d[victim_tid])
                     del assigned[victim_tid]
-                    unassigned.append(victim_tid)
+                    assigned_ids.discard(victim_tid)
+                    unassigned.add(victim_tid)
                     
                     # Chèn người mới
                     assigned[u_tid] = (new_s, new_t)
-                    for k in range(new_s, new_s + u_task['d']):
-                        class_grid[u_task['c']][k] = u_tid
-                        teacher_grid[new_t][k] = u_tid
-                    unassigned.remove(u_tid)
+                    assigned_ids.add(u_tid)
+                    occ.place(u_tid, uc, new_t, new_s, ud)
+                    unassigned.discard(u_tid)
                     current_score += delta_score
             
             elif mode == "OPTIMIZE":
-                u_task = next(t for t in tasks if t['id'] == u_tid)
                 # Xóa cũ
-                for k in range(old_s, old_s + u_task['d']):
-                    class_grid[u_task['c']][k] = -1
-                    teacher_grid[old_t][k] = -1
+                occ.remove(uc, old_t, old_s, ud)
                 # Thêm mới
                 assigned[u_tid] = (new_s, new_t)
-                for k in range(new_s, new_s + u_task['d']):
-                    class_grid[u_task['c']][k] = u_tid
-                    teacher_grid[new_t][k] = u_tid
+                occ.place(u_tid, uc, new_t, new_s, ud)
                 current_score += delta_score
 
             # Lưu kỷ lục
             if current_score < best_score:
                 best_score = current_score
                 best_assigned = assigned.copy()
+                if progress is not None: progress(time.time() - start_time_prog, len(best_assigned))
 
         # Giảm nhiệt độ
         T_curr *= ALPHA
         # Tái gia nhiệt (Reheating): Nếu nguội quá mà còn thời gian thì reset nhiệt độ
         if T_curr < 1.0: T_curr = T_START 
 
+    if stats is not None:
+        # iterations: số vòng lặp, evaluations: số nước đi ứng viên đã sinh, moves: số nước đi đem xét,
+        # accepted / improving / rejected: nước đi được nhận / làm giảm chi phí / bị Metropolis loại
+        stats.update(iterations=n_iter, evaluations=n_eval, moves=n_moves, accepted=n_accepted,
+                     improving=n_improving, rejected=n_moves - n_accepted)
+
+    if timer is not None: timer.phase('output')
     # --- OUTPUT ---
     final_output = []
     for tid, (s, t) in best_assigned.items():
-        task = next(tk for tk in tasks if tk['id'] == tid)
         # Cộng 1 cho đúng format đề bài (Index từ 1)
-        final_output.append((task['c'] + 1, task['m'], s, t + 1))
+        final_output.append((task_c[tid] + 1, task_m[tid], s, t + 1))
     
     if input_content is None:
         print(len(final_output))
@@ -255,7 +248,8 @@ def solve(input_content=None, time_limit=None):
         for item in final_output:
             print(f"{item[0]} {item[1]} {item[2]} {item[3]}")
     
-    return len(final_output)
+    if timer is not None: timer.stop()
+    return final_output if details else len(final_output)
 
 if __name__ == "__main__":
     solve()
\ No newline at end of file
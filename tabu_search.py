@@ -1,7 +1,8 @@
-import sys
 import random
 import time
 from collections import defaultdict
+from occupancy import Occupancy, SLOT_MASKS
+from utils import index_tasks_by_id, IdPool, build_subject_index, build_option_table, group_options_by_teacher, read_raw_instance
 
 # ============================================
 # CONFIGURATION
@@ -57,39 +58,25 @@ class MultiLevelMemory:
 # ============================================
 # INPUT PROCESSING
 # ============================================
-def load_and_preprocess():
+def load_and_preprocess(source=None, timer=None):
     try:
-        line = input().strip().split()
-        T, N, M = int(line[0]), int(line[1]), int(line[2])
-        
-        # Đọc danh sách môn của từng lớp
-        class_subjects = []
-        for i in range(N):
-            subjects = list(map(int, input().split()))
-            subjects = [s for s in subjects if s != 0]
-            class_subjects.append(subjects)
-        
-        # Đọc danh sách môn giáo viên có thể dạy
-        teacher_subjects = []
-        for t in range(T):
-            subjects = list(map(int, input().split()))
-            subjects = [s for s in subjects if s != 0]
-            teacher_subjects.append(subjects)
-        
-        # Đọc số tiết của từng môn
-        durations_line = list(map(int, input().split()))
+        # Bộ đọc chung của utils: source là text / bytes / đường dẫn, None = stdin
+        if timer is not None: timer.phase('parse')
+        raw = read_raw_instance(source)
+        if raw is None: return None
+        if timer is not None: timer.phase('preprocess')
+        T, N, M, class_subjects, teacher_subjects, durations_line = raw
         durations = [0] + durations_line  # Index 1-based
         
         # Tạo tasks (lớp-môn)
+        # Chỉ mục ngược Môn -> Giáo viên (xây 1 lần, task cùng môn dùng chung list)
+        subject_to_teachers = build_subject_index(M, teacher_subjects)
         tasks = []
         task_id = 0
         for c in range(N):
             for m in class_subjects[c]:
-                # Tìm giáo viên có thể dạy môn m
-                eligible = []
-                for t in range(T):
-                    if m in teacher_subjects[t]:
-                        eligible.append(t)
+                # Giáo viên có thể dạy môn m
+                eligible = subject_to_teachers[m]
                 
                 if eligible:  # Chỉ tạo task nếu có giáo viên
                     tasks.append({
@@ -101,16 +88,22 @@ def load_and_preprocess():
                     })
                     task_id += 1
         
-        # Tính valid starts cho mỗi duration
+        # Tính valid starts cho mỗi duration (slot 1-based, khớp với occupancy)
         valid_starts = {}
         for d in range(1, 7):  # Duration từ 1-6
             valid_starts[d] = []
             # Trong mỗi buổi (6 tiết)
-            for session_start in range(0, MAX_SLOTS, 6):
+            for session_start in range(1, MAX_SLOTS + 1, 6):
                 for start in range(session_start, session_start + 6):
                     if start + d - 1 < session_start + 6:
                         valid_starts[d].append(start)
         
+        # Bảng phương án (teacher, start, mask) theo môn, nhóm theo GV: {t: [(t, start, mask)]}.
+        # Bộ sinh láng giềng lấy mẫu slot trong từng GV nên không phụ thuộc thứ tự phương án.
+        teacher_options = group_options_by_teacher(build_option_table(subject_to_teachers, durations, valid_starts))
+        for task in tasks:
+            task['options'] = teacher_options[task['m']] # Task cùng môn dùng chung dict
+        
         return {
             'T': T, 'N': N, 'M': M,
             'tasks': tasks,
@@ -157,7 +150,7 @@ def calculate_move_penalty(move, memory):
     
     freq_penalty = memory.move_frequency[key] * 80
     
-    slot_bucket = ns // 30
+    slot_bucket = (ns - 1) // 30
     region_key = (slot_bucket, nt)
     region_penalty = memory.region_frequency[region_key] * 30
     
@@ -170,7 +163,7 @@ def calculate_move_penalty(move, memory):
 # ============================================
 # DIVERSIFICATION
 # ============================================
-def perturb_solution(assigned, tasks, class_grid, teacher_grid, valid_starts, N, T, strength=0.2):
+def perturb_solution(assigned, task_by_id, occ, valid_starts, strength=0.2):
     task_ids = list(assigned.keys())
     if not task_ids:
         return assigned
@@ -180,19 +173,17 @@ def perturb_solution(assigned, tasks, class_grid, teacher_grid, valid_starts, N,
     
     # Remove
     for tid in to_perturb:
-        task = next(t for t in tasks if t['id'] == tid)
+        task = task_by_id[tid]
         old_s, old_t = assigned[tid]
-        for k in range(old_s, old_s + task['d']):
-            class_grid[task['c']][k] = -1
-            teacher_grid[old_t][k] = -1
+        occ.remove(task['c'], old_t, old_s, task['d'])
         del assigned[tid]
     
     # Re-insert
     for tid in to_perturb:
-        task = next(t for t in tasks if t['id'] == tid)
+        task = task_by_id[tid]
         placed = False
         
-        teachers = task['eligible'][:5] if len(task['eligible']) > 5 else task['eligible']
+        teachers = task['eligible'][:5]
         random.shuffle(teachers)
         
         for t in teachers:
@@ -200,17 +191,9 @@ def perturb_solution(assigned, tasks, class_grid, teacher_grid, valid_starts, N,
             slots = valid_starts.get(task['d'], [])
             random.shuffle(slots)
             for s in slots[:10]:
-                e = s + task['d'] - 1
-                conflict = False
-                for k in range(s, e + 1):
-                    if class_grid[task['c']][k] != -1 or teacher_grid[t][k] != -1:
-                        conflict = True
-                        break
-                if not conflict:
+                if occ.is_free(task['c'], t, SLOT_MASKS[task['d']][s]):
                     assigned[tid] = (s, t)
-                    for k in range(s, e + 1):
-                        class_grid[task['c']][k] = tid
-                        teacher_grid[t][k] = tid
+                    occ.place(tid, task['c'], t, s, task['d'])
                     placed = True
                     break
     
@@ -219,27 +202,26 @@ def perturb_solution(assigned, tasks, class_grid, teacher_grid, valid_starts, N,
 # ============================================
 # MAIN SOLVER
 # ============================================
-def solve(input_content=None):
+def solve(input_content=None, progress=None, details=False, timer=None, stats=None, upper_bound=None):
     start_time_prog = time.time()
-    if input_content:
-        from io import StringIO
-        sys.stdin = StringIO(input_content)
-
-    data = load_and_preprocess()
+    # Truyền thẳng input cho bộ đọc (không patch sys.stdin -> chạy song song được)
+    data = load_and_preprocess(input_content, timer)
     if data is None:
         return
 
     T, N = data['T'], data['N']
     tasks = data['tasks']
+    # Tra task theo ID O(1) (tasks sẽ bị sort lại nên tasks[tid] không phải task tid)
+    task_by_id = index_tasks_by_id(tasks)
     valid_starts = data['valid_starts']
     
     memory = MultiLevelMemory()
 
+    if timer is not None: timer.phase('construct')
     # === GREEDY INITIALIZATION ===
     assigned = {}
-    class_grid = [[-1] * (MAX_SLOTS + 1) for _ in range(N)]
-    teacher_grid = [[-1] * (MAX_SLOTS + 1) for _ in range(T)]
-    unassigned = []
+    occ = Occupancy(N, T)
+    unassigned = IdPool()
     
     tasks.sort(key=lambda x: (len(x['eligible']), -x['d']))
     
@@ -249,31 +231,33 @@ def solve(input_content=None):
         for t in task['eligible']:
             if placed: break
             for s in valid_starts.get(d, []):
-                e = s + d - 1
-                conflict = False
-                for k in range(s, e + 1):
-                    if class_grid[c][k] != -1 or teacher_grid[t][k] != -1:
-                        conflict = True
-                        break
-                if not conflict:
+                if occ.is_free(c, t, SLOT_MASKS[d][s]):
                     assigned[tid] = (s, t)
-                    for k in range(s, e + 1):
-                        class_grid[c][k] = tid
-                        teacher_grid[t][k] = tid
+                    occ.place(tid, c, t, s, d)
                     placed = True
                     break
         if not placed:
-            unassigned.append(tid)
+            unassigned.add(tid)
 
     #current_score = len(unassigned) * 1_000_000 + sum(v[0] for v in assigned.values())
-    current_total_duration = sum(tasks[t_id]['d'] for t_id in assigned)
+    current_total_duration = sum(task_by_id[t_id]['d'] for t_id in assigned)
     current_score = -current_total_duration
     best_score = current_score
     best_assigned = assigned.copy()
     memory.add_elite(best_score, assigned)
+    # Lời giải xuất ra = lời giải nhiều môn nhất trong các lần best_score cải thiện (best_score tính
+    # theo tổng thời lượng nên có thể tốt lên trong khi số môn giảm). progress chỉ báo khi số môn tăng
+    # -> vết hội tụ đơn điệu và luôn khớp với lời giải solver trả về.
+    output_assigned = best_assigned
+    # Báo lời giải khởi tạo (progress nhận: thời gian đã chạy, số môn xếp được của lời giải xuất ra)
+    if progress is not None: progress(time.time() - start_time_prog, len(output_assigned))
+    assigned_ids = IdPool(assigned)
 
+    if timer is not None: timer.phase('improve')
     # === TABU SEARCH ===
-    while time.time() - start_time_prog < TIME_LIMIT:
+    # Bộ đếm thông lượng (số vòng lặp chính là memory.iteration)
+    n_eval = n_tabu = n_accepted = n_improving = n_restarts = 0
+    while time.time() - start_time_prog < TIME_LIMIT and (upper_bound is None or len(output_assigned) < upper_bound):
         memory.iteration += 1
         
         # RESTART
@@ -282,27 +266,27 @@ def solve(input_content=None):
             if elite:
                 assigned = elite.copy()
                 # Rebuild grids
-                class_grid = [[-1] * (MAX_SLOTS + 1) for _ in range(N)]
-                teacher_grid = [[-1] * (MAX_SLOTS + 1) for _ in range(T)]
+                occ = Occupancy(N, T)
                 for tid, (s, t) in assigned.items():
-                    task = next(tk for tk in tasks if tk['id'] == tid)
-                    for k in range(s, s + task['d']):
-                        class_grid[task['c']][k] = tid
-                        teacher_grid[t][k] = tid
-                unassigned = [t['id'] for t in tasks if t['id'] not in assigned]
+                    task = task_by_id[tid]
+                    occ.place(tid, task['c'], t, s, task['d'])
+                assigned_ids = IdPool(assigned)
+                unassigned = IdPool(t['id'] for t in tasks if t['id'] not in assigned)
                 #current_score = len(unassigned) * 1_000_000 + sum(v[0] for v in assigned.values())
-                current_score = -sum(tasks[tid]['d'] for tid in assigned)
+                current_score = -sum(task_by_id[tid]['d'] for tid in assigned)
             memory.stagnation_count = 0
             memory.tabu_list.clear()
+            n_restarts += 1
             continue
         
         # DIVERSIFY
         if memory.is_stagnating() and memory.iteration % 20 == 0:
-            assigned = perturb_solution(assigned.copy(), tasks, class_grid, teacher_grid,
-                                       valid_starts, N, T, strength=0.15)
-            unassigned = [t['id'] for t in tasks if t['id'] not in assigned]
+            assigned = perturb_solution(assigned.copy(), task_by_id, occ,
+                                       valid_starts, strength=0.15)
+            assigned_ids = IdPool(assigned)
+            unassigned = IdPool(t['id'] for t in tasks if t['id'] not in assigned)
             #current_score = len(unassigned) * 1_000_000 + sum(v[0] for v in assigned.values())
-            current_score = -sum(tasks[tid]['d'] for tid in assigned)
+            current_score = -sum(task_by_id[tid]['d'] for tid in assigned)
 
         tenure = adaptive_tenure(memory)
         mode = "INSERT" if unassigned else "OPTIMIZE"
@@ -311,72 +295,54 @@ def solve(input_content=None):
         # === GENERATE NEIGHBORS ===
         if mode == "INSERT":
             if unassigned:
-                u_tid = random.choice(unassigned)
-                u_task = next(t for t in tasks if t['id'] == u_tid)
+                u_tid = unassigned.choice()
+                u_task = task_by_id[u_tid]
                 
-                u_teachers = u_task['eligible'][:5] if len(u_task['eligible']) > 5 else u_task['eligible']
+                # Tối đa 5 GV đầu tiên trong eligible, mỗi GV lấy mẫu 5 slot
+                try_options = []
+                for t in u_task['eligible'][:5]:
+                    options = u_task['options'].get(t, [])
+                    try_options.extend(random.sample(options, min(5, len(options))))
                 
-                for t in u_teachers:
-                    slots = valid_starts.get(u_task['d'], [])
-                    try_slots = random.sample(slots, min(5, len(slots)))
-                    
-                    for s in try_slots:
-                        e = s + u_task['d'] - 1
-                        victims = set()
-                        
-                        possible = True
-                        for k in range(s, e + 1):
-                            c_occ = class_grid[u_task['c']][k]
-                            t_occ = teacher_grid[t][k]
-                            if c_occ != -1: victims.add(c_occ)
-                            if t_occ != -1: victims.add(t_occ)
-                            if len(victims) > 1:
-                                possible = False
-                                break
-                        
-                        if not possible: continue
-                        
-                        if len(victims) == 0:
-                            candidate_moves.append({
-                                'type': 'INSERT_FREE',
-                                'tid': u_tid, 'ns': s, 'nt': t,
-                                #'delta': -1_000_000 + s
-                                'delta': -u_task['d']
-                            })
+                for t, s, mask in try_options:
+                    # Chỉ nhận slot trống hoàn toàn (INSERT FREE)
+                    if occ.is_free(u_task['c'], t, mask):
+                        candidate_moves.append({
+                            'type': 'INSERT_FREE',
+                            'tid': u_tid, 'ns': s, 'nt': t,
+                            #'delta': -1_000_000 + s
+                            'delta': -u_task['d']
+                        })
         
         else:  # OPTIMIZE
             if assigned:
-                tid = random.choice(list(assigned.keys()))
-                curr_task = next(t for t in tasks if t['id'] == tid)
+                tid = assigned_ids.choice()
+                curr_task = task_by_id[tid]
                 old_s, old_t = assigned[tid]
                 
-                teachers = curr_task['eligible'][:3] if len(curr_task['eligible']) > 3 else curr_task['eligible']
-                for t in teachers:
-                    slots = valid_starts.get(curr_task['d'], [])
-                    try_slots = random.sample(slots, min(5, len(slots)))
-                    for s in try_slots:
-                        if s == old_s and t == old_t: continue
-                        e = s + curr_task['d'] - 1
-                        conflict = False
-                        for k in range(s, e + 1):
-                            if (class_grid[curr_task['c']][k] != -1 and class_grid[curr_task['c']][k] != tid) or \
-                               (teacher_grid[t][k] != -1 and teacher_grid[t][k] != tid):
-                                conflict = True
-                                break
-                        if not conflict:
-                            candidate_moves.append({
-                                'type': 'MOVE',
-                                'tid': tid, 'ns': s, 'nt': t,
-                                #'delta': s - old_s
-                                'delta': 0
-                            })
+                # Tương tự INSERT: tối đa 3 GV đầu tiên, mỗi GV 5 slot
+                try_options = []
+                for t in curr_task['eligible'][:3]:
+                    options = curr_task['options'].get(t, [])
+                    try_options.extend(random.sample(options, min(5, len(options))))
+                for t, s, mask in try_options:
+                    if s == old_s and t == old_t: continue
+                    if occ.is_free_except(tid, curr_task['c'], t, mask):
+                        candidate_moves.append({
+                            'type': 'MOVE',
+                            'tid': tid, 'ns': s, 'nt': t,
+                            #'delta': s - old_s
+                            'delta': 0
+                        })
 
+        n_eval += len(candidate_moves)
         # === SELECT BEST MOVE ===
         best_move = None
         best_adjusted_delta = float('inf')
         
         for move in candidate_moves:
             if is_move_tabu(move, current_score, best_score, memory):
+                n_tabu += 1
                 continue
             
             penalty = calculate_move_penalty(move, memory)
@@ -389,31 +355,30 @@ def solve(input_content=None):
         # === APPLY MOVE ===
         if best_move:
             m = best_move
+            n_accepted += 1
+            if m['delta'] < 0: n_improving += 1
             
             if m['type'] == 'INSERT_FREE':
                 tid, ns, nt = m['tid'], m['ns'], m['nt']
                 assigned[tid] = (ns, nt)
-                unassigned.remove(tid)
-                task = next(t for t in tasks if t['id'] == tid)
-                for k in range(ns, ns + task['d']):
-                    class_grid[task['c']][k] = tid
-                    teacher_grid[nt][k] = tid
+                assigned_ids.add(tid)
+                unassigned.discard(tid)
+                task = task_by_id[tid]
+                occ.place(tid, task['c'], nt, ns, task['d'])
                 
                 memory.tabu_list[make_tabu_key(tid, ns, nt)] = memory.iteration + tenure
                 
             elif m['type'] == 'MOVE':
                 tid, ns, nt = m['tid'], m['ns'], m['nt']
-                task = next(t for t in tasks if t['id'] == tid)
+                task = task_by_id[tid]
                 old_s, old_t = assigned[tid]
                 
-                for k in range(old_s, old_s + task['d']):
-                    class_grid[task['c']][k] = -1
-                    teacher_grid[old_t][k] = -1
+                # Clear old pos
+                occ.remove(task['c'], old_t, old_s, task['d'])
                 
+                # Set new pos
                 assigned[tid] = (ns, nt)
-                for k in range(ns, ns + task['d']):
-                    class_grid[task['c']][k] = tid
-                    teacher_grid[nt][k] = tid
+                occ.place(tid, task['c'], nt, ns, task['d'])
                 
                 old_key = make_tabu_key(tid, old_s, old_t)
                 memory.tabu_list[old_key] = memory.iteration + tenure
@@ -421,7 +386,7 @@ def solve(input_content=None):
             # Update frequency
             new_key = make_tabu_key(m['tid'], m['ns'], m['nt'])
             memory.move_frequency[new_key] += 1
-            slot_bucket = m['ns'] // 30
+            slot_bucket = (m['ns'] - 1) // 30
             region_key = (slot_bucket, m['nt'])
             memory.region_frequency[region_key] += 1
             
@@ -431,6 +396,9 @@ def solve(input_content=None):
                 best_score = current_score
                 best_assigned = assigned.copy()
                 memory.add_elite(best_score, assigned)
+                if len(best_assigned) > len(output_assigned):
+                    output_assigned = best_assigned
+                    if progress is not None: progress(time.time() - start_time_prog, len(output_assigned))
                 memory.stagnation_count = 0
                 memory.consecutive_improvements += 1
             else:
@@ -442,11 +410,18 @@ def solve(input_content=None):
             cutoff = memory.iteration - 30
             memory.tabu_list = {k: v for k, v in memory.tabu_list.items() if v > cutoff}
 
+    if stats is not None:
+        # evaluations: nước đi ứng viên đã sinh, tabu_rejected: ứng viên bị loại vì tabu,
+        # accepted / improving: nước đi được áp dụng / làm giảm chi phí
+        stats.update(iterations=memory.iteration, evaluations=n_eval, tabu_rejected=n_tabu,
+                     accepted=n_accepted, improving=n_improving, restarts=n_restarts)
+
+    if timer is not None: timer.phase('output')
     # === OUTPUT ===
     final_output = []
-    for tid, (s, t) in best_assigned.items():
-        task = next(tk for tk in tasks if tk['id'] == tid)
-        final_output.append((task['c'] + 1, task['m'], s + 1, t + 1))
+    for tid, (s, t) in output_assigned.items():
+        task = task_by_id[tid]
+        final_output.append((task['c'] + 1, task['m'], s, t + 1))
     
     if input_content is None:
         print(len(final_output))
@@ -454,7 +429,8 @@ def solve(input_content=None):
         for item in final_output:
             print(f"{item[0]} {item[1]} {item[2]} {item[3]}")
     
-    return best_score
+    if timer is not None: timer.stop()
+    return final_output if details else best_score
 
 
 if __name__ == "__main__":
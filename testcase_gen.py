@@ -1,7 +1,19 @@
 import random
 import os
+import argparse
+from utils import require_numpy
 
-def generate_testcase(filename, T, N, M, density, scarcity, mode='normal'):
+# --- CẤU HÌNH BỘ SINH VECTOR HÓA (NUMPY) ---
+# Phân phối thời lượng 1..4 tiết (giống bộ sinh gốc bên dưới)
+DURATION_PROBS = {
+    'normal': (0.1, 0.3, 0.4, 0.2),
+    'stress': (0.05, 0.2, 0.3, 0.45),
+}
+MAX_TEACHERS_PER_SUBJECT = 5 # Trần số GV của 1 môn phổ thông
+CHUNK_ELEMENTS = 1 << 22     # Số phần tử ma trận khóa ngẫu nhiên mỗi khối (~32MB float64)
+WRITE_BUFFER = 1 << 20       # Bộ đệm ghi file (1MB)
+
+def generate_testcase(filename, T, N, M, density, scarcity, mode='normal', output_folder="test_case"):
     """
     Sinh test case với thuật toán gán giáo viên mới để đảm bảo Scarcity > 0.
     
@@ -9,6 +21,7 @@ def generate_testcase(filename, T, N, M, density, scarcity, mode='normal'):
         scarcity (0.0 - 1.0): Tỷ lệ phần trăm số môn CHỈ CÓ 1 GV dạy.
             - 0.3 -> Analyzer sẽ báo Scarcity ~30%
             - 0.9 -> Analyzer sẽ báo Scarcity ~90%
+        output_folder: Thư mục ghi file (mặc định test_case).
     """
     
     MAX_SLOTS = 60
@@ -85,7 +98,6 @@ def generate_testcase(filename, T, N, M, density, scarcity, mode='normal'):
             teacher_abilities[t].add(m)
 
     # --- 4. GHI FILE ---
-    output_folder = "test_case"
     os.makedirs(output_folder, exist_ok=True)
     full_path = os.path.join(output_folder, filename)
     
@@ -99,8 +111,211 @@ def generate_testcase(filename, T, N, M, density, scarcity, mode='normal'):
         
     print(f"Gen: {filename:<25} | Density={density} | Scarcity (Target)={scarcity}")
 
+def _sample_by_keys(rng, rows, pool, k):
+    """Mỗi hàng: khóa ngẫu nhiên cho cả pool phần tử, lấy k khóa nhỏ nhất (chia khối theo CHUNK_ELEMENTS)"""
+    np = require_numpy()
+    out = np.empty((rows, k), dtype=np.int64)
+    step = max(1, CHUNK_ELEMENTS // max(pool, 1))
+    for lo in range(0, rows, step):
+        keys = rng.random((min(step, rows - lo), pool))
+        picked = np.argpartition(keys, k - 1, axis=1)[:, :k] if k < pool else np.tile(np.arange(pool), (len(keys), 1))
+        order = np.argsort(np.take_along_axis(keys, picked, axis=1), axis=1)
+        out[lo:lo + len(keys)] = np.take_along_axis(picked, order, axis=1)
+    return out
 
-if __name__ == "__main__":
+def _sample_distinct(rng, rows, pool, k):
+    """
+    Với mỗi hàng chọn k phần tử khác nhau trong range(pool), theo thứ tự ngẫu nhiên -> mảng (rows, k).
+    pool lớn so với k: rút 2k số có lặp rồi bỏ các lần trùng (giữ lần đầu) -> chỉ tốn O(rows * k);
+    hàng hiếm hoi không đủ k số khác nhau (hoặc pool nhỏ) thì dùng khóa ngẫu nhiên trên cả pool.
+    """
+    np = require_numpy()
+    if pool < 4 * k:
+        return _sample_by_keys(rng, rows, pool, k)
+    cand = rng.integers(0, pool, size=(rows, 2 * k))
+    by_value = np.argsort(cand, axis=1, kind='stable') # Trong nhóm bằng nhau, lần rút đầu tiên đứng trước
+    sorted_vals = np.take_along_axis(cand, by_value, axis=1)
+    dup_sorted = np.zeros(cand.shape, dtype=bool)
+    dup_sorted[:, 1:] = sorted_vals[:, 1:] == sorted_vals[:, :-1]
+    dup = np.empty_like(dup_sorted)
+    np.put_along_axis(dup, by_value, dup_sorted, axis=1)
+    # Đưa các lần rút không trùng lên đầu, giữ nguyên thứ tự rút
+    out = np.take_along_axis(cand, np.argsort(dup, axis=1, kind='stable'), axis=1)[:, :k]
+    short = np.flatnonzero(np.count_nonzero(~dup, axis=1) < k)
+    if len(short):
+        out[short] = _sample_by_keys(rng, len(short), pool, k)
+    return out
+
+def generate_testcase_np(filename, T, N, M, density, scarcity, mode='normal', output_folder="test_case",
+                         seed=None):
+    """
+    Bộ sinh vector hóa (NumPy) cho dữ liệu lớn, cùng ý nghĩa tham số với generate_testcase
+    nhưng sinh cả mảng 1 lần thay vì từng random.randint:
+    - Thời lượng: 1 lần rng.choice theo DURATION_PROBS[mode]
+    - Môn của lớp: mỗi lớp 1 hoán vị ngẫu nhiên các môn, lấy tiền tố dài nhất chưa đạt
+      target_load (mỗi môn thêm vào vẫn không vượt MAX_SLOTS)
+    - GV của môn: môn hiếm (xác suất scarcity) 1 GV, còn lại 2..min(5, 0.4 T) GV khác nhau
+    Ghi file theo từng khối lớn (không giữ toàn bộ nội dung trong bộ nhớ).
+    seed: cùng seed -> cùng file (rng = numpy.random.default_rng(seed)).
+    """
+    np = require_numpy()
+
+    MAX_SLOTS = 60
+    rng = np.random.default_rng(seed)
+    target_load = int(MAX_SLOTS * density)
+
+    # --- 1. THỜI LƯỢNG ---
+    durations = rng.choice(np.arange(1, 5), size=M, p=DURATION_PROBS.get(mode, DURATION_PROBS['normal']))
+
+    # --- 2. KỸ NĂNG GIÁO VIÊN ---
+    # Số GV mỗi môn: 1 nếu môn hiếm, ngược lại ngẫu nhiên trong [2, max_t] (giới hạn bởi T)
+    max_t = min(max(2, int(T * 0.4)), MAX_TEACHERS_PER_SUBJECT, T)
+    counts = np.where(rng.random(M) < scarcity, 1, rng.integers(min(2, max_t), max_t + 1, size=M))
+    picked = _sample_distinct(rng, M, T, max_t)
+    keep = np.arange(max_t) < counts[:, None]
+    pair_teacher = picked[keep]
+    pair_subject = np.broadcast_to(np.arange(1, M + 1)[:, None], picked.shape)[keep]
+    # GV không dạy môn nào -> gán 1 môn ngẫu nhiên
+    idle = np.flatnonzero(np.bincount(pair_teacher, minlength=T) == 0)
+    pair_teacher = np.concatenate((pair_teacher, idle))
+    pair_subject = np.concatenate((pair_subject, rng.integers(1, M + 1, size=len(idle))))
+    order = np.lexsort((pair_subject, pair_teacher))
+    pair_teacher, pair_subject = pair_teacher[order], pair_subject[order]
+    teacher_ptr = np.searchsorted(pair_teacher, np.arange(T + 1))
+
+    # --- 3. GHI FILE (sinh môn của lớp theo khối hàng, ghi ngay từng khối) ---
+    os.makedirs(output_folder, exist_ok=True)
+    full_path = os.path.join(output_folder, filename)
+    k = max(1, min(M, target_load)) # Mỗi môn >= 1 tiết -> k môn đầu luôn đủ đạt target_load
+    step = max(1, CHUNK_ELEMENTS // max(M, 1))
+
+    with open(full_path, 'w', buffering=WRITE_BUFFER) as f:
+        f.write(f"{T} {N} {M}\n")
+        for lo in range(0, N, step):
+            rows = min(step, N - lo)
+            courses = _sample_distinct(rng, rows, M, k)
+            cum = np.cumsum(durations[courses], axis=1)
+            prev = cum - durations[courses]
+            # Tiền tố: thêm môn khi tải trước đó chưa đạt mục tiêu và thêm vào không vượt MAX_SLOTS
+            lengths = np.count_nonzero((prev < target_load) & (cum <= MAX_SLOTS), axis=1)
+            f.write("".join(" ".join(map(str, row[:n])) + " 0\n"
+                            for row, n in zip((courses + 1).tolist(), lengths.tolist())))
+        subjects = pair_subject.tolist()
+        ptr = teacher_ptr.tolist()
+        f.write("".join(" ".join(map(str, subjects[ptr[t]:ptr[t + 1]])) + " 0\n" for t in range(T)))
+        f.write(" ".join(map(str, durations.tolist())) + "\n")
+
+    print(f"Gen: {filename:<25} | Density={density} | Scarcity (Target)={scarcity} | N={N} (NumPy)")
+
+# --- BỘ SINH CÓ LỜI GIẢI CẤY SẴN (BIẾT TRƯỚC TỐI ƯU) ---
+PLANTED_SUFFIX = ".sol" # Lời giải cấy sẵn ghi cạnh file input: <tên>.txt -> <tên>.sol
+NEW_TEACHER_TRIES = 3   # Số GV mới thử thêm vào nhóm dạy 1 môn khi cả nhóm đều bận
+MAX_FAILED_PLACEMENTS = 50 # Lớp dừng lấy thêm môn sau từng này lần liên tiếp không đặt được môn nào
+
+def generate_planted_testcase(filename, T, N, M, density, scarcity, mode='normal', output_folder="test_case",
+                              seed=None):
+    """
+    Sinh test có lời giải cấy sẵn: dựng trước 1 thời khóa biểu hợp lệ (lớp, môn, slot, GV)
+    rồi suy ra input từ chính lịch đó -> mọi môn đều xếp được, tối ưu = tổng số môn.
+    - Mỗi lớp lấy môn ngẫu nhiên tới khi đạt target_load (như generate_testcase), môn chỉ được
+      giữ nếu đặt được vào 1 slot mà lớp và 1 GV trong nhóm dạy môn đó cùng rảnh
+    - Nhóm GV của môn: môn hiếm (xác suất scarcity) đúng 1 GV, còn lại tối đa 2..min(5, 0.4 T) GV,
+      nhóm lớn dần khi các GV hiện có đều bận
+    Tổng số tiết không vượt được sức chứa GV (60 T), nên độ dày thực tế <= min(density, T / N).
+    Lịch cấy sẵn ghi ra <tên>.sol (định dạng output của solver, kiểm tra được bằng validator.py).
+    Trả về số môn (= điểm tối ưu).
+    """
+    from utils import MAX_SLOTS, build_valid_starts
+    from occupancy import Occupancy, SLOT_MASKS
+
+    rng = random.Random(seed)
+    target_load = int(MAX_SLOTS * density)
+    durations = rng.choices(range(1, 5), weights=DURATION_PROBS.get(mode, DURATION_PROBS['normal']), k=M)
+    valid_starts = build_valid_starts(durations)
+
+    max_t = min(max(2, int(T * 0.4)), MAX_TEACHERS_PER_SUBJECT, T)
+    caps = [0] + [1 if rng.random() < scarcity else rng.randint(min(2, max_t), max_t) for _ in range(M)]
+    pools = [[] for _ in range(M + 1)] # pools[m]: GV dạy môn m (thứ tự được thêm vào)
+
+    # --- 1. DỰNG LỊCH: lớp nào cũng lấy môn + đặt ngay vào slot còn trống ---
+    occ = Occupancy(N, T, track_owners=False)
+    class_mask, teacher_mask = occ.class_mask, occ.teacher_mask
+    start_masks = {d: [(s, SLOT_MASKS[d][s]) for s in starts] for d, starts in valid_starts.items()}
+    solution = []
+    for c in range(N):
+        load, courses, attempts, failed = 0, set(), 0, 0
+        while load < target_load and attempts < 1000 and failed < MAX_FAILED_PLACEMENTS:
+            attempts += 1
+            m = rng.randint(1, M)
+            d = durations[m - 1]
+            if m in courses or load + d > MAX_SLOTS:
+                continue
+            candidates = rng.sample(pools[m], len(pools[m]))
+            if len(pools[m]) < caps[m]:
+                candidates += [t for t in rng.sample(range(T), min(NEW_TEACHER_TRIES, T)) if t not in pools[m]]
+            failed += 1
+            for t in candidates:
+                busy = class_mask[c] | teacher_mask[t]
+                free = [s for s, mask in start_masks.get(d, []) if not busy & mask]
+                if free:
+                    s = rng.choice(free)
+                    occ.place(len(solution), c, t, s, d)
+                    if t not in pools[m]:
+                        pools[m].append(t)
+                    solution.append((c + 1, m, s, t + 1))
+                    courses.add(m)
+                    load += d
+                    failed = 0
+                    break
+
+    # --- 2. SUY RA KỸ NĂNG GV TỪ LỊCH ---
+    # Môn phổ thông được bổ sung GV (chỉ thêm khả năng, không thêm tiết) cho đủ tối thiểu 2 người;
+    # môn chưa ai dạy vẫn phải có >= 1 GV; GV không dạy gì được gán 1 môn ngẫu nhiên
+    for m in range(1, M + 1):
+        want = 1 if caps[m] == 1 else min(2, T)
+        while len(pools[m]) < want:
+            t = rng.randrange(T)
+            if t not in pools[m]:
+                pools[m].append(t)
+    teacher_abilities = [set() for _ in range(T)]
+    for m in range(1, M + 1):
+        for t in pools[m]:
+            teacher_abilities[t].add(m)
+    for t in range(T):
+        if not teacher_abilities[t]:
+            teacher_abilities[t].add(rng.randint(1, M))
+
+    # --- 3. GHI FILE INPUT + LỜI GIẢI ---
+    class_courses = [[] for _ in range(N)]
+    for c, m, _, _ in solution:
+        class_courses[c - 1].append(m)
+    os.makedirs(output_folder, exist_ok=True)
+    full_path = os.path.join(output_folder, filename)
+    with open(full_path, 'w', buffering=WRITE_BUFFER) as f:
+        f.write(f"{T} {N} {M}\n")
+        f.write("".join(" ".join(map(str, courses)) + " 0\n" for courses in class_courses))
+        f.write("".join(" ".join(map(str, sorted(abilities))) + " 0\n" for abilities in teacher_abilities))
+        f.write(" ".join(map(str, durations)) + "\n")
+    solution.sort()
+    with open(os.path.splitext(full_path)[0] + PLANTED_SUFFIX, 'w', buffering=WRITE_BUFFER) as f:
+        f.write(f"{len(solution)}\n")
+        f.write("".join(f"{c} {m} {s} {t}\n" for c, m, s, t in solution))
+
+    print(f"Gen: {filename:<25} | Density={density} | Scarcity (Target)={scarcity} | "
+          f"Planted optimum={len(solution)}")
+    return len(solution)
+
+def planted_optimum(input_path):
+    """Điểm tối ưu của test có lời giải cấy sẵn (dòng đầu file .sol đi kèm), None nếu không có"""
+    path = os.path.splitext(input_path)[0] + PLANTED_SUFFIX
+    try:
+        with open(path) as f:
+            return int(f.readline())
+    except (OSError, ValueError):
+        return None
+
+def generate_sample_suite():
+    """Sinh lại 6 test case mẫu trong test_case/"""
     print("-" * 60)
     print("SINH LẠI 6 TEST CASE VỚI LOGIC SCARCITY MỚI")
     print("-" * 60)
@@ -164,4 +379,30 @@ if __name__ == "__main__":
     )
 
     print("-" * 60)
-    print("Xong! Chạy lại 'analyzer_folder.py' để thấy Scarcity > 0%.")
\ No newline at end of file
+    print("Xong! Chạy lại 'analyzer_folder.py' để thấy Scarcity > 0%.")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Sinh test case xếp thời khóa biểu")
+    parser.add_argument("--classes", type=int, default=None,
+                        help="Sinh 1 test lớn N lớp bằng bộ sinh NumPy (mặc định: sinh lại 6 test mẫu)")
+    parser.add_argument("--teachers", type=int, default=None, help="Số GV (mặc định N / 2)")
+    parser.add_argument("--subjects", type=int, default=None, help="Số môn (mặc định 0.8 N)")
+    parser.add_argument("--density", type=float, default=0.8)
+    parser.add_argument("--scarcity", type=float, default=0.25)
+    parser.add_argument("--mode", choices=sorted(DURATION_PROBS), default='normal')
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--planted", action="store_true",
+                        help="Sinh kèm lời giải cấy sẵn (<tên>.sol): mọi môn xếp được, biết trước tối ưu")
+    parser.add_argument("--output", default=None, help="Tên file (mặc định stress_N<N>.txt)")
+    parser.add_argument("--output-folder", default="test_case")
+    args = parser.parse_args()
+    if args.classes is None:
+        generate_sample_suite()
+    else:
+        n = args.classes
+        generate = generate_planted_testcase if args.planted else generate_testcase_np
+        generate(args.output or f"{'planted' if args.planted else 'stress'}_N{n}.txt",
+                 T=args.teachers or max(5, n // 2), N=n, M=args.subjects or max(15, n * 4 // 5),
+                 density=args.density, scarcity=args.scarcity, mode=args.mode,
+                 output_folder=args.output_folder, seed=args.seed)
\ No newline at end of file
@@ -1,11 +1,14 @@
-from ortools.sat.python import cp_model
 import sys
+from utils import build_subject_index
 
 # --- CẤU HÌNH ---
 SLOTS = 60
 SLOTS_PER_SESSION = 6
 
 def solve_cp():
+    # Import ortools trong hàm (nặng): module nạp nhanh, chi phí chỉ trả khi thật sự giải
+    from ortools.sat.python import cp_model
+
     # --- ĐỌC INPUT ---
     input_data = sys.stdin.read().split()
     if not input_data: return
@@ -44,10 +47,12 @@ def solve_cp():
     class_intervals = [[] for _ in range(N)]
     teacher_intervals = [[] for _ in range(T)]
 
+    # Chỉ mục ngược Môn -> Giáo viên (xây 1 lần, task cùng môn dùng chung list)
+    subject_to_teachers = build_subject_index(M, teacher_abilities)
     for c_idx, courses in enumerate(class_courses):
         for m_id in courses:
             d = durations[m_id - 1]
-            eligible = [t for t in range(T) if m_id in teacher_abilities[t]]
+            eligible = subject_to_teachers[m_id]
             if not eligible: continue
 
             # 1. Biến Boolean: Môn này có được xếp lịch không? (Mục tiêu là Maximize biến này)
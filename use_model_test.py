@@ -1,52 +1,46 @@
-from ortools.sat.python import cp_model
-import sys
-from io import StringIO
+from utils import build_subject_index, read_raw_instance
+# ortools chỉ được import trong solve(): riêng import mất vài trăm ms, benchmark runner / CLI
+# chỉ nạp module này khi thật sự chọn solver CP thì mới phải trả chi phí đó
 
 # --- CẤU HÌNH MẶC ĐỊNH ---
 SLOTS = 60
 SLOTS_PER_SESSION = 6
 DEFAULT_TIME_LIMIT = 5.0
 
-def solve(input_content=None, time_limit=None):
+def make_progress_callback(cp_model, progress):
+    """Callback gọi progress(elapsed, best_score) mỗi khi CP-SAT tìm được lời giải tốt hơn"""
+    class ProgressCallback(cp_model.CpSolverSolutionCallback):
+        def __init__(self):
+            super().__init__()
+            self.progress = progress
+
+        def on_solution_callback(self):
+            # Mục tiêu Maximize(tổng is_present) -> giá trị mục tiêu chính là số môn xếp được
+            self.progress(self.WallTime(), int(self.ObjectiveValue()))
+    return ProgressCallback()
+
+def solve(input_content=None, time_limit=None, progress=None, details=False, timer=None, upper_bound=None):
     """
     Hàm giải sử dụng Constraint Programming (OR-Tools).
     - input_content: Nội dung file input (str).
     - time_limit: Giới hạn thời gian (seconds).
+    - progress: Callback progress(elapsed, best_score) gọi mỗi khi lời giải tốt nhất được cải thiện
+      (best_score = số môn xếp được).
+    - timer: PhaseTimer (tùy chọn) đo thời gian các pha parse / preprocess / construct / improve / output.
+    - details: True -> trả về danh sách dòng lời giải (lớp, môn, slot, GV) 1-based thay vì số môn.
+    - upper_bound: Cận trên số môn xếp được (analyzer.compute_upper_bounds), thêm làm ràng buộc
+      để CP-SAT chứng minh tối ưu (và dừng) ngay khi chạm cận.
     """
-    
+    from ortools.sat.python import cp_model
+
+    if timer is not None: timer.phase('parse')
     # 1. XỬ LÝ INPUT
-    if input_content:
-        sys.stdin = StringIO(input_content)
-        
-    input_data = sys.stdin.read().split()
-    if not input_data: return 0
-    
-    iterator = iter(input_data)
-    try:
-        T = int(next(iterator))
-        N = int(next(iterator))
-        M = int(next(iterator))
-        class_courses = []
-        for _ in range(N):
-            curr = []
-            while True:
-                val = int(next(iterator))
-                if val == 0: break
-                curr.append(val)
-            class_courses.append(curr)
-        teacher_abilities = []
-        for _ in range(T):
-            curr = set()
-            while True:
-                val = int(next(iterator))
-                if val == 0: break
-                curr.add(val)
-            teacher_abilities.append(curr)
-        durations = []
-        for _ in range(M): durations.append(int(next(iterator)))
-    except StopIteration:
-        return 0
+    # Bộ đọc chung của utils nhận thẳng nội dung input (không patch sys.stdin)
+    raw = read_raw_instance(input_content)
+    if raw is None: return 0
+    T, N, M, class_courses, teacher_abilities, durations = raw
 
+    if timer is not None: timer.phase('preprocess')
     # --- MÔ HÌNH HÓA (MODELING) ---
     model = cp_model.CpModel()
     
@@ -57,10 +51,12 @@ def solve(input_content=None, time_limit=None):
     class_intervals = [[] for _ in range(N)]
     teacher_intervals = [[] for _ in range(T)]
 
+    # Chỉ mục ngược Môn -> Giáo viên (xây 1 lần, task cùng môn dùng chung list)
+    subject_to_teachers = build_subject_index(M, teacher_abilities)
     for c_idx, courses in enumerate(class_courses):
         for m_id in courses:
             d = durations[m_id - 1]
-            eligible = [t for t in range(T) if m_id in teacher_abilities[t]]
+            eligible = subject_to_teachers[m_id]
             if not eligible: continue
 
             # 1. Biến Boolean: Môn này có được xếp lịch không? (Mục tiêu là Maximize biến này)
@@ -119,7 +115,10 @@ def solve(input_content=None, time_limit=None):
     # Tối đa hóa số môn được xếp (Tổng các biến is_present)
     total_scheduled = sum(info['is_present'] for info in assignments.values())
     model.Maximize(total_scheduled)
+    if upper_bound is not None:
+        model.Add(total_scheduled <= upper_bound)
 
+    if timer is not None: timer.phase('improve')
     # --- GIẢI ---
     solver = cp_model.CpSolver()
     
@@ -130,12 +129,16 @@ def solve(input_content=None, time_limit=None):
     # Có thể thêm parameters để tối ưu log nếu muốn
     # solver.parameters.log_search_progress = True 
     
-    status = solver.Solve(model)
+    if progress is not None:
+        status = solver.Solve(model, make_progress_callback(cp_model, progress))
+    else:
+        status = solver.Solve(model)
 
+    if timer is not None: timer.phase('output')
     # --- OUTPUT ---
     final_count = 0
+    results = []
     if status == cp_model.OPTIMAL or status == cp_model.FEASIBLE:
-        results = []
         for (c_idx, m_id), info in assignments.items():
             if solver.Value(info['is_present']):
                 start_val = solver.Value(info['start'])
@@ -160,7 +163,8 @@ def solve(input_content=None, time_limit=None):
         if input_content is None:
             print(0)
 
-    return final_count
+    if timer is not None: timer.stop()
+    return results if details else final_count
 
 if __name__ == "__main__":
     solve()
\ No newline at end of file
@@ -1,24 +1,37 @@
 import sys
+import os
+import mmap
+import time
+import random
+from array import array
+
+# NumPy chỉ được import khi thật sự cần (load_numpy): riêng import numpy mất ~0.1s,
+# đáng kể so với TIME_LIMIT 0.95s khi solver chạy như 1 process CLI ngắn
+np = None
+_NUMPY_MISSING = False
 
 # --- CẤU HÌNH CHUNG ---
 SLOTS_PER_SESSION = 6
 MAX_SLOTS = 60  # 5 ngày * 2 buổi * 6 tiết
+MMAP_THRESHOLD = 1 << 20 # File từ 1MB trở lên thì memory-map khi đọc
+NUMPY_MIN_BYTES = 1 << 16 # Input nhỏ hơn thì split() + int() nhanh hơn cả thời gian import NumPy
 
-def input_stream():
-    """Hàm đọc dữ liệu an toàn từ stdin"""
-    try:
-        input_data = sys.stdin.read().split()
-    except Exception:
-        return None
-    if not input_data:
-        return None
-    
-    iterator = iter(input_data)
-    while True:
+def load_numpy():
+    """Import NumPy ở lần gọi đầu (gán vào utils.np); môi trường không có NumPy thì trả về None"""
+    global np, _NUMPY_MISSING
+    if np is None and not _NUMPY_MISSING:
         try:
-            yield int(next(iterator))
-        except StopIteration:
-            break
+            import numpy
+            np = numpy
+        except ImportError: # Môi trường chấm bài có thể không có NumPy -> dùng bộ đọc thuần Python
+            _NUMPY_MISSING = True
+    return np
+
+def require_numpy():
+    """Như load_numpy nhưng báo ImportError khi thiếu NumPy (chức năng không có bản thuần Python)"""
+    if load_numpy() is None:
+        raise ImportError("Chức năng này cần NumPy (pip install numpy)")
+    return np
 
 def is_valid_session(start, duration):
     """Kiểm tra môn học có bị vắt qua trưa/chiều không"""
@@ -27,74 +40,119 @@ def is_valid_session(start, duration):
     # Công thức: (start-1)//6 phải bằng (end-1)//6
     return ((start - 1) // SLOTS_PER_SESSION) == ((end - 1) // SLOTS_PER_SESSION)
 
-def load_and_preprocess():
+# --- ĐỌC DỮ LIỆU HÀNG LOẠT (BULK PARSER) ---
+def read_stdin_bytes():
+    """Đọc toàn bộ stdin dưới dạng bytes (hỗ trợ cả sys.stdin bị thay bằng StringIO)"""
+    try:
+        if hasattr(sys.stdin, 'buffer'):
+            return sys.stdin.buffer.read()
+        return sys.stdin.read().encode()
+    except Exception:
+        return None
+
+def tokenize(raw):
     """
-    Hàm Tiền xử lý trung tâm:
-    1. Đọc dữ liệu
-    2. Phẳng hóa Task
-    3. Tính toán trước các Slot hợp lệ
-    4. Sắp xếp Heuristic
+    Chuyển toàn bộ nội dung (bytes / mmap) thành mảng số nguyên bằng vector hóa:
+    tìm các đoạn chữ số liên tiếp, sau đó ghép giá trị theo từng vị trí chữ số
+    (số vòng lặp = độ dài token dài nhất, không phải số token).
+    Input nhỏ (khi NumPy chưa được nạp) hoặc không có NumPy thì quay về split() + int().
     """
-    reader = input_stream()
-    if reader is None: return None
+    if (np is None and len(raw) < NUMPY_MIN_BYTES) or load_numpy() is None:
+        return [int(x) for x in bytes(raw).split()]
 
-    # 1. ĐỌC DỮ LIỆU THÔ
-    try:
-        T = next(reader) # Số giáo viên
-        N = next(reader) # Số lớp
-        M = next(reader) # Số môn
-        
-        class_courses = []
-        for _ in range(N):
-            curr = []
-            while True:
-                val = next(reader)
-                if val == 0: break
-                curr.append(val)
-            class_courses.append(curr)
-            
-        teacher_abilities = []
-        for _ in range(T):
-            curr = set()
-            while True:
-                val = next(reader)
-                if val == 0: break
-                curr.add(val)
-            teacher_abilities.append(curr)
-            
-        durations = []
-        for _ in range(M): durations.append(next(reader))
-        
-    except StopIteration:
-        return None
+    buf = np.frombuffer(raw, dtype=np.uint8)
+    digits = buf - np.uint8(48) # '0' -> 0; ký tự khác chữ số sẽ tràn thành >= 10
+    is_digit = digits < 10
+    # Ranh giới token: vị trí đầu đoạn chữ số và ngay sau cuối đoạn xen kẽ nhau
+    edges = np.diff(is_digit.view(np.int8), prepend=np.int8(0), append=np.int8(0))
+    bounds = np.flatnonzero(edges)
+    if len(bounds) == 0:
+        return np.zeros(0, dtype=np.int64)
 
-    # 2. PHẲNG HÓA DATA (FLATTENING) -> DANH SÁCH TASK
-    tasks = []
-    task_counter = 0
-    for c_idx, courses in enumerate(class_courses):
-        for m_id in courses:
-            # Tìm giáo viên dạy được môn này
-            eligible = [t for t in range(T) if m_id in teacher_abilities[t]]
-            
-            # Thời lượng
-            d = durations[m_id - 1]
-            
-            tasks.append({
-                'id': task_counter,
-                'c': c_idx,         # Index lớp (0-based)
-                'm': m_id,          # ID môn (1-based theo input)
-                'd': d,             # Thời lượng
-                'eligible': eligible, # Danh sách GV dạy được
-                'num_eligible': len(eligible) # Để sort nhanh
-            })
-            task_counter += 1
+    starts, ends = bounds[0::2], bounds[1::2]
+    lengths = ends - starts
+    values = digits[starts].astype(np.int64)
+    for k in range(1, int(lengths.max())):
+        more = np.flatnonzero(lengths > k)
+        values[more] = values[more] * 10 + digits[starts[more] + k]
+    return values
 
-    # 3. SẮP XẾP HEURISTIC (STATIC ORDERING)
-    # Ưu tiên: Ít giáo viên -> Môn dài -> Index lớp nhỏ
-    tasks.sort(key=lambda x: (x['num_eligible'], -x['d'], x['c']))
+def read_instance_file(path):
+    """Đọc file instance; file lớn được memory-map thay vì copy vào bộ nhớ"""
+    with open(path, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        if size < MMAP_THRESHOLD or load_numpy() is None:
+            return parse_instance_bytes(f.read())
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            return parse_instance_bytes(mm)
+        finally:
+            mm.close()
 
-    # 4. TÍNH TRƯỚC SLOT HỢP LỆ (CACHING)
-    # Map: Duration -> List of valid start slots
+def parse_instance_bytes(raw):
+    """
+    Bóc tách dữ liệu thô: (T, N, M, class_courses, teacher_abilities, durations).
+    Danh sách lớp / giáo viên được cắt theo vị trí các số 0 kết thúc (tìm bằng vector hóa).
+    """
+    if not raw: return None
+    tokens = tokenize(raw)
+    if len(tokens) < 3: return None
+
+    T, N, M = (int(x) for x in tokens[:3])
+    vectorized = not isinstance(tokens, list) # tokenize trả về mảng NumPy hay list thuần Python
+    body = tokens[3:]
+    if vectorized:
+        terminators = np.flatnonzero(body == 0)[:N + T].tolist()
+    else:
+        terminators = [i for i, v in enumerate(body) if v == 0][:N + T]
+    if len(terminators) < N + T: return None
+
+    # Phần durations nằm ngay sau số 0 kết thúc giáo viên cuối cùng
+    dur_start = terminators[-1] + 1 if terminators else 0
+    if len(body) < dur_start + M: return None
+    flat = body[:dur_start + M]
+    flat = flat.tolist() if vectorized else flat
+
+    class_courses = []
+    teacher_abilities = []
+    prev = 0
+    for i, end in enumerate(terminators):
+        if i < N:
+            class_courses.append(flat[prev:end])
+        else:
+            teacher_abilities.append(set(flat[prev:end]))
+        prev = end + 1
+    durations = flat[dur_start:dur_start + M]
+
+    return T, N, M, class_courses, teacher_abilities, durations
+
+def read_raw_instance(source=None):
+    """
+    Đọc dữ liệu thô: (T, N, M, class_courses, teacher_abilities, durations).
+    source có thể là:
+    - None: đọc stdin (chế độ nộp bài)
+    - bytes / bytearray / memoryview: nội dung input
+    - os.PathLike, hoặc str là đường dẫn tới file có thật: đọc file
+    - str khác: nội dung input dạng text
+    - CompiledInstance (VD: lấy từ instance_cache)
+    Ngoài trường hợp None, hàm không đụng tới sys.stdin nên gọi song song (nhiều thread) được.
+    """
+    if source is None:
+        return parse_instance_bytes(read_stdin_bytes())
+    if isinstance(source, CompiledInstance):
+        return source.to_raw()
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return parse_instance_bytes(source)
+    if isinstance(source, os.PathLike):
+        return read_instance_file(source)
+    if isinstance(source, str):
+        if '\n' not in source and os.path.isfile(source):
+            return read_instance_file(source)
+        return parse_instance_bytes(source.encode())
+    raise TypeError(f"Không đọc được instance từ {type(source).__name__}")
+
+def build_valid_starts(durations):
+    """Map: Duration -> List các slot bắt đầu hợp lệ (không vắt qua buổi)"""
     valid_starts = {}
     # Giả sử môn dài nhất không quá 12 tiết
     max_duration = max(durations) if durations else 12
@@ -104,11 +162,255 @@ def load_and_preprocess():
         for s in range(1, MAX_SLOTS - d + 2):
             if is_valid_session(s, d):
                 valid_starts[d].append(s)
+    return valid_starts
+
+def build_subject_index(M, teacher_abilities):
+    """
+    Chỉ mục ngược Môn -> Giáo viên, xây 1 lần trong O(tổng số kỹ năng).
+    subject_to_teachers[m] là list GV (0-based, tăng dần) dạy được môn m (1-based).
+    Các task cùng môn dùng chung list này (không được sửa trực tiếp).
+    """
+    subject_to_teachers = [[] for _ in range(M + 1)]
+    for t, abilities in enumerate(teacher_abilities):
+        for m_id in abilities:
+            if 0 < m_id <= M: subject_to_teachers[m_id].append(t)
+    return subject_to_teachers
+
+# Các kiểu sắp xếp bảng phương án (teacher, start, mask) của mỗi môn
+OPTION_ORDERS = ('teacher', 'earliest', 'least_loaded')
+
+def build_option_table(subject_teachers, subject_durations, valid_starts, order='teacher',
+                       subject_demand=None):
+    """
+    Bảng phương án xếp của từng môn: option_table[m] là list (teacher, start, mask)
+    với mask = SLOT_MASKS[d][start] tính sẵn (task cùng môn dùng chung list, chỉ đọc).
+    subject_durations[m]: thời lượng môn m (1-based). Thứ tự phương án trong list:
+    - 'teacher': GV tăng dần rồi slot sớm trước (giống 2 vòng lặp lồng nhau cũ)
+    - 'earliest': slot sớm trước rồi GV tăng dần
+    - 'least_loaded': GV ít tải tĩnh trước (tổng subject_demand các môn GV dạy được,
+      mặc định mỗi môn tính 1), rồi slot sớm trước
+    """
+    if order not in OPTION_ORDERS:
+        raise ValueError(f"order phải là một trong {OPTION_ORDERS}, nhận '{order}'")
+
+    if order == 'least_loaded':
+        loads = {}
+        for m_id, teachers in enumerate(subject_teachers):
+            demand = subject_demand[m_id] if subject_demand is not None else 1
+            for t in teachers:
+                loads[t] = loads.get(t, 0) + demand
+
+    table = []
+    for m_id, teachers in enumerate(subject_teachers):
+        d = subject_durations[m_id] if m_id < len(subject_durations) else 0
+        starts = valid_starts.get(d, [])
+        if not teachers or not starts:
+            table.append([])
+            continue
+        masks = [((1 << d) - 1) << (s - 1) for s in starts]
+        if order == 'earliest':
+            options = [(t, s, mask) for s, mask in zip(starts, masks) for t in teachers]
+        else:
+            if order == 'least_loaded':
+                teachers = sorted(teachers, key=lambda t: (loads[t], t))
+            options = [(t, s, mask) for t in teachers for s, mask in zip(starts, masks)]
+        table.append(options)
+    return table
+
+def group_options_by_teacher(option_table):
+    """
+    Nhóm bảng phương án theo GV: kết quả[m] = {teacher: [(teacher, start, mask)]} (slot sớm trước).
+    Bộ sinh láng giềng lấy mẫu vài GV thì chỉ duyệt phương án của các GV đó.
+    """
+    grouped = []
+    for options in option_table:
+        groups = {}
+        for option in options:
+            groups.setdefault(option[0], []).append(option)
+        grouped.append(groups)
+    return grouped
+
+# --- BIỂU DIỄN DẠNG CỘT (STRUCT-OF-ARRAYS) ---
+class CompiledInstance:
+    """
+    Bộ dữ liệu đã biên dịch: mỗi thuộc tính task là một cột array('i')
+    đánh chỉ số theo task id (thay cho list các dict).
+    - c, m, d, num_eligible: Lớp (0-based), Môn (1-based), Thời lượng, Số GV dạy được
+    - elig_ptr, elig_idx: Bảng GV dạy được dạng CSR theo MÔN (task cùng môn dùng chung),
+      GV dạy môn m nằm ở elig_idx[elig_ptr[m]:elig_ptr[m + 1]]
+    - order: Thứ tự task id theo heuristic (ít GV -> môn dài -> lớp nhỏ)
+    - durations: Thời lượng từng môn theo input (durations[m - 1])
+    """
+    __slots__ = ('T', 'N', 'M', 'num_tasks', 'c', 'm', 'd', 'num_eligible',
+                 'elig_ptr', 'elig_idx', 'subject_teachers', 'order', 'valid_starts',
+                 'durations', 'option_tables')
+
+    def __init__(self, T, N, M, c, m, d, elig_ptr, elig_idx, order, valid_starts, durations,
+                 num_eligible=None):
+        self.T, self.N, self.M = T, N, M
+        self.durations = durations
+        self.num_tasks = len(c)
+        self.c, self.m, self.d = c, m, d
+        self.elig_ptr, self.elig_idx = elig_ptr, elig_idx
+        # Mỗi môn 1 list dựng sẵn từ CSR -> eligible() không phải cắt/copy mảng
+        self.subject_teachers = [elig_idx[elig_ptr[s]:elig_ptr[s + 1]].tolist()
+                                 for s in range(len(elig_ptr) - 1)]
+        if num_eligible is None: # Chưa có sẵn (VD: không nạp từ cache) thì tính theo CSR
+            num_eligible = array('i', [elig_ptr[s + 1] - elig_ptr[s] for s in m])
+        self.num_eligible = num_eligible
+        self.order = order
+        self.valid_starts = valid_starts
+        self.option_tables = {} # order -> bảng phương án, dựng khi cần (xem option_table / teacher_option_table)
+
+    def eligible(self, tid):
+        """Danh sách GV (0-based) dạy được task tid (list dùng chung theo môn, chỉ đọc)"""
+        return self.subject_teachers[self.m[tid]]
+
+    def option_table(self, order='teacher'):
+        """
+        Bảng phương án (teacher, start, mask) theo môn, dựng 1 lần cho mỗi kiểu order rồi dùng lại.
+        Phương án của task tid: option_table(order)[m[tid]].
+        """
+        table = self.option_tables.get(order)
+        if table is None:
+            demand = [0] * (self.M + 1)
+            for m_id, d in zip(self.m, self.d):
+                demand[m_id] += d
+            table = build_option_table(self.subject_teachers, [0] + list(self.durations),
+                                       self.valid_starts, order, demand)
+            self.option_tables[order] = table
+        return table
+
+    def teacher_option_table(self):
+        """Bảng phương án nhóm theo GV (group_options_by_teacher), dựng 1 lần: teacher_option_table()[m][t]"""
+        table = self.option_tables.get('by_teacher')
+        if table is None:
+            table = group_options_by_teacher(self.option_table())
+            self.option_tables['by_teacher'] = table
+        return table
+
+    def to_raw(self):
+        """Dựng lại dữ liệu thô (T, N, M, class_courses, teacher_abilities, durations) cho solver tự tiền xử lý"""
+        class_courses = [[] for _ in range(self.N)]
+        for tid in range(self.num_tasks): # Task id tăng dần theo lớp rồi theo thứ tự môn trong input
+            class_courses[self.c[tid]].append(self.m[tid])
+        teacher_abilities = [set() for _ in range(self.T)]
+        for m_id, teachers in enumerate(self.subject_teachers):
+            for t in teachers:
+                teacher_abilities[t].add(m_id)
+        return self.T, self.N, self.M, class_courses, teacher_abilities, list(self.durations)
+
+def compile_instance(T, N, M, class_courses, teacher_abilities, durations):
+    """Phẳng hóa dữ liệu thô thành CompiledInstance (không tạo dict cho từng task)"""
+    c_col, m_col, d_col = array('i'), array('i'), array('i')
+
+    # 1. CHỈ MỤC NGƯỢC MÔN -> GIÁO VIÊN (CSR theo môn)
+    subject_to_teachers = build_subject_index(M, teacher_abilities)
+    elig_ptr, elig_idx = array('i', [0]), array('i')
+    for teachers in subject_to_teachers:
+        elig_idx.extend(teachers)
+        elig_ptr.append(len(elig_idx))
+
+    # 2. PHẲNG HÓA DATA (FLATTENING) -> CÁC CỘT TASK
+    for c_idx, courses in enumerate(class_courses):
+        for m_id in courses:
+            c_col.append(c_idx)               # Index lớp (0-based)
+            m_col.append(m_id)                # ID môn (1-based theo input)
+            d_col.append(durations[m_id - 1]) # Thời lượng
+
+    # 3. SẮP XẾP HEURISTIC (STATIC ORDERING)
+    # Ưu tiên: Ít giáo viên -> Môn dài -> Index lớp nhỏ
+    order = array('i', sorted(range(len(c_col)),
+                              key=lambda i: (len(subject_to_teachers[m_col[i]]), -d_col[i], c_col[i])))
+
+    # 4. TÍNH TRƯỚC SLOT HỢP LỆ (CACHING)
+    valid_starts = build_valid_starts(durations)
+
+    return CompiledInstance(T, N, M, c_col, m_col, d_col, elig_ptr, elig_idx, order, valid_starts,
+                            array('i', durations))
 
-    # Trả về gói dữ liệu đã xử lý sạch sẽ
-    return {
-        'T': T, 'N': N, 'M': M,
-        'tasks': tasks,
-        'valid_starts': valid_starts,
-        'num_tasks': len(tasks)
-    }
\ No newline at end of file
+def index_tasks_by_id(tasks):
+    """
+    Bảng tra task theo ID: task_by_id[tid] là task có 'id' == tid.
+    (tasks đã bị sort lại sau khi gán ID nên tasks[tid] KHÔNG phải task tid)
+    """
+    task_by_id = [None] * (max((t['id'] for t in tasks), default=-1) + 1)
+    for task in tasks:
+        task_by_id[task['id']] = task
+    return task_by_id
+
+# --- ĐO THỜI GIAN TỪNG PHA ---
+# Các pha chuẩn của 1 lần solve (solver nào không có pha nào thì bỏ qua pha đó)
+PHASES = ('parse', 'preprocess', 'construct', 'improve', 'output')
+
+class PhaseTimer:
+    """
+    Bấm giờ từng pha của solver: phase(name) kết thúc pha đang đo và bắt đầu pha name,
+    stop() kết thúc pha cuối. phases = {tên pha: tổng số giây} (gọi lại 1 pha thì cộng dồn).
+    """
+    __slots__ = ('phases', '_current', '_start')
+
+    def __init__(self):
+        self.phases = {}
+        self._current = None
+        self._start = 0.0
+
+    def phase(self, name):
+        now = time.perf_counter()
+        if self._current is not None:
+            self.phases[self._current] = self.phases.get(self._current, 0.0) + now - self._start
+        self._current, self._start = name, now
+
+    def stop(self):
+        self.phase(None)
+
+class IdPool:
+    """Tập ID hỗ trợ thêm / xóa / chọn ngẫu nhiên O(1) (thay cho list.remove và list(dict.keys()))"""
+    __slots__ = ('items', 'pos')
+
+    def __init__(self, ids=()):
+        self.items = list(ids)
+        self.pos = {x: i for i, x in enumerate(self.items)}
+
+    def add(self, x):
+        if x not in self.pos:
+            self.pos[x] = len(self.items)
+            self.items.append(x)
+
+    def discard(self, x):
+        # Đổi chỗ phần tử cần xóa với phần tử cuối rồi pop -> O(1)
+        i = self.pos.pop(x, None)
+        if i is None: return
+        last = self.items.pop()
+        if i < len(self.items):
+            self.items[i] = last
+            self.pos[last] = i
+
+    def choice(self):
+        return random.choice(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+    def __contains__(self, x):
+        return x in self.pos
+
+    def __iter__(self):
+        return iter(self.items)
+
+def load_compiled_instance(source=None, timer=None):
+    """
+    Trả về CompiledInstance (dùng trực tiếp trong các vòng lặp nóng).
+    source: như read_raw_instance; CompiledInstance (VD: từ instance_cache) thì dùng lại luôn.
+    timer: PhaseTimer (tùy chọn) -> đo pha 'parse', kết thúc ở pha 'preprocess'.
+    """
+    if timer is not None: timer.phase('parse')
+    if isinstance(source, CompiledInstance):
+        instance = source
+    else:
+        raw = read_raw_instance(source)
+        if raw is None: return None
+        if timer is not None: timer.phase('preprocess')
+        return compile_instance(*raw)
+    if timer is not None: timer.phase('preprocess')
+    return instance
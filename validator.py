@@ -0,0 +1,106 @@
+import sys
+from utils import SLOTS_PER_SESSION, MAX_SLOTS, load_compiled_instance, require_numpy
+
+# --- KIỂM TRA LỜI GIẢI ĐỘC LẬP (VECTOR HÓA BẰNG NUMPY) ---
+# Mỗi dòng lời giải: (lớp, môn, slot bắt đầu, giáo viên), tất cả 1-based như output.
+# Các loại vi phạm (đếm số dòng / số tiết vi phạm):
+VIOLATIONS = ('out_of_range', 'unknown_task', 'duplicate_task', 'cross_session',
+              'not_eligible', 'class_overlap', 'teacher_overlap')
+
+def parse_solution(text):
+    """Output dạng text ('K' rồi K dòng 'c m s t') -> mảng (K, 4)"""
+    np = require_numpy() # Import muộn: nạp validator (VD: benchmark runner) không kéo theo NumPy
+    values = np.array(text.split(), dtype=np.int64)
+    if values.size == 0:
+        return np.zeros((0, 4), dtype=np.int64)
+    k = int(values[0])
+    body = values[1:1 + 4 * k]
+    if body.size != 4 * k:
+        raise ValueError(f"Output khai báo {k} dòng nhưng chỉ có {body.size // 4}")
+    return body.reshape(k, 4)
+
+def _count_overlaps(owner, start, dur):
+    """Số tiết bị 2 dòng trở lên cùng chiếm (owner = lớp hoặc giáo viên, 0-based)"""
+    np = require_numpy()
+    if owner.size == 0:
+        return 0
+    # Bung mỗi dòng thành dur tiết: slot = start - 1 + 0..dur-1
+    row = np.repeat(np.arange(owner.size), dur)
+    offset = np.arange(row.size) - np.repeat(np.cumsum(dur) - dur, dur)
+    keys = np.sort(owner[row] * MAX_SLOTS + start[row] - 1 + offset)
+    return int(np.count_nonzero(keys[1:] == keys[:-1]))
+
+def validate_solution(inst, rows):
+    """
+    Kiểm tra lời giải rows trên instance inst (CompiledInstance) và tính lại điểm chuẩn.
+    Trả về dict:
+    - valid: không có vi phạm nào
+    - num_rows: số dòng lời giải
+    - score: mục tiêu chuẩn = số môn xếp được (0 nếu lời giải không hợp lệ)
+    - start_sum: tổng slot bắt đầu (tiêu chí phụ, càng nhỏ càng tốt)
+    - violations: {loại vi phạm: số lượng}
+    """
+    np = require_numpy()
+    rows = np.asarray(rows, dtype=np.int64).reshape(-1, 4)
+    violations = dict.fromkeys(VIOLATIONS, 0)
+    T, N, M = inst.T, inst.N, inst.M
+    durations = np.concatenate(([0], np.asarray(inst.durations, dtype=np.int64)))
+
+    # 1. Giá trị ngoài miền -> loại khỏi các bước kiểm tra sau
+    c, m, s, t = rows.T
+    in_range = (c >= 1) & (c <= N) & (m >= 1) & (m <= M) & (t >= 1) & (t <= T) & (s >= 1)
+    d = np.where(in_range, durations[np.where(in_range, m, 0)], 0)
+    in_range &= (d >= 1) & (s + d - 1 <= MAX_SLOTS)
+    violations['out_of_range'] = int(rows.shape[0] - np.count_nonzero(in_range))
+    c, m, s, t, d = c[in_range] - 1, m[in_range], s[in_range], t[in_range] - 1, d[in_range]
+
+    # 2. Cặp (lớp, môn) phải là task có thật, mỗi task xếp tối đa số lần yêu cầu
+    task_keys, demand = np.unique(np.asarray(inst.c, dtype=np.int64) * (M + 1) +
+                                  np.asarray(inst.m, dtype=np.int64), return_counts=True)
+    row_keys, used = np.unique(c * (M + 1) + m, return_counts=True)
+    pos = np.minimum(np.searchsorted(task_keys, row_keys), max(task_keys.size - 1, 0))
+    known = (task_keys[pos] == row_keys) if task_keys.size else np.zeros(row_keys.size, dtype=bool)
+    violations['unknown_task'] = int(used[~known].sum())
+    violations['duplicate_task'] = int(np.maximum(used[known] - demand[pos[known]], 0).sum())
+
+    # 3. Không vắt qua ranh giới buổi
+    violations['cross_session'] = int(np.count_nonzero(
+        (s - 1) // SLOTS_PER_SESSION != (s + d - 2) // SLOTS_PER_SESSION))
+
+    # 4. Giáo viên phải dạy được môn (tra cặp (môn, GV) trong bảng CSR theo môn)
+    elig_ptr = np.asarray(inst.elig_ptr, dtype=np.int64)
+    elig_keys = np.sort(np.repeat(np.arange(elig_ptr.size - 1), np.diff(elig_ptr)) * T +
+                        np.asarray(inst.elig_idx, dtype=np.int64))
+    violations['not_eligible'] = int(np.count_nonzero(~np.isin(m * T + t, elig_keys)))
+
+    # 5. Lớp / giáo viên không dạy 2 môn cùng 1 tiết
+    violations['class_overlap'] = _count_overlaps(c, s, d)
+    violations['teacher_overlap'] = _count_overlaps(t, s, d)
+
+    valid = not any(violations.values())
+    return {
+        'valid': valid,
+        'num_rows': int(rows.shape[0]),
+        'score': int(rows.shape[0]) if valid else 0,
+        'start_sum': int(rows[:, 2].sum()),
+        'violations': violations
+    }
+
+if __name__ == "__main__":
+    # Dùng: python validator.py <file input> [file output]   (không có file output thì đọc stdin)
+    if len(sys.argv) < 2:
+        print("Dùng: python validator.py <file input> [file output]")
+        sys.exit(2)
+    inst = load_compiled_instance(sys.argv[1])
+    if len(sys.argv) > 2:
+        with open(sys.argv[2]) as f:
+            text = f.read()
+    else:
+        text = sys.stdin.read()
+    result = validate_solution(inst, parse_solution(text))
+    print(f"{'HỢP LỆ' if result['valid'] else 'KHÔNG HỢP LỆ'} | Số môn: {result['num_rows']} | "
+          f"Điểm: {result['score']} | Tổng slot bắt đầu: {result['start_sum']}")
+    for kind, count in result['violations'].items():
+        if count:
+            print(f"   - {kind}: {count}")
+    sys.exit(0 if result['valid'] else 1)